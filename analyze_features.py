@@ -5,12 +5,15 @@
 分析lists_full.png，识别关键特征以提高识别准确率
 """
 
-import cv2
-import numpy as np
-from PIL import Image
 import json
 import re
 
+from lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+
 
 class FeatureAnalyzer:
     def __init__(self, image_path):
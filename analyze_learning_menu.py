@@ -5,11 +5,14 @@
 分析两级菜单结构和学时信息
 """
 
-import cv2
-import numpy as np
 import json
 import re
 
+from lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
 
 class LearningMenuAnalyzer:
     def __init__(self, image_path='lists.png'):
@@ -5,14 +5,17 @@
 专门分析展开后的课程列表（二级菜单）
 """
 
-import cv2
-import numpy as np
-from PIL import Image
 import json
 import re
 
+from lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+
 try:
-    import pytesseract
+    pytesseract = lazy_import('pytesseract')
     HAS_OCR = True
 except ImportError:
     HAS_OCR = False
@@ -5,12 +5,15 @@
 分析图片中的列表结构，识别菜单项并自动点击
 """
 
-import cv2
-import numpy as np
-import pyautogui
-from PIL import Image
 import time
 
+from lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+pyautogui = lazy_import('pyautogui')
+Image = lazy_import('PIL.Image')
+
 
 class ListAnalyzer:
     def __init__(self, image_path):
@@ -5,11 +5,14 @@
 分析图片中的列表、按钮、菜单等UI元素
 """
 
-import cv2
-import numpy as np
-from PIL import Image
 import json
 
+from lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+
 
 def analyze_list_structure(image_path):
     """分析列表结构"""
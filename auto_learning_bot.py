@@ -5,18 +5,22 @@
 自动截屏、OCR识别、判断并点击未完成课程
 """
 
-import pyautogui
 import time
-import cv2
-import numpy as np
-from PIL import Image, ImageGrab
 import re
 import os
 from datetime import datetime
 
+from lazy_import import lazy_import
+
+pyautogui = lazy_import('pyautogui')
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+ImageGrab = lazy_import('PIL.ImageGrab')
+
 # 尝试导入OCR库
 try:
-    import pytesseract
+    pytesseract = lazy_import('pytesseract')
     HAS_OCR = True
 except ImportError:
     HAS_OCR = False
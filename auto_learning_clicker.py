@@ -5,15 +5,18 @@
 自动识别课程学时进度，点击未完成的课程
 """
 
-import cv2
-import numpy as np
-import pyautogui
 import time
 import re
-from PIL import Image
+
+from lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+pyautogui = lazy_import('pyautogui')
+Image = lazy_import('PIL.Image')
 
 try:
-    import pytesseract
+    pytesseract = lazy_import('pytesseract')
     HAS_OCR = True
 except ImportError:
     HAS_OCR = False
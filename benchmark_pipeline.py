@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+虚拟摄像头管线性能基准测试
+不需要虚拟摄像头驱动，测量各处理阶段的单帧耗时
+"""
+
+import json
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from pixel_format import FIT_MODES, PIXEL_FORMATS, FrameConverter
+from frame_sink import NullSink
+from loop_reader import LoopingVideoReader
+from decoder_process import ProcessDecoder
+from lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+RESOLUTIONS = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+}
+
+# 启动路径：名称 → 解释器参数（--help 在参数解析后退出，只测导入和解析）
+STARTUP_TARGETS = {
+    'python': ['-c', 'pass'],
+    'virtual_camera --help': ['virtual_camera.py', '--help'],
+    'virtual_camera_gui': ['-c', 'import virtual_camera_gui'],
+    'test_camera --help': ['test_camera.py', '--help'],
+    'create_test_video --help': ['create_test_video.py', '--help'],
+}
+# 启动时不应导入的模块：用到时才导入（见 lazy_import）
+HEAVY_MODULES = ('cv2', 'numpy', 'pyvirtualcam', 'PIL', 'pyautogui', 'asyncio')
+
+
+def make_source_frames(video_path=None, count=30, width=1920, height=1080):
+    """准备源帧：从视频读取，或生成带噪声的合成帧"""
+    frames = []
+    if video_path:
+        cap = cv2.VideoCapture(video_path)
+        while len(frames) < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+        if not frames:
+            raise ValueError(f"无法读取视频: {video_path}")
+        return frames
+
+    rng = np.random.default_rng(0)
+    for _ in range(count):
+        frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        frames.append(cv2.GaussianBlur(frame, (7, 7), 0))
+    return frames
+
+
+def time_per_frame(func, frames, iterations):
+    """重复调用 func(frame) 并返回平均单帧耗时（毫秒）"""
+    # 预热
+    for frame in frames[:3]:
+        func(frame)
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(frames[i % len(frames)])
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def benchmark_pixel_formats(source_frames, iterations):
+    """
+    比较 BGR 输出与 YUV 输出的单帧成本
+
+    BGR 输出时后端还要把每帧转换为驱动的原生格式（NV12 / I420），
+    这里用一次 BGR→I420 转换估算这部分后端开销。
+    """
+    results = []
+    for name, (width, height) in RESOLUTIONS.items():
+        backend_scratch = np.empty((height * 3 // 2, width), dtype=np.uint8)
+        for fmt in PIXEL_FORMATS:
+            converter = FrameConverter(fmt, width, height)
+            stage_ms = time_per_frame(converter, source_frames, iterations)
+
+            total_ms = stage_ms
+            if fmt == 'bgr':
+                def backend_convert(frame, converter=converter):
+                    cv2.cvtColor(converter(frame), cv2.COLOR_BGR2YUV_I420,
+                                 dst=backend_scratch)
+                total_ms = time_per_frame(backend_convert, source_frames, iterations)
+
+            results.append({
+                'resolution': name,
+                'format': fmt,
+                'stage_ms': stage_ms,
+                'total_ms': total_ms,
+                'frame_bytes': converter.nbytes,
+            })
+    return results
+
+
+def print_pixel_format_results(results):
+    print(f"{'分辨率':<8}{'格式':<8}{'解码后处理(ms)':>16}{'含后端转换(ms)':>16}{'单帧字节':>12}")
+    for r in results:
+        print(f"{r['resolution']:<10}{r['format'].upper():<10}"
+              f"{r['stage_ms']:>14.2f}{r['total_ms']:>16.2f}{r['frame_bytes']:>14}")
+
+
+def benchmark_pipeline_throughput(video_path, width, height, frames, **options):
+    """
+    以不限速的 NullSink 运行完整的 解码→缩放→发送 管线，测量吞吐量
+
+    Args:
+        options: 传给 VirtualCamera 的其他参数（如 buffer_size、preload）
+    """
+    from virtual_camera import VirtualCamera
+
+    sink = NullSink(width, height, fps=30, paced=False)
+    cam = VirtualCamera(video_path, width=width, height=height, wait_mode=False,
+                        sink=sink, max_frames=frames, **options)
+    cam.run()
+    return sink.stats()
+
+
+def measure_allocations(func, frames, iterations):
+    """
+    用 tracemalloc 测量稳定运行时每帧的 Python 级内存分配
+
+    numpy 数组（包括 OpenCV 返回的数组）的数据缓冲区也会被 tracemalloc 跟踪，
+    每帧分配新帧时峰值至少为一帧的大小。
+
+    Returns:
+        (每帧净增长字节数, 运行期间峰值超出基线的字节数)
+    """
+    # 预热：让缩放几何、内部缓冲区在计时前分配好
+    for frame in frames[:3]:
+        func(frame)
+
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for i in range(iterations):
+            func(frames[i % len(frames)])
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (current - baseline) / iterations, peak - baseline
+
+
+def benchmark_resize_allocations(source_frames, width, height, iterations):
+    """比较直接 cv2.resize() 与预分配缩放阶段（各适配方式）的每帧内存分配和耗时"""
+    results = []
+
+    def naive(frame):
+        cv2.resize(frame, (width, height))
+
+    cases = [('cv2.resize', 'bgr', naive, width * height * 3)]
+    for fit in FIT_MODES:
+        for fmt in ('bgr', 'i420'):
+            converter = FrameConverter(fmt, width, height, fit=fit)
+            dst = np.empty(converter.shape, dtype=np.uint8)
+            cases.append((fit, fmt, lambda frame, c=converter, d=dst: c(frame, dst=d),
+                          converter.nbytes))
+
+    for name, fmt, func, frame_bytes in cases:
+        growth, peak = measure_allocations(func, source_frames, iterations)
+        results.append({
+            'name': name,
+            'format': fmt,
+            'ms': time_per_frame(func, source_frames, iterations),
+            'growth_bytes': growth,
+            'peak_bytes': peak,
+            'frame_bytes': frame_bytes,
+        })
+    return results
+
+
+def print_allocation_results(results):
+    print(f"{'缩放方式':<12}{'格式':<6}{'单帧耗时(ms)':>14}{'每帧净分配(B)':>16}"
+          f"{'峰值分配(B)':>14}{'单帧字节':>12}")
+    for r in results:
+        print(f"{r['name']:<14}{r['format'].upper():<8}{r['ms']:>12.2f}"
+              f"{r['growth_bytes']:>16.1f}{r['peak_bytes']:>16}{r['frame_bytes']:>14}")
+
+
+def _gil_load(stop):
+    """模拟界面线程持续占用 GIL 的纯 Python 负载"""
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+
+
+def benchmark_decoder_jitter(video_path, width, height, fps, frames, use_process,
+                             gil_load=True):
+    """
+    测量按帧率发送时的帧间隔抖动
+
+    Args:
+        use_process: True 时在子进程中解码缩放（ProcessDecoder），
+                     False 时与 GUI 默认行为一致，在发送线程中解码
+        gil_load: 是否同时运行一个占用 GIL 的线程，模拟界面和日志负载
+    """
+    sink = NullSink(width, height, fps)
+    sink.open('bgr')
+    stop = threading.Event()
+    if gil_load:
+        threading.Thread(target=_gil_load, args=(stop,), daemon=True).start()
+
+    decoder = reader = None
+    try:
+        if use_process:
+            decoder = ProcessDecoder(video_path, width, height)
+            decoder.start()
+            last_frame = decoder.pop(timeout=10.0)
+        else:
+            reader = LoopingVideoReader(video_path)
+            converter = FrameConverter('bgr', width, height)
+
+        for _ in range(frames):
+            if decoder is not None:
+                frame = decoder.pop(timeout=0.5 / fps)
+                if frame is None:
+                    frame = last_frame
+                last_frame = frame
+            else:
+                ret, frame = reader.read()
+                if not ret:
+                    raise ValueError(f"无法读取视频: {video_path}")
+                frame = converter(frame)
+            sink.send(frame)
+            sink.sleep_until_next_frame()
+    finally:
+        stop.set()
+        if reader is not None:
+            reader.release()
+        if decoder is not None:
+            last_frame = frame = None
+            decoder.stop()
+
+    stats = sink.stats()
+    stats['underruns'] = decoder.underruns if decoder is not None else 0
+    return stats
+
+
+def parse_importtime(output):
+    """
+    解析 python -X importtime 的输出
+
+    Returns:
+        [(模块名, 自身耗时微秒, 累计耗时微秒, 嵌套深度)]，按导入完成的顺序
+    """
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue   # 表头
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(fields[0]), int(fields[1]), depth))
+    return entries
+
+
+def benchmark_startup(targets, repeat=5):
+    """
+    以 -X importtime 在子进程中多次运行各启动路径
+
+    每个路径先运行一次预热（生成 .pyc、填充文件系统缓存），再取 repeat 次中
+    的最小值（其他进程的干扰只会让耗时变长）；导入耗时为顶层模块累计耗时之和，
+    不含解释器本身的初始化。
+
+    Returns:
+        {名称: {'wall_ms', 'import_ms', 'heavy', 'top'}}
+    """
+    cwd = Path(__file__).resolve().parent
+    results = {}
+    for name, args in targets.items():
+        walls, imports = [], []
+        for i in range(repeat + 1):
+            start = time.perf_counter()
+            proc = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=cwd,
+                                  capture_output=True, text=True, encoding='utf-8',
+                                  errors='replace')
+            wall = time.perf_counter() - start
+            if proc.returncode != 0:
+                raise RuntimeError(f"{name} 运行失败:\n{proc.stderr[-2000:]}")
+            entries = parse_importtime(proc.stderr)
+            if i == 0:
+                continue
+            walls.append(wall * 1000)
+            imports.append(sum(e[2] for e in entries if e[3] == 0) / 1000)
+        imported = {e[0] for e in entries}
+        top = sorted((e for e in entries if e[3] == 0), key=lambda e: e[2], reverse=True)
+        results[name] = {
+            'wall_ms': min(walls),
+            'import_ms': min(imports),
+            'heavy': [m for m in HEAVY_MODULES if m in imported],
+            'top': [(e[0], e[2] / 1000) for e in top[:5]],
+        }
+    return results
+
+
+def compare_startup(results, baseline, tolerance):
+    """
+    与基线比较，返回问题列表：导入了 HEAVY_MODULES 中的模块，或导入耗时
+    超出基线 tolerance 比例（并且至少多 5 ms，避免小数值的噪声）
+    """
+    problems = []
+    for name, r in results.items():
+        if r['heavy'] and name != 'python':
+            problems.append(f"{name}: 启动时导入了 {', '.join(r['heavy'])}")
+        base = (baseline or {}).get(name)
+        if base and r['import_ms'] > max(base['import_ms'] * (1 + tolerance),
+                                         base['import_ms'] + 5):
+            problems.append(f"{name}: 导入耗时 {r['import_ms']:.1f} ms，"
+                            f"基线 {base['import_ms']:.1f} ms")
+    return problems
+
+
+def print_startup_results(results):
+    print(f"{'启动路径':<28}{'总耗时(ms)':>12}{'导入(ms)':>10}  最慢的顶层导入")
+    for name, r in results.items():
+        top = ', '.join(f"{module} {ms:.0f}" for module, ms in r['top'][:3])
+        print(f"{name:<30}{r['wall_ms']:>10.1f}{r['import_ms']:>10.1f}  {top}")
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='虚拟摄像头管线性能基准测试')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    pixfmt = subparsers.add_parser('pixfmt', help='比较 BGR 与 YUV 输出的单帧成本')
+    pixfmt.add_argument('--video', help='用于测试的视频文件（默认使用合成帧）')
+    pixfmt.add_argument('--iterations', type=int, default=200,
+                        help='每种组合的测试帧数 (默认: 200)')
+
+    sink = subparsers.add_parser('sink', help='以 null 输出测量 解码→缩放→发送 管线吞吐量')
+    sink.add_argument('video', help='用于测试的视频文件')
+    sink.add_argument('--width', type=int, default=1920, help='输出宽度 (默认: 1920)')
+    sink.add_argument('--height', type=int, default=1080, help='输出高度 (默认: 1080)')
+    sink.add_argument('--frames', type=int, default=600, help='测试帧数 (默认: 600)')
+    sink.add_argument('--pixel-format', default='bgr', choices=PIXEL_FORMATS,
+                      help='输出像素格式 (默认: bgr)')
+    sink.add_argument('--buffer', type=int, default=0, help='后台解码缓冲区帧数 (默认: 0)')
+
+    jitter = subparsers.add_parser('jitter', help='比较发送线程内解码与独立解码进程的帧间隔抖动')
+    jitter.add_argument('video', help='用于测试的视频文件')
+    jitter.add_argument('--width', type=int, default=1920, help='输出宽度 (默认: 1920)')
+    jitter.add_argument('--height', type=int, default=1080, help='输出高度 (默认: 1080)')
+    jitter.add_argument('--fps', type=int, default=30, help='输出帧率 (默认: 30)')
+    jitter.add_argument('--frames', type=int, default=300, help='每种模式的测试帧数 (默认: 300)')
+    jitter.add_argument('--no-gil-load', action='store_true',
+                        help='不运行模拟界面负载的 Python 线程')
+    
+    alloc = subparsers.add_parser('alloc', help='测量缩放阶段每帧的内存分配（tracemalloc）')
+    alloc.add_argument('--video', help='用于测试的视频文件（默认使用 1440x1080 的 4:3 合成帧）')
+    alloc.add_argument('--width', type=int, default=1280, help='输出宽度 (默认: 1280)')
+    alloc.add_argument('--height', type=int, default=720, help='输出高度 (默认: 720)')
+    alloc.add_argument('--iterations', type=int, default=200,
+                       help='每种组合的测试帧数 (默认: 200)')
+    
+    startup = subparsers.add_parser('startup',
+                                    help='以 python -X importtime 测量各入口的启动耗时，检查启动回归')
+    startup.add_argument('--repeat', type=int, default=5, help='每个入口的运行次数 (默认: 5)')
+    startup.add_argument('--json', metavar='PATH', help='把结果写入 JSON 文件（可作为之后的基线）')
+    startup.add_argument('--baseline', metavar='PATH',
+                         help='与之前 --json 保存的结果比较，导入耗时明显变长时以非零状态退出')
+    startup.add_argument('--tolerance', type=float, default=0.5,
+                         help='允许导入耗时超出基线的比例 (默认: 0.5)')
+    
+    args = parser.parse_args()
+
+    print("========================================")
+    print("虚拟摄像头管线基准测试")
+    print("========================================\n")
+
+    if args.command == 'pixfmt':
+        source_frames = make_source_frames(args.video)
+        h, w = source_frames[0].shape[:2]
+        print(f"源帧: {w}x{h}, 每种组合 {args.iterations} 帧\n")
+        print_pixel_format_results(
+            benchmark_pixel_formats(source_frames, args.iterations))
+    elif args.command == 'sink':
+        stats = benchmark_pipeline_throughput(
+            args.video, args.width, args.height, args.frames,
+            pixel_format=args.pixel_format, buffer_size=args.buffer)
+        print(f"\n管线吞吐量: {stats['avg_fps']:.1f} FPS "
+              f"({stats['frames_sent']} 帧, 最大帧间隔 {stats['max_interval_ms']:.1f} ms)")
+    elif args.command == 'alloc':
+        source_frames = make_source_frames(args.video, width=1440, height=1080)
+        h, w = source_frames[0].shape[:2]
+        print(f"源帧: {w}x{h} → 输出 {args.width}x{args.height}, "
+              f"每种组合 {args.iterations} 帧\n")
+        print_allocation_results(benchmark_resize_allocations(
+            source_frames, args.width, args.height, args.iterations))
+    elif args.command == 'startup':
+        results = benchmark_startup(STARTUP_TARGETS, args.repeat)
+        print_startup_results(results)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+        baseline = None
+        if args.baseline:
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        problems = compare_startup(results, baseline, args.tolerance)
+        for problem in problems:
+            print(f"回归: {problem}")
+        if problems:
+            sys.exit(1)
+    elif args.command == 'jitter':
+        print(f"{'解码方式':<10}{'平均FPS':>10}{'抖动(ms)':>12}{'最大帧间隔(ms)':>16}{'欠载':>8}")
+        for name, use_process in (('发送线程', False), ('独立进程', True)):
+            stats = benchmark_decoder_jitter(
+                args.video, args.width, args.height, args.fps, args.frames,
+                use_process, gil_load=not args.no_gil_load)
+            print(f"{name:<10}{stats['avg_fps']:>12.1f}{stats['jitter_ms']:>12.2f}"
+                  f"{stats['max_interval_ms']:>16.1f}{stats['underruns']:>10}")
+
+
+if __name__ == '__main__':
+    main()
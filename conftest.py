@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""pytest 配置：测试位于 tests/，模块在仓库根目录平铺导入"""
+
+# test_camera.py 是摄像头测试工具脚本，不是单元测试
+collect_ignore = ['test_camera.py']
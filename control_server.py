@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地控制接口
+在后台线程中运行 asyncio 服务器（Unix 套接字或本机 TCP），逐行接收命令、
+逐行返回 JSON 结果。命令放入线程安全队列，由发送循环在每个节拍开始时
+非阻塞地取出执行：控制 I/O 不会阻塞发送循环，命令生效延迟不超过一个帧间隔
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import os
+import queue
+import sys
+import threading
+
+
+COMMANDS = ('start', 'stop', 'source', 'seek', 'fps', 'stats', 'quit')
+
+
+def parse_address(text):
+    """
+    解析控制接口地址
+
+    支持 "unix:路径"、"tcp:端口"、"tcp:主机:端口"；TCP 默认只监听 127.0.0.1。
+
+    Returns:
+        ('unix', 路径) 或 ('tcp', 主机, 端口)
+    """
+    kind, _, rest = text.partition(':')
+    if kind == 'unix' and rest:
+        if sys.platform == 'win32':
+            raise ValueError("Windows 不支持 Unix 套接字，请使用 tcp:端口")
+        return 'unix', rest
+    if kind == 'tcp' and rest:
+        host, _, port = rest.rpartition(':')
+        return 'tcp', host or '127.0.0.1', int(port)
+    raise ValueError(f"无效的控制接口地址: {text}（应为 unix:路径 或 tcp:[主机:]端口）")
+
+
+def parse_command(line):
+    """
+    解析一行命令
+
+    既可以是 JSON：{"cmd": "seek", "args": [12.5]}，也可以是以空格分隔的文本：
+    "seek 12.5"，方便直接用 nc / socat 调试。
+
+    Returns:
+        (命令, 参数列表)
+    """
+    text = line.decode('utf-8').strip() if isinstance(line, bytes) else line.strip()
+    if text.startswith('{'):
+        request = json.loads(text)
+        cmd = request.get('cmd', '')
+        args = request.get('args', [])
+        if not isinstance(args, list):
+            args = [args]
+    else:
+        cmd, *args = text.split(maxsplit=1) or ['']
+        # 文本形式的参数只有一个（路径中可能带空格）
+        args = args[:1]
+    if cmd not in COMMANDS:
+        raise ValueError(f"未知命令: {cmd}（支持: {', '.join(COMMANDS)}）")
+    return cmd, args
+
+
+class ControlServer:
+    """
+    控制服务器
+
+    asyncio 事件循环运行在独立的守护线程中。每条命令先在线程池中执行
+    prepare(cmd, args)（打开视频、定位等可能耗时的准备工作，返回交给发送循环
+    的参数），再放入队列；发送循环每个节拍调用一次 poll(handler)，
+    handler(cmd, args) 的返回值作为命令结果回复给客户端。
+    """
+
+    def __init__(self, address, prepare=None, timeout=5.0):
+        """
+        Args:
+            address: 监听地址，见 parse_address
+            prepare: 在后台线程中执行的准备函数 prepare(cmd, args) -> args，None 表示不需要
+            timeout: 等待发送循环执行命令的超时（秒）
+        """
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.prepare = prepare
+        self.timeout = timeout
+
+        self._queue = queue.SimpleQueue()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+        # 统计信息
+        self.commands = 0
+        self.errors = 0
+
+    def __str__(self):
+        if self.address[0] == 'unix':
+            return f"unix:{self.address[1]}"
+        return f"tcp:{self.address[1]}:{self.address[2]}"
+
+    def start(self):
+        """启动服务器线程，监听失败时抛出异常"""
+        self._thread = threading.Thread(target=self._run, name="control-server", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            self._thread = None
+            raise self._error
+
+    def _run(self):
+        loop = self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            self._server = loop.run_until_complete(self._listen())
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            loop.close()
+            return
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            self._server.close()
+            # 取消仍在等待命令的连接，不等客户端主动断开
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+
+    async def _listen(self):
+        if self.address[0] == 'unix':
+            path = self.address[1]
+            if os.path.exists(path):
+                os.unlink(path)  # 上次异常退出留下的套接字文件
+            return await asyncio.start_unix_server(self._handle_client, path)
+        return await asyncio.start_server(self._handle_client, self.address[1], self.address[2])
+
+    async def _handle_client(self, reader, writer):
+        """逐行读取命令并回复，一个连接可以发送多条命令"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                reply = await self._execute(line)
+                writer.write((json.dumps(reply, ensure_ascii=False, default=str) + '\n')
+                             .encode('utf-8'))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _execute(self, line):
+        self.commands += 1
+        try:
+            cmd, args = parse_command(line)
+            if self.prepare is not None:
+                args = await asyncio.get_running_loop().run_in_executor(
+                    None, self.prepare, cmd, args)
+            future = concurrent.futures.Future()
+            self._queue.put((cmd, args, future))
+            result = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+            return {'ok': True, 'result': result}
+        except asyncio.TimeoutError:
+            self.errors += 1
+            return {'ok': False, 'error': "发送循环未响应"}
+        except Exception as e:
+            self.errors += 1
+            return {'ok': False, 'error': str(e)}
+
+    def poll(self, handler):
+        """
+        执行所有待处理的命令（不阻塞，在发送循环中每个节拍调用一次）
+
+        Returns:
+            本次执行的命令数
+        """
+        count = 0
+        while True:
+            try:
+                cmd, args, future = self._queue.get_nowait()
+            except queue.Empty:
+                return count
+            if not future.set_running_or_notify_cancel():
+                continue  # 客户端已超时
+            try:
+                future.set_result(handler(cmd, args))
+            except Exception as e:
+                future.set_exception(e)
+            count += 1
+
+    def stop(self):
+        """停止服务器线程，删除 Unix 套接字文件"""
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self.address[0] == 'unix' and os.path.exists(self.address[1]):
+            os.unlink(self.address[1])
+
+    def stats(self):
+        """返回命令统计信息"""
+        return {
+            'commands': self.commands,
+            'errors': self.errors,
+        }
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
@@ -5,10 +5,20 @@
 如果你没有视频文件，可以用这个脚本生成一个测试视频
 """
 
-import cv2
-import numpy as np
+import os
+import time
+from collections import deque
 from datetime import datetime
 
+from frame_sink import FileSink
+from lazy_import import lazy_import
+from overlay import SpriteAtlas, blend
+from pixel_format import FrameConverter, frame_shape
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+shared_memory = lazy_import('multiprocessing.shared_memory')
+
 
 def create_test_video(output_path='test_video.mp4', duration=10, fps=30, 
                      width=1280, height=720):
@@ -87,6 +97,188 @@ def create_test_video(output_path='test_video.mp4', duration=10, fps=30,
     print(f"\n测试视频创建完成: {output_path}")
 
 
+def hue_lut():
+    """色相 0~179（OpenCV 的 H 范围）对应的纯色 BGR 查找表，S = V = 255"""
+    hsv = np.full((1, 180, 3), 255, np.uint8)
+    hsv[0, :, 0] = np.arange(180)
+    return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0]
+
+
+class TestFrameRenderer:
+    """
+    测试视频的逐帧渲染器（画面与 create_test_video 相同）
+
+    - 背景色由色相查找表得到：表中预先存好每种颜色的一整行像素，整帧背景只是
+      逐行复制，不再逐帧做 HSV 转换
+    - 标题和生成时间不随帧变化，渲染一次缓存为精灵，每帧只混合文字覆盖的区域
+    - 帧号、时间、圆形和进度条只绘制在各自的小区域内
+    """
+
+    def __init__(self, width, height, fps, total_frames, fmt='bgr', timestamp=None):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.total_frames = total_frames
+        self.duration = total_frames / fps
+        # (180, width * 3)：每种色相一整行像素（按 3 通道广播填充要慢几十倍）
+        self.rows = np.tile(hue_lut(), (1, width))
+        self.frame = np.empty((height, width, 3), np.uint8)
+        # 非 BGR 输出（Y4M 为 I420）在渲染进程中转换，减少传给编码进程的数据量
+        self.converter = FrameConverter(fmt, width, height) if fmt != 'bgr' else None
+
+        timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        atlas = SpriteAtlas()
+        self.static_text = [(atlas.text("虚拟摄像头测试视频", 1.2, thickness=2), 100),
+                            (atlas.text(timestamp, 1.2, thickness=2), 100 + 3 * 60)]
+
+    @property
+    def shape(self):
+        return self.converter.shape if self.converter else self.frame.shape
+
+    def render(self, frame_num, out=None):
+        """渲染第 frame_num 帧（从 0 开始），写入 out 或内部缓冲区"""
+        frame = self.frame
+        width, height, total = self.width, self.height, self.total_frames
+        frame.reshape(height, -1)[:] = self.rows[int((frame_num / total) * 180)]
+
+        for sprite, y in self.static_text:
+            blend(frame, 'bgr', width, height, sprite, 50 - sprite.origin[0], y - sprite.origin[1])
+        for i, text in ((1, f"帧: {frame_num + 1}/{total}"),
+                        (2, f"时间: {frame_num / self.fps:.2f}s / {self.duration:g}s")):
+            y = 100 + i * 60
+            cv2.putText(frame, text, (52, y + 2), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 3)
+            cv2.putText(frame, text, (50, y), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2)
+
+        circle_x = int((frame_num / total) * width)
+        cv2.circle(frame, (circle_x, height // 2), 30, (0, 255, 0), -1)
+        cv2.circle(frame, (circle_x, height // 2), 35, (255, 255, 255), 2)
+
+        bar_width = int((frame_num / total) * (width - 100))
+        cv2.rectangle(frame, (50, height - 50), (50 + bar_width, height - 30), (0, 255, 0), -1)
+        cv2.rectangle(frame, (50, height - 50), (width - 50, height - 30), (255, 255, 255), 2)
+
+        if self.converter is not None:
+            return self.converter(frame, out)
+        if out is not None:
+            np.copyto(out, frame)
+            return out
+        return frame
+
+
+# 渲染进程中的渲染器和共享内存槽位
+_renderer = None
+_shm = None
+_slots = None
+
+
+def _init_renderer(shm_name, slots_shape, *args):
+    global _renderer, _shm, _slots
+    _renderer = TestFrameRenderer(*args)
+    # 渲染进程与主进程共用 resource_tracker，由主进程负责 unlink
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    _slots = np.ndarray(slots_shape, np.uint8, _shm.buf)
+
+
+def _render_chunk(slot, start, count):
+    """在渲染进程中把从 start 开始的 count 帧直接渲染到共享内存的槽位中"""
+    chunk = _slots[slot]
+    for i in range(count):
+        _renderer.render(start + i, chunk[i])
+
+
+def generate_test_video(output_path='test_video.mp4', duration=10, fps=30,
+                        width=1280, height=720, workers=None, chunk_frames=16):
+    """
+    并行生成测试视频
+
+    帧按 chunk_frames 分块，由进程池中的渲染进程直接渲染到共享内存的槽位中；
+    当前进程作为唯一的编码进程按顺序原地读取写入。槽位数为进程数的两倍，
+    编码跟不上时渲染进程等待，内存占用有上限。输出扩展名为 .y4m 时写未压缩的 YUV4MPEG2（I420，
+    渲染进程中完成颜色转换），播放时无需解码，适合做基准测试。
+
+    Args:
+        output_path: 输出文件路径
+        duration: 视频时长（秒）
+        fps: 帧率
+        width: 宽度
+        height: 高度
+        workers: 渲染进程数，None 表示 CPU 核数
+        chunk_frames: 每个任务渲染的帧数
+    """
+    # 进程池只在并行生成时用到（导入约 20 ms），不放在模块顶层
+    from concurrent.futures import ProcessPoolExecutor
+    
+    workers = workers or os.cpu_count() or 1
+    y4m = output_path.lower().endswith('.y4m')
+    total_frames = int(duration * fps)
+
+    print(f"正在创建测试视频（{workers} 个渲染进程）...")
+    print(f"  输出文件: {output_path}{'（YUV4MPEG2 原始帧）' if y4m else ''}")
+    print(f"  时长: {duration} 秒")
+    print(f"  分辨率: {width}x{height}")
+    print(f"  帧率: {fps} FPS")
+
+    if y4m:
+        writer = FileSink(width, height, fps, output_path)
+        writer.open('i420')
+        write = writer.send
+    else:
+        writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps,
+                                 (width, height))
+        write = writer.write
+
+    start_time = time.time()
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    fmt = 'i420' if y4m else 'bgr'
+    # 每个在途的块占一个槽位，渲染进程直接写入，编码进程原地读取，不经过管道拷贝
+    slot_count = workers * 2
+    slots_shape = (slot_count, chunk_frames) + frame_shape(fmt, width, height)
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(slots_shape)))
+    slots = np.ndarray(slots_shape, np.uint8, shm.buf)
+    initargs = (shm.name, slots_shape, width, height, fps, total_frames, fmt, timestamp)
+    written = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_renderer,
+                                 initargs=initargs) as pool:
+            starts = iter(range(0, total_frames, chunk_frames))
+            free_slots = deque(range(slot_count))
+            pending = deque()
+            while True:
+                # 有空闲槽位就提交下一块；按提交顺序取回，保证帧序
+                while free_slots:
+                    start = next(starts, None)
+                    if start is None:
+                        break
+                    slot = free_slots.popleft()
+                    count = min(chunk_frames, total_frames - start)
+                    pending.append((pool.submit(_render_chunk, slot, start, count), slot, count))
+                if not pending:
+                    break
+
+                future, slot, count = pending.popleft()
+                future.result()
+                for frame in slots[slot, :count]:
+                    write(frame)
+                    written += 1
+                    # 显示进度
+                    if written % fps == 0:
+                        print(f"  进度: {written}/{total_frames} 帧 "
+                              f"({written / total_frames * 100:.1f}%)")
+                free_slots.append(slot)
+    finally:
+        if y4m:
+            writer.close()
+        else:
+            writer.release()
+        del slots
+        shm.close()
+        shm.unlink()
+
+    elapsed = time.time() - start_time
+    print(f"\n测试视频创建完成: {output_path}（{written} 帧，耗时 {elapsed:.1f} 秒，"
+          f"{written / max(elapsed, 1e-6):.0f} 帧/秒）")
+
+
 def main():
     """主函数"""
     import argparse
@@ -102,6 +294,12 @@ def main():
                        help='宽度 (默认: 1280)')
     parser.add_argument('--height', type=int, default=720, 
                        help='高度 (默认: 720)')
+    parser.add_argument('--parallel', action='store_true',
+                       help='多进程渲染（长时间、高分辨率的测试视频）；输出为 .y4m 时自动启用')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='渲染进程数 (默认: CPU 核数)')
+    parser.add_argument('--chunk', type=int, default=16,
+                       help='每个渲染任务的帧数 (默认: 16)')
     
     args = parser.parse_args()
     
@@ -109,13 +307,24 @@ def main():
     print("测试视频生成器")
     print("========================================\n")
     
-    create_test_video(
-        output_path=args.output,
-        duration=args.duration,
-        fps=args.fps,
-        width=args.width,
-        height=args.height
-    )
+    if args.parallel or args.output.lower().endswith('.y4m'):
+        generate_test_video(
+            output_path=args.output,
+            duration=args.duration,
+            fps=args.fps,
+            width=args.width,
+            height=args.height,
+            workers=args.workers,
+            chunk_frames=args.chunk
+        )
+    else:
+        create_test_video(
+            output_path=args.output,
+            duration=args.duration,
+            fps=args.fps,
+            width=args.width,
+            height=args.height
+        )
     
     print("\n使用方法:")
     print(f"  python virtual_camera.py {args.output}")
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+独立进程解码
+解码和缩放在子进程中进行，结果写入共享内存帧环形缓冲区；
+发送循环和 GUI 所在的进程只负责取帧发送，不再与解码争用 GIL
+"""
+
+import multiprocessing
+import queue
+
+from frame_sink import _align
+from lazy_import import lazy_import
+from loop_reader import LoopingVideoReader
+from pixel_format import FrameConverter, frame_shape
+
+np = lazy_import('numpy')
+shared_memory = lazy_import('multiprocessing.shared_memory')
+
+
+def _frame_views(buf, fmt, width, height, slots):
+    """共享内存中各槽位的帧视图（各帧按 64 字节对齐）"""
+    shape = frame_shape(fmt, width, height)
+    frame_bytes = int(np.prod(shape))
+    data = np.ndarray((slots, _align(frame_bytes)), dtype=np.uint8, buffer=buf)
+    return [data[i, :frame_bytes].reshape(shape) for i in range(slots)]
+
+
+def _decode_worker(video_path, shm_name, fmt, width, height, fit, slots, gapless,
+                   free, filled, stop, messages):
+    """子进程入口：循环解码、缩放并写入共享内存槽位"""
+    # spawn 出的子进程与父进程共用同一个 resource_tracker，直接连接即可，
+    # 共享内存由父进程在 stop() 中删除
+    shm = shared_memory.SharedMemory(name=shm_name)
+    reader = None
+    try:
+        frames = _frame_views(shm.buf, fmt, width, height, slots)
+        reader = LoopingVideoReader(video_path, gapless=gapless)
+        if not reader.isOpened():
+            messages.put(('error', f"无法打开视频文件: {video_path}"))
+            return
+        converter = FrameConverter(fmt, width, height, fit=fit)
+
+        index = 0
+        while not stop.is_set():
+            if not free.acquire(timeout=0.1):
+                continue
+            loops = reader.loops
+            ret, frame = reader.read()
+            if not ret:
+                messages.put(('error', "无法读取视频帧"))
+                break
+            converter(frame, dst=frames[index])
+            index = (index + 1) % slots
+            filled.release()
+
+            if reader.loops != loops:
+                messages.put(('loop', reader.stats()))
+    except Exception as e:
+        messages.put(('error', str(e)))
+    finally:
+        if reader is not None:
+            reader.release()
+        frames = None
+        shm.close()
+
+
+class ProcessDecoder:
+    """
+    子进程解码 + 共享内存帧环形缓冲区（单生产者 / 单消费者）
+
+    用两个信号量做流控：free 为空闲槽位数，filled 为已写入、尚未取走的帧数。
+    与 FrameRingBuffer 一样，消费者取到的槽位在下一次 pop() 之前不会被覆盖，
+    欠载时可以安全地重发上一帧。
+    """
+
+    def __init__(self, video_path, width, height, fmt='bgr', slots=8, gapless=False,
+                 fit='stretch'):
+        """
+        Args:
+            video_path: 视频文件路径
+            width: 输出宽度
+            height: 输出高度
+            fmt: 输出像素格式
+            slots: 共享内存槽位数量（至少 2）
+            gapless: 是否启用无缝循环
+            fit: 画面适配方式（见 pixel_format.FIT_MODES）
+        """
+        if slots < 2:
+            raise ValueError(f"缓冲区容量至少为 2: {slots}")
+
+        self.video_path = str(video_path)
+        self.width = width
+        self.height = height
+        self.fmt = fmt
+        self.slots = slots
+        self.gapless = gapless
+        self.fit = fit
+
+        self.shm = None
+        self.process = None
+        self._frames = None
+        self._read_index = 0
+        self._holding = False
+        self.error = None
+
+        # 统计信息
+        self.consumed = 0
+        self.underruns = 0
+
+    def start(self):
+        """创建共享内存并启动解码进程"""
+        # 统一使用 spawn：与 Windows 行为一致，也避免在带有 Tk 线程的进程中 fork
+        ctx = multiprocessing.get_context('spawn')
+        frame_bytes = int(np.prod(frame_shape(self.fmt, self.width, self.height)))
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=_align(frame_bytes) * self.slots)
+        self._frames = _frame_views(self.shm.buf, self.fmt, self.width,
+                                    self.height, self.slots)
+
+        self._free = ctx.Semaphore(self.slots)
+        self._filled = ctx.Semaphore(0)
+        self._stop = ctx.Event()
+        self._messages = ctx.Queue()
+        process = ctx.Process(
+            target=_decode_worker, name="frame-decoder",
+            args=(self.video_path, self.shm.name, self.fmt, self.width, self.height,
+                  self.fit, self.slots, self.gapless, self._free, self._filled,
+                  self._stop, self._messages),
+            daemon=True)
+        process.start()
+        self.process = process
+
+    def pop(self, timeout=None):
+        """
+        取出最早写入的帧，并释放上一次取出的槽位
+
+        Returns:
+            帧视图；欠载返回 None（上一次取出的帧仍然有效）
+
+        Raises:
+            RuntimeError: 解码进程已退出
+        """
+        if not self._filled.acquire(timeout=timeout or 0):
+            if not self.process.is_alive():
+                self.poll_messages()
+                raise RuntimeError(self.error or "解码进程已退出")
+            self.underruns += 1
+            return None
+
+        if self._holding:
+            self._read_index = (self._read_index + 1) % self.slots
+            self._free.release()
+        self._holding = True
+        self.consumed += 1
+        return self._frames[self._read_index]
+
+    def poll_messages(self):
+        """
+        取出解码进程发来的消息（不阻塞）
+
+        Returns:
+            [(kind, payload), ...]；kind 为 'loop'（循环统计）或 'error'
+        """
+        result = []
+        while True:
+            try:
+                kind, payload = self._messages.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                break
+            if kind == 'error':
+                self.error = payload
+            result.append((kind, payload))
+        return result
+
+    def stats(self):
+        """返回缓冲区统计信息"""
+        return {
+            'capacity': self.slots,
+            'consumed': self.consumed,
+            'underruns': self.underruns,
+        }
+
+    def stop(self):
+        """停止解码进程并释放共享内存"""
+        if self.process is not None:
+            self._stop.set()
+            self.process.join(timeout=2.0)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+            self.process = None
+        if self.shm is not None:
+            self._frames = None
+            self.shm.unlink()
+            try:
+                self.shm.close()
+            except BufferError:
+                pass  # 调用方仍持有帧视图，映射在视图释放后回收
+            self.shm = None
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧环形缓冲区
+后台解码线程把输出分辨率的帧写入预分配的定长环形缓冲区，
+发送循环只负责取帧和发送
+"""
+
+import threading
+
+from lazy_import import lazy_import
+
+np = lazy_import('numpy')
+
+
+class FrameRingBuffer:
+    """
+    预分配的定长帧环形缓冲区（单生产者 / 单消费者）
+
+    所有帧槽位在创建时一次性分配，运行期间不再分配内存。
+    消费者取到的是槽位视图，该槽位在下一次 pop() 之前不会被生产者覆盖。
+    """
+
+    def __init__(self, capacity, frame_shape):
+        """
+        Args:
+            capacity: 槽位数量（至少 2，其中一个槽位留给正在发送的帧）
+            frame_shape: 单帧数组形状，如 (height, width, 3)
+        """
+        if capacity < 2:
+            raise ValueError(f"缓冲区容量至少为 2: {capacity}")
+
+        self.capacity = capacity
+        self.frames = np.empty((capacity,) + tuple(frame_shape), dtype=np.uint8)
+
+        self._cond = threading.Condition()
+        self._write_index = 0
+        self._read_index = 0
+        self._count = 0          # 已写入、尚未被取走的帧数
+        self._holding = False    # 消费者是否仍持有上一次取走的槽位
+        self._closed = False
+
+        # 统计信息
+        self.produced = 0
+        self.consumed = 0
+        self.underruns = 0
+        self.min_depth = None
+        self.max_depth = 0
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @property
+    def depth(self):
+        """当前排队等待发送的帧数"""
+        return self._count
+
+    def _free_slots(self):
+        return self.capacity - self._count - (1 if self._holding else 0)
+
+    def acquire_write(self, timeout=None):
+        """
+        等待一个空闲槽位
+
+        Returns:
+            可写入的槽位视图；缓冲区已关闭或超时返回 None
+        """
+        with self._cond:
+            if not self._cond.wait_for(
+                    lambda: self._closed or self._free_slots() > 0, timeout):
+                return None
+            if self._closed:
+                return None
+            return self.frames[self._write_index]
+
+    def commit_write(self):
+        """提交 acquire_write() 拿到的槽位"""
+        with self._cond:
+            self._write_index = (self._write_index + 1) % self.capacity
+            self._count += 1
+            self.produced += 1
+            if self._count > self.max_depth:
+                self.max_depth = self._count
+            self._cond.notify_all()
+
+    def pop(self, timeout=None):
+        """
+        取出最早写入的帧，并释放上一次取出的槽位
+
+        缓冲区为空时记一次欠载，并继续保留上一次取出的槽位，
+        调用方可以安全地重发上一帧。
+
+        Args:
+            timeout: 缓冲区为空时的最长等待时间（秒），0 或 None 表示不等待
+
+        Returns:
+            帧视图；欠载或已关闭返回 None
+        """
+        with self._cond:
+            if self.min_depth is None or self._count < self.min_depth:
+                self.min_depth = self._count
+
+            if self._count == 0:
+                if timeout:
+                    self._cond.wait_for(
+                        lambda: self._closed or self._count > 0, timeout)
+                if self._count == 0:
+                    if not self._closed:
+                        self.underruns += 1
+                    return None
+
+            if self._holding:
+                self._read_index = (self._read_index + 1) % self.capacity
+            self._count -= 1
+            self._holding = True
+            self.consumed += 1
+            self._cond.notify_all()
+            return self.frames[self._read_index]
+
+    def wait_for_depth(self, depth, timeout=None):
+        """等待缓冲区预填充到指定深度（或已关闭），返回是否达到"""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._closed or self._count >= depth, timeout)
+            return self._count >= depth
+
+    def close(self):
+        """关闭缓冲区，唤醒所有等待中的线程"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        """返回缓冲区统计信息"""
+        with self._cond:
+            return {
+                'capacity': self.capacity,
+                'depth': self._count,
+                'min_depth': self.min_depth,
+                'max_depth': self.max_depth,
+                'produced': self.produced,
+                'consumed': self.consumed,
+                'underruns': self.underruns,
+            }
+
+
+class DecoderThread(threading.Thread):
+    """
+    后台解码线程
+
+    反复调用 read_into(dst) 把下一帧写入缓冲区槽位，
+    read_into 返回 False 时线程结束。
+    """
+
+    def __init__(self, ring, read_into):
+        """
+        Args:
+            ring: FrameRingBuffer 实例
+            read_into: 回调函数，把下一帧写入给定数组，成功返回 True
+        """
+        super().__init__(name="frame-decoder", daemon=True)
+        self.ring = ring
+        self.read_into = read_into
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                slot = self.ring.acquire_write(timeout=0.1)
+                if slot is None:
+                    if self.ring.closed:
+                        break
+                    continue
+                if not self.read_into(slot):
+                    break
+                self.ring.commit_write()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.ring.close()
+
+    def stop(self):
+        """请求线程退出并等待结束"""
+        self._stop_event.set()
+        self.ring.close()
+        self.join(timeout=2.0)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧缓存
+- 预解码缓存：把短视频一次性解码、缩放、转换到连续内存中，循环播放时直接按索引取帧
+- 原始帧缓存文件（.rawframes）：把解码、缩放后的帧持久化到磁盘，
+  再次启动时通过 np.memmap 按需读入，不再解码
+"""
+
+import hashlib
+import os
+import struct
+import tempfile
+from pathlib import Path
+
+from lazy_import import lazy_import
+from pixel_format import FrameConverter
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+# .rawframes 文件头：魔数、像素格式、输出尺寸、帧数、源视频信息、缓存键摘要
+RAWFRAMES_MAGIC = b'RAWFRM01'
+RAWFRAMES_HEADER = struct.Struct('<8s8sIIIIIdqq20s')
+# 文件头按页对齐，帧数据从 4096 字节处开始，便于 memmap
+RAWFRAMES_DATA_OFFSET = 4096
+
+# 原始帧缓存文件的默认大小上限（MB），命令行版与 GUI 共用
+DEFAULT_MAX_FRAME_CACHE_MB = 4096
+
+
+def preload_frames(cap, converter, max_bytes):
+    """
+    把整段视频解码、缩放并转换到一块连续的 (N, ...) uint8 内存中
+
+    Args:
+        cap: 已打开的 cv2.VideoCapture，从当前位置开始读取
+        converter: FrameConverter，决定输出分辨率和像素格式
+        max_bytes: 内存预算（字节）
+
+    Returns:
+        帧数组；视频超出内存预算或无法读取时返回 None
+    """
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if frame_count <= 0 or frame_count * converter.nbytes > max_bytes:
+        return None
+
+    arena = np.empty((frame_count,) + converter.shape, dtype=np.uint8)
+
+    count = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if count >= frame_count:
+            # 容器报告的帧数偏小，实际帧数无法装入预分配的内存
+            return None
+
+        converter(frame, dst=arena[count])
+        count += 1
+
+    if count == 0:
+        return None
+
+    # 前 count 帧仍是同一块连续内存
+    return arena[:count]
+
+
+class RawFrameCache:
+    """
+    原始帧缓存文件
+
+    文件由一个小文件头和按目标分辨率、像素格式紧密排列的帧数据组成，
+    以源文件路径、修改时间、大小、目标宽高、画面适配方式和像素格式作为缓存键，
+    任何一项变化都会使缓存失效并重新生成。
+    """
+
+    def __init__(self, source_path, width, height, fmt='bgr', cache_dir=None,
+                 fit='stretch'):
+        """
+        Args:
+            source_path: 源视频文件路径
+            width: 输出宽度
+            height: 输出高度
+            fmt: 像素格式（见 pixel_format.PIXEL_FORMATS）
+            cache_dir: 缓存目录，默认放在源视频旁边（不可写时使用临时目录）
+            fit: 画面适配方式（见 pixel_format.FIT_MODES）
+        """
+        self.source_path = Path(source_path).resolve()
+        self.width = width
+        self.height = height
+        self.fmt = fmt
+        self.fit = fit
+        self.converter = FrameConverter(fmt, width, height, fit=fit)
+        self.frame_shape = self.converter.shape
+
+        name = f"{self.source_path.name}.{width}x{height}.{fit}.{fmt}.rawframes"
+        if cache_dir is None:
+            cache_dir = self.source_path.parent
+            if not os.access(cache_dir, os.W_OK):
+                cache_dir = Path(tempfile.gettempdir()) / 'virtual_camera_cache'
+        self.path = Path(cache_dir) / name
+
+        # 源视频信息（命中缓存时从文件头读取，无需打开视频）
+        self.source_width = 0
+        self.source_height = 0
+        self.source_fps = 0.0
+
+    def _key_digest(self):
+        stat = self.source_path.stat()
+        key = (f"{self.source_path}|{stat.st_mtime_ns}|{stat.st_size}|"
+               f"{self.width}x{self.height}|{self.fit}|{self.fmt}")
+        return hashlib.sha1(key.encode('utf-8')).digest(), stat
+
+    def load(self):
+        """
+        打开已有的缓存文件
+
+        Returns:
+            只读的 np.memmap 帧数组 (N, ...)；缓存不存在或已失效返回 None
+        """
+        if not self.path.exists():
+            return None
+
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(RAWFRAMES_HEADER.size)
+            (magic, fmt, width, height, frame_count, src_width, src_height,
+             src_fps, _, _, digest) = RAWFRAMES_HEADER.unpack(header)
+            expected_digest, _ = self._key_digest()
+        except (OSError, struct.error):
+            return None
+
+        if (magic != RAWFRAMES_MAGIC or digest != expected_digest
+                or fmt.rstrip(b'\0').decode('ascii') != self.fmt
+                or (width, height) != (self.width, self.height)
+                or frame_count <= 0):
+            return None
+
+        frame_bytes = self.converter.nbytes
+        if self.path.stat().st_size != RAWFRAMES_DATA_OFFSET + frame_count * frame_bytes:
+            return None
+
+        self.source_width = src_width
+        self.source_height = src_height
+        self.source_fps = src_fps
+        return np.memmap(self.path, dtype=np.uint8, mode='r',
+                         offset=RAWFRAMES_DATA_OFFSET,
+                         shape=(frame_count,) + self.frame_shape)
+
+    def build(self, cap, max_bytes=None):
+        """
+        从视频解码并生成缓存文件
+
+        Args:
+            cap: 已打开的 cv2.VideoCapture，从当前位置开始读取
+            max_bytes: 缓存文件大小上限（字节）。先按容器报告的帧数估算，帧数
+                       未知或偏小时写入过程中超出上限即停止
+
+        Returns:
+            生成后的 np.memmap 帧数组；超出上限或无法读取返回 None
+        """
+        frame_bytes = self.converter.nbytes
+        estimated = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if max_bytes is not None and estimated * frame_bytes > max_bytes:
+            return None
+        max_frames = max_bytes // frame_bytes if max_bytes is not None else None
+
+        self.source_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.source_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.source_fps = cap.get(cv2.CAP_PROP_FPS)
+        digest, stat = self._key_digest()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+
+        frame_count = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.seek(RAWFRAMES_DATA_OFFSET)
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    if max_frames is not None and frame_count >= max_frames:
+                        # 容器报告的帧数未知或偏小，实际大小超出上限
+                        frame_count = 0
+                        break
+                    f.write(np.ascontiguousarray(self.converter(frame)).data)
+                    frame_count += 1
+
+                header = RAWFRAMES_HEADER.pack(
+                    RAWFRAMES_MAGIC, self.fmt.encode('ascii'), self.width,
+                    self.height, frame_count, self.source_width,
+                    self.source_height, self.source_fps, stat.st_size,
+                    stat.st_mtime_ns, digest)
+                f.seek(0)
+                f.write(header)
+
+            if frame_count == 0:
+                tmp_path.unlink()
+                return None
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
+
+        return self.load()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+发送节奏控制
+按墙上时钟为每个输出帧排定发送时间，记录实际发送相对排定时间的滞后（漂移），
+落后时按策略追赶，并保证滞后不超过硬性上限，长时间运行也不会越拖越久
+"""
+
+import math
+import time
+
+
+PACING_POLICIES = ('drop', 'hold', 'degrade')
+
+
+class FramePacer:
+    """
+    输出帧节拍器
+
+    第 n 帧的排定发送时间为 t0 + n / fps（由节拍序号直接计算，不累加误差）。
+    每帧开始前调用 behind() 得到落后的整帧数，由调用方按策略处理：
+
+    - drop:    跳过落后的节拍，源视频只 grab() 不解码，立即追上墙上时钟
+    - hold:    落后时重发上一帧（不解码），输出节奏先追上；源视频的播放进度
+               因此落后，累计超过上限时再跳帧对齐
+    - degrade: 落后时降低缩放质量（最近邻插值）减少单帧耗时，追上后恢复
+
+    无论哪种策略，滞后超过 max_latency 时都会跳帧；需要跳过的帧数超过上限
+    对应的帧数时（如系统休眠恢复）直接以当前时间重新对齐，不再逐帧追赶。
+    """
+
+    def __init__(self, fps, policy='drop', max_latency=0.5, paced=True):
+        """
+        Args:
+            fps: 输出帧率
+            policy: 落后时的处理策略，见 PACING_POLICIES
+            max_latency: 滞后的硬性上限（秒）
+            paced: 是否按帧率休眠；False 时全速运行，不计算滞后
+        """
+        if policy not in PACING_POLICIES:
+            raise ValueError(f"未知的节奏策略: {policy}")
+        self.fps = fps
+        self.frame_time = 1.0 / fps
+        self.policy = policy
+        self.max_latency = max_latency
+        self.max_skip = max(1, math.ceil(max_latency * fps))
+        self.paced = paced
+
+        self.tick = 0
+        self._start = None
+
+        # 统计信息
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.source_drift = 0      # hold 策略下源视频落后的帧数
+        self.dropped = 0
+        self.held = 0
+        self.degraded = 0
+        self.resyncs = 0
+
+    def set_fps(self, fps):
+        """运行中修改帧率：以当前节拍的排定时间为新的起点，之后按新的帧间隔排定"""
+        if self._start is not None:
+            self._start = self._deadline(self.tick) - self.tick / fps
+        self.fps = fps
+        self.frame_time = 1.0 / fps
+        self.max_skip = max(1, math.ceil(self.max_latency * fps))
+
+    def _deadline(self, tick):
+        return self._start + tick * self.frame_time
+
+    def behind(self):
+        """
+        当前节拍落后的整帧数（0 表示准时）
+
+        落后帧数超过上限时直接重新对齐时钟，返回值不超过 max_skip。
+        """
+        now = time.perf_counter()
+        if self._start is None:
+            self._start = now
+        if not self.paced:
+            return 0
+
+        self.lag = max(0.0, now - self._deadline(self.tick))
+        self.max_lag = max(self.max_lag, self.lag)
+        frames = int(self.lag * self.fps)
+        if frames > self.max_skip:
+            # 落后太多（系统休眠、调试暂停等），逐帧追赶没有意义
+            self._start = now - self.tick * self.frame_time
+            self.resyncs += 1
+            return 0
+        return frames
+
+    def over_ceiling(self):
+        """滞后（或 hold 策略下源视频的落后）是否超过硬性上限"""
+        return (self.lag > self.max_latency or
+                self.source_drift * self.frame_time > self.max_latency)
+
+    def skip(self, frames):
+        """跳过若干个节拍（这些节拍不发送帧）"""
+        self.tick += frames
+        self.dropped += frames
+
+    def wait(self):
+        """
+        结束当前节拍，休眠到下一个节拍的排定时间
+
+        Returns:
+            实际休眠的秒数
+        """
+        self.tick += 1
+        if not self.paced:
+            return 0.0
+        if self._start is None:
+            # 还没有调用过 behind()（如待机画面），以当前时间作为这一拍的开始
+            self._start = time.perf_counter() - (self.tick - 1) * self.frame_time
+        delay = self._deadline(self.tick) - time.perf_counter()
+        if delay <= 0:
+            return 0.0
+        time.sleep(delay)
+        return delay
+
+    def stats(self):
+        """返回节奏统计信息"""
+        return {
+            'policy': self.policy,
+            'lag_ms': self.lag * 1000,
+            'max_lag_ms': self.max_lag * 1000,
+            'source_drift_ms': self.source_drift * self.frame_time * 1000,
+            'dropped': self.dropped,
+            'held': self.held,
+            'degraded': self.degraded,
+            'resyncs': self.resyncs,
+        }
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+发送画面录制
+把实际发送到虚拟摄像头的帧（含叠加层和延迟探测条码）复制到共享内存环形缓冲区，
+由独立的编码进程写入文件。发送循环只做一次内存拷贝，编码进程跟不上时直接丢弃
+并计数，不会阻塞发送
+"""
+
+import multiprocessing
+import os
+import queue
+import time
+from pathlib import Path
+
+from decoder_process import _frame_views
+from frame_sink import FileSink, _align
+from lazy_import import lazy_import
+from pixel_format import frame_shape, to_bgr
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+shared_memory = lazy_import('multiprocessing.shared_memory')
+
+
+# 按扩展名选择压缩编码；.y4m 写 YUV4MPEG2（I420），其他扩展名按发送的像素格式
+# 逐字节写入原始帧（无损，与 --sink file: 的原始帧格式相同）
+VIDEO_CODECS = {
+    '.mp4': 'mp4v',
+    '.avi': 'MJPG',
+}
+
+
+def _open_writer(path, fmt, width, height, fps):
+    """
+    打开录制文件
+
+    Returns:
+        (write(frame), close())
+    """
+    codec = VIDEO_CODECS.get(Path(path).suffix.lower())
+    if codec is not None:
+        writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*codec), fps,
+                                 (width, height))
+        if not writer.isOpened():
+            raise ValueError(f"无法创建录制文件: {path}")
+        bgr = np.empty((height, width, 3), np.uint8)
+
+        def write(frame):
+            writer.write(to_bgr(frame, fmt, dst=None if fmt == 'bgr' else bgr))
+        return write, writer.release
+
+    sink = FileSink(width, height, fps, path)
+    if sink.open(fmt) == fmt:
+        return sink.send, sink.close
+    # Y4M 固定为 I420，其他格式先转回 BGR 再转换
+    bgr = np.empty((height, width, 3), np.uint8)
+    i420 = np.empty(frame_shape('i420', width, height), np.uint8)
+
+    def write(frame):
+        cv2.cvtColor(to_bgr(frame, fmt, dst=None if fmt == 'bgr' else bgr),
+                     cv2.COLOR_BGR2YUV_I420, dst=i420)
+        sink.send(i420)
+    return write, sink.close
+
+
+def _record_worker(path, shm_name, fmt, width, height, fps, slots, free, filled, stop,
+                   messages):
+    """子进程入口：按顺序取出槽位中的帧编码写入，停止时先写完已提交的帧"""
+    # 编码是后台工作，降低优先级，CPU 紧张时让出给发送循环
+    if hasattr(os, 'nice'):
+        try:
+            os.nice(10)
+        except OSError:
+            pass
+    shm = shared_memory.SharedMemory(name=shm_name)
+    close = None
+    written = 0
+    try:
+        frames = _frame_views(shm.buf, fmt, width, height, slots)
+        write, close = _open_writer(path, fmt, width, height, fps)
+        messages.put(('ready', None))
+        index = 0
+        while True:
+            if not filled.acquire(timeout=0.1):
+                if stop.is_set():
+                    break
+                continue
+            write(frames[index])
+            index = (index + 1) % slots
+            written += 1
+            free.release()
+    except Exception as e:
+        messages.put(('error', str(e)))
+    finally:
+        if close is not None:
+            close()
+        frames = None
+        shm.close()
+        messages.put(('done', written))
+
+
+class FrameRecorder:
+    """
+    录制分流：发送循环中调用 offer()，编码在子进程中进行（单生产者 / 单消费者）
+
+    与 ProcessDecoder 方向相反：free 为空闲槽位数，filled 为已提交、尚未编码的
+    帧数。offer() 只尝试获取空闲槽位，不等待；没有空闲槽位（编码进程跟不上）
+    时丢弃这一帧并计数。
+    """
+
+    def __init__(self, path, fmt, width, height, fps, slots=8):
+        """
+        Args:
+            path: 录制文件路径（.mp4 / .avi 压缩，.y4m 为 YUV4MPEG2，其他为原始帧）
+            fmt: 发送帧的像素格式
+            width: 帧宽度
+            height: 帧高度
+            fps: 帧率（写入文件头，按发送帧率播放）
+            slots: 共享内存槽位数量，即编码进程最多落后的帧数
+        """
+        if slots < 1:
+            raise ValueError(f"录制缓冲区容量至少为 1: {slots}")
+        self.path = str(path)
+        self.fmt = fmt
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.slots = slots
+
+        self.shm = None
+        self.process = None
+        self._frames = None
+        self._write_index = 0
+        self.error = None
+
+        # 统计信息
+        self.offered = 0
+        self.dropped = 0
+        self.recorded = None      # 编码进程实际写入的帧数，close() 之后可用
+        self.copy_time = 0.0
+        self.max_copy_time = 0.0
+
+    @property
+    def fixed_rate(self):
+        """录制文件中是否写有帧率（压缩视频和 Y4M；原始帧文件没有）"""
+        suffix = Path(self.path).suffix.lower()
+        return suffix in VIDEO_CODECS or suffix == '.y4m'
+
+    def start(self, timeout=30.0):
+        """
+        创建共享内存并启动编码进程，等到录制文件打开后返回
+
+        子进程启动（解释器、cv2 和 numpy 的导入）在单核机器上要占用几百毫秒 CPU，
+        放在发送循环开始之前完成，不和最初几帧争抢。
+
+        Raises:
+            ValueError: 录制文件无法创建，或编码进程没有按时就绪
+        """
+        # 与 ProcessDecoder 一致使用 spawn
+        ctx = multiprocessing.get_context('spawn')
+        frame_bytes = int(np.prod(frame_shape(self.fmt, self.width, self.height)))
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=_align(frame_bytes) * self.slots)
+        self._frames = _frame_views(self.shm.buf, self.fmt, self.width,
+                                    self.height, self.slots)
+
+        self._free = ctx.Semaphore(self.slots)
+        self._filled = ctx.Semaphore(0)
+        self._stop = ctx.Event()
+        self._messages = ctx.Queue()
+        process = ctx.Process(
+            target=_record_worker, name="frame-recorder",
+            args=(self.path, self.shm.name, self.fmt, self.width, self.height, self.fps,
+                  self.slots, self._free, self._filled, self._stop, self._messages),
+            daemon=True)
+        process.start()
+        self.process = process
+
+        try:
+            kind, payload = self._messages.get(timeout=timeout)
+        except queue.Empty:
+            kind, payload = 'error', "编码进程启动超时"
+        if kind != 'ready':
+            self.close()
+            raise ValueError(f"无法开始录制: {payload}")
+        return self
+
+    def offer(self, frame):
+        """
+        提交一个刚发送的帧（不阻塞）
+
+        Returns:
+            是否已提交；没有空闲槽位或编码进程已退出时返回 False（计入丢帧）
+        """
+        self.offered += 1
+        if self.process is None or not self._free.acquire(False):
+            self.dropped += 1
+            return False
+        start = time.perf_counter()
+        slot = self._frames[self._write_index]
+        np.copyto(slot, frame.reshape(slot.shape))
+        self._write_index = (self._write_index + 1) % self.slots
+        self._filled.release()
+        elapsed = time.perf_counter() - start
+        self.copy_time += elapsed
+        self.max_copy_time = max(self.max_copy_time, elapsed)
+        return True
+
+    def poll_messages(self):
+        """取出编码进程发来的消息（不阻塞），记录错误和写入帧数"""
+        while True:
+            try:
+                kind, payload = self._messages.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                break
+            if kind == 'error':
+                self.error = payload
+            elif kind == 'done':
+                self.recorded = payload
+
+    def stats(self):
+        """返回录制统计信息"""
+        accepted = self.offered - self.dropped
+        return {
+            'offered': self.offered,
+            'dropped': self.dropped,
+            'avg_copy_ms': self.copy_time / accepted * 1000 if accepted else 0.0,
+            'max_copy_ms': self.max_copy_time * 1000,
+        }
+
+    def close(self, timeout=10.0):
+        """停止提交，等编码进程写完已提交的帧后释放共享内存"""
+        if self.process is not None:
+            self._stop.set()
+            self.process.join(timeout=timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+            self.poll_messages()
+            self.process = None
+        if self.shm is not None:
+            self._frames = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧调度器
+按时间戳把输出帧映射到源视频帧，使源帧率和输出帧率不同时播放速度保持正确：
+源帧率较高时跳过多余的源帧，源帧率较低时重复上一帧
+"""
+
+
+class FrameScheduler:
+    """
+    输出帧 → 源帧映射
+
+    第 n 个输出帧的显示时间为 n / output_fps，对应的源帧是显示时间
+    不晚于它的最后一帧，即 floor(n * source_fps / output_fps)。
+    """
+
+    def __init__(self, source_fps, output_fps):
+        """
+        Args:
+            source_fps: 源视频帧率（未知时传 0，此时逐帧输出）
+            output_fps: 输出帧率
+        """
+        if source_fps and source_fps > 0 and output_fps > 0:
+            self.ratio = source_fps / output_fps
+        else:
+            self.ratio = 1.0
+        self.source_fps = source_fps
+        self.output_fps = output_fps
+
+        self.tick = 0
+        self.source_index = -1    # 最近一次输出的源帧序号
+
+        # 统计信息
+        self.decoded = 0
+        self.skipped = 0
+        self.repeated = 0
+
+    @property
+    def passthrough(self):
+        """源帧率与输出帧率一致，每个输出帧正好对应一个源帧"""
+        return self.ratio == 1.0
+
+    def advance(self):
+        """
+        推进一个输出帧
+
+        Returns:
+            需要前进的源帧数：0 表示重复上一帧；n >= 1 表示先跳过 n - 1 帧，
+            再解码 1 帧
+        """
+        # 直接由 tick 计算目标帧，避免浮点累加误差
+        target = int(self.tick * self.ratio + 1e-9)
+        self.tick += 1
+
+        steps = target - self.source_index
+        self.source_index = target
+
+        if steps <= 0:
+            self.repeated += 1
+            return 0
+        self.decoded += 1
+        self.skipped += steps - 1
+        return steps
+
+    def stats(self):
+        """返回调度统计信息"""
+        return {
+            'source_fps': self.source_fps,
+            'output_fps': self.output_fps,
+            'decoded': self.decoded,
+            'skipped': self.skipped,
+            'repeated': self.repeated,
+        }
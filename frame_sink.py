@@ -0,0 +1,581 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧输出（Sink）
+把发送目标从 pyvirtualcam 中抽象出来，没有虚拟摄像头驱动时也可以运行和测量整条管线：
+- camera: pyvirtualcam 虚拟摄像头
+- null:   只计时，不输出
+- file:   原始帧文件或 Y4M 文件
+- shm:    multiprocessing.shared_memory 环形缓冲区，本机其他进程可零拷贝读取
+"""
+
+import struct
+import sys
+import time
+
+from lazy_import import lazy_import
+from pixel_format import PIXEL_FORMATS, FrameConverter, frame_shape, open_virtual_camera
+
+np = lazy_import('numpy')
+shared_memory = lazy_import('multiprocessing.shared_memory')
+
+
+class FrameSink:
+    """
+    帧输出基类
+
+    子类实现 _open() 和 _send()；send() 负责统计，
+    sleep_until_next_frame() 默认按输出帧率计时。
+    """
+
+    paced = True         # 是否按输出帧率发送（False 时调用方应全速运行）
+    fixed_rate = False   # 帧率打开后是否固定（如已写入文件头），为 True 时不能 set_fps()
+
+    def __init__(self, width, height, fps):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.fmt = None
+
+        self.frames_sent = 0
+        self.first_send_time = None
+        self.last_send_time = None
+        self.max_interval = 0.0
+        self._interval_sum = 0.0
+        self._interval_sq_sum = 0.0
+        self._deadline = None
+
+    @property
+    def device(self):
+        """输出设备描述"""
+        return type(self).__name__
+
+    def open(self, requested_format='auto'):
+        """
+        打开输出并协商像素格式
+
+        Returns:
+            实际使用的像素格式
+        """
+        self.fmt = self._open(requested_format)
+        return self.fmt
+
+    def _open(self, requested_format):
+        return 'bgr' if requested_format == 'auto' else requested_format
+
+    def send(self, frame):
+        """发送一帧"""
+        self._send(frame)
+
+        now = time.perf_counter()
+        if self.last_send_time is not None:
+            interval = now - self.last_send_time
+            self.max_interval = max(self.max_interval, interval)
+            self._interval_sum += interval
+            self._interval_sq_sum += interval * interval
+        else:
+            self.first_send_time = now
+        self.last_send_time = now
+        self.frames_sent += 1
+
+    def _send(self, frame):
+        raise NotImplementedError
+
+    def sleep_until_next_frame(self):
+        """休眠到下一帧的发送时间"""
+        now = time.perf_counter()
+        if self._deadline is None or now - self._deadline > 1.0:
+            self._deadline = now
+        self._deadline += 1.0 / self.fps
+        delay = self._deadline - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def set_fps(self, fps):
+        """
+        运行中修改输出帧率
+
+        Raises:
+            ValueError: 输出不支持修改帧率
+        """
+        self.fps = fps
+        self._deadline = None
+
+    def close(self):
+        """关闭输出"""
+
+    def stats(self):
+        """返回发送统计信息（jitter_ms 为帧间隔的标准差）"""
+        elapsed = 0.0
+        jitter = 0.0
+        intervals = self.frames_sent - 1
+        if self.first_send_time is not None:
+            elapsed = self.last_send_time - self.first_send_time
+        if intervals > 0:
+            mean = self._interval_sum / intervals
+            jitter = max(0.0, self._interval_sq_sum / intervals - mean * mean) ** 0.5
+        return {
+            'frames_sent': self.frames_sent,
+            'elapsed': elapsed,
+            'avg_fps': intervals / elapsed if elapsed > 0 else 0.0,
+            'max_interval_ms': self.max_interval * 1000,
+            'jitter_ms': jitter * 1000,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class PyVirtualCamSink(FrameSink):
+    """pyvirtualcam 虚拟摄像头"""
+
+    def __init__(self, width, height, fps, backend=None, device=None):
+        super().__init__(width, height, fps)
+        self.backend = backend
+        self.device_name = device
+        self.cam = None
+
+    @property
+    def device(self):
+        return self.cam.device if self.cam else 'pyvirtualcam'
+
+    def _open(self, requested_format):
+        self.cam, fmt = open_virtual_camera(self.width, self.height, self.fps,
+                                            requested_format, self.backend,
+                                            self.device_name)
+        return fmt
+
+    def _send(self, frame):
+        self.cam.send(frame)
+
+    def sleep_until_next_frame(self):
+        self.cam.sleep_until_next_frame()
+
+    def set_fps(self, fps):
+        # pyvirtualcam 的帧率在打开时确定，按原像素格式重新打开设备
+        old_fps = self.fps
+        self.close()
+        super().set_fps(fps)
+        try:
+            fmt = self._open(self.fmt)
+        except (RuntimeError, ValueError):
+            fmt = None
+        if fmt == self.fmt:
+            return
+        # 新帧率打不开（或只能以其他像素格式打开）时按原帧率恢复
+        self.close()
+        super().set_fps(old_fps)
+        self._open(self.fmt)
+        raise ValueError(f"虚拟摄像头不支持 {fps} FPS")
+
+    def close(self):
+        if self.cam is not None:
+            self.cam.close()
+            self.cam = None
+
+
+class NullSink(FrameSink):
+    """只计时、不输出的 Sink，用于测量管线吞吐量"""
+
+    def __init__(self, width, height, fps, paced=True):
+        """
+        Args:
+            paced: 是否按输出帧率休眠；False 时全速运行
+        """
+        super().__init__(width, height, fps)
+        self.paced = paced
+
+    @property
+    def device(self):
+        return 'null (计时)' if self.paced else 'null (不限速)'
+
+    def _send(self, frame):
+        pass
+
+    def sleep_until_next_frame(self):
+        if self.paced:
+            super().sleep_until_next_frame()
+
+
+class FileSink(FrameSink):
+    """
+    写入文件：扩展名为 .y4m 时写 YUV4MPEG2（I420），
+    否则按协商的像素格式写入紧密排列的原始帧
+    """
+
+    def __init__(self, width, height, fps, path):
+        super().__init__(width, height, fps)
+        self.path = str(path)
+        self.y4m = self.path.lower().endswith('.y4m')
+        self.fixed_rate = self.y4m   # Y4M 文件头中写有帧率，原始帧文件没有
+        self._file = None
+
+    @property
+    def device(self):
+        return self.path
+
+    def _open(self, requested_format):
+        fmt = 'i420' if self.y4m else super()._open(requested_format)
+        self._file = open(self.path, 'wb')
+        if self.y4m:
+            header = (f"YUV4MPEG2 W{self.width} H{self.height} F{self.fps}:1 "
+                      f"Ip A1:1 C420jpeg\n")
+            self._file.write(header.encode('ascii'))
+        return fmt
+
+    def set_fps(self, fps):
+        if self.fixed_rate:
+            raise ValueError(f"{self.path} 的文件头已写入 {self.fps} FPS，不能修改帧率")
+        super().set_fps(fps)
+
+    def _send(self, frame):
+        if self.y4m:
+            self._file.write(b'FRAME\n')
+        self._file.write(np.ascontiguousarray(frame).data)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# 共享内存布局：文件头 + 槽位表 + 帧数据（各帧按 64 字节对齐）
+SHM_MAGIC = b'VCAMSHM1'
+SHM_HEADER = struct.Struct('<8s8sIIdIIQ')   # 魔数、格式、宽、高、帧率、槽位数、单帧字节数、写入序号
+SHM_SLOT = struct.Struct('<Qd')             # 槽位中帧的序号、发送时间（time.perf_counter）
+SHM_DATA_OFFSET = 4096
+SHM_WRITE_SEQ_OFFSET = SHM_HEADER.size - 8
+SHM_FPS_OFFSET = struct.calcsize('<8s8sII')
+
+
+def _align(value, alignment=64):
+    return (value + alignment - 1) // alignment * alignment
+
+
+class SharedMemorySink(FrameSink):
+    """
+    共享内存环形缓冲区
+
+    每帧写入 seq % slots 号槽位，写入期间槽位序号置 0，写完后再更新
+    槽位序号和全局写入序号。读取方见 SharedMemoryFrameReader。
+    """
+
+    def __init__(self, width, height, fps, name='virtual_camera', slots=4):
+        super().__init__(width, height, fps)
+        self.name = name
+        self.slots = slots
+        self.shm = None
+        self._frames = None
+        self._seq = 0
+
+    @property
+    def device(self):
+        return f"shm:{self.name}"
+
+    def _open(self, requested_format):
+        fmt = super()._open(requested_format)
+        shape = frame_shape(fmt, self.width, self.height)
+        frame_bytes = int(np.prod(shape))
+        stride = _align(frame_bytes)
+        size = SHM_DATA_OFFSET + stride * self.slots
+
+        try:
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        except FileExistsError:
+            # 上次异常退出残留的共享内存
+            stale = shared_memory.SharedMemory(name=self.name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+
+        SHM_HEADER.pack_into(self.shm.buf, 0, SHM_MAGIC, fmt.encode('ascii'),
+                             self.width, self.height, float(self.fps),
+                             self.slots, frame_bytes, 0)
+        for slot in range(self.slots):
+            SHM_SLOT.pack_into(self.shm.buf, SHM_HEADER.size + slot * SHM_SLOT.size, 0, 0.0)
+
+        data = np.ndarray((self.slots, stride), dtype=np.uint8,
+                          buffer=self.shm.buf, offset=SHM_DATA_OFFSET)
+        self._frames = [data[i, :frame_bytes].reshape(shape) for i in range(self.slots)]
+        return fmt
+
+    def set_fps(self, fps):
+        super().set_fps(fps)
+        if self.shm is not None:
+            struct.pack_into('<d', self.shm.buf, SHM_FPS_OFFSET, float(fps))
+
+    def _send(self, frame):
+        slot = self._seq % self.slots
+        slot_offset = SHM_HEADER.size + slot * SHM_SLOT.size
+        seq = self._seq + 1
+
+        SHM_SLOT.pack_into(self.shm.buf, slot_offset, 0, 0.0)
+        np.copyto(self._frames[slot], frame.reshape(self._frames[slot].shape))
+        SHM_SLOT.pack_into(self.shm.buf, slot_offset, seq, time.perf_counter())
+        struct.pack_into('<Q', self.shm.buf, SHM_WRITE_SEQ_OFFSET, seq)
+        self._seq = seq
+
+    def close(self):
+        if self.shm is not None:
+            self._frames = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+def _attach_shared_memory(name):
+    """以读取方身份连接共享内存，不让 resource_tracker 在退出时删除它"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 之前没有 track 参数
+        shm = shared_memory.SharedMemory(name=name)
+        if sys.platform != 'win32':
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class SharedMemoryFrameReader:
+    """
+    SharedMemorySink 的读取方
+
+    read_next() 按顺序返回帧并统计被覆盖（丢失）的帧数；
+    返回的是共享内存中的视图，使用完之后应调用 is_valid(seq) 确认
+    该帧在读取期间没有被覆盖，需要长期保留时自行拷贝。
+    """
+
+    def __init__(self, name='virtual_camera'):
+        self.shm = _attach_shared_memory(name)
+        (magic, fmt, self.width, self.height, _, self.slots,
+         self.frame_bytes, _) = SHM_HEADER.unpack_from(self.shm.buf, 0)
+        if magic != SHM_MAGIC:
+            self.shm.close()
+            raise ValueError(f"不是虚拟摄像头共享内存: {name}")
+
+        self.fmt = fmt.rstrip(b'\0').decode('ascii')
+        if self.fmt not in PIXEL_FORMATS:
+            self.shm.close()
+            raise ValueError(f"不支持的像素格式: {self.fmt}")
+        shape = frame_shape(self.fmt, self.width, self.height)
+        stride = _align(self.frame_bytes)
+        data = np.ndarray((self.slots, stride), dtype=np.uint8,
+                          buffer=self.shm.buf, offset=SHM_DATA_OFFSET)
+        self._frames = [data[i, :self.frame_bytes].reshape(shape) for i in range(self.slots)]
+
+        # 从连接时的最新一帧之后开始读取
+        self.last_seq = self.write_seq
+        self.dropped = 0
+
+    @property
+    def fps(self):
+        """写入方当前的输出帧率（控制接口修改帧率后随之更新）"""
+        return struct.unpack_from('<d', self.shm.buf, SHM_FPS_OFFSET)[0]
+
+    @property
+    def write_seq(self):
+        """写入方最新的帧序号"""
+        return struct.unpack_from('<Q', self.shm.buf, SHM_WRITE_SEQ_OFFSET)[0]
+
+    def _slot_info(self, seq):
+        slot = (seq - 1) % self.slots
+        slot_seq, timestamp = SHM_SLOT.unpack_from(
+            self.shm.buf, SHM_HEADER.size + slot * SHM_SLOT.size)
+        return slot, slot_seq, timestamp
+
+    def is_valid(self, seq):
+        """该序号的帧是否仍在共享内存中"""
+        return self._slot_info(seq)[1] == seq
+
+    def read_next(self, timeout=None):
+        """
+        读取下一帧
+
+        Args:
+            timeout: 没有新帧时的最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            (seq, frame, send_time)；超时返回 None
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            write_seq = self.write_seq
+            if write_seq > self.last_seq:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            time.sleep(0.0005)
+
+        seq = self.last_seq + 1
+        # 太旧的帧已经被覆盖，跳到仍可读取的最早一帧（保留一个槽位给写入方）
+        oldest = max(1, write_seq - self.slots + 2)
+        if seq < oldest:
+            self.dropped += oldest - seq
+            seq = oldest
+
+        slot, slot_seq, timestamp = self._slot_info(seq)
+        if slot_seq != seq:
+            # 读取期间被覆盖，改读最新一帧
+            seq = self.write_seq
+            self.dropped += max(0, seq - self.last_seq - 1)
+            slot, slot_seq, timestamp = self._slot_info(seq)
+
+        self.last_seq = seq
+        return seq, self._frames[slot], timestamp
+
+    def close(self):
+        self._frames = None
+        self.shm.close()
+
+
+def create_sink(spec, width, height, fps, backend=None):
+    """
+    按描述字符串创建 Sink
+
+    Args:
+        spec: 'camera'、'camera:设备'、'null'、'null:unpaced'、'file:路径' 或 'shm:名称'
+        backend: pyvirtualcam 后端（仅 camera）
+    """
+    kind, _, arg = spec.partition(':')
+    if kind == 'camera':
+        return PyVirtualCamSink(width, height, fps, backend=backend, device=arg or None)
+    if kind == 'null':
+        return NullSink(width, height, fps, paced=(arg != 'unpaced'))
+    if kind == 'file':
+        if not arg:
+            raise ValueError("file 输出需要指定路径，如 file:output.y4m")
+        return FileSink(width, height, fps, arg)
+    if kind == 'shm':
+        return SharedMemorySink(width, height, fps, name=arg or 'virtual_camera')
+    raise ValueError(f"未知的输出类型: {spec}")
+
+
+def _output_problem(width, height, fps, pixel_format):
+    """输出配置无效的原因，有效时返回 None"""
+    if width <= 0 or height <= 0:
+        return "宽高必须为正数"
+    if fps <= 0:
+        return "帧率必须为正数"
+    if pixel_format in ('i420', 'nv12', 'yuyv') and (width % 2 or height % 2):
+        return f"{pixel_format} 格式要求宽高为偶数"
+    return None
+
+
+class OutputSpec:
+    """一路输出的配置：分辨率、帧率、像素格式和 Sink"""
+
+    def __init__(self, width, height, fps, pixel_format='auto', sink='camera'):
+        """
+        Raises:
+            ValueError: 宽高或帧率不是正数，或 YUV 4:2:x 格式的宽高为奇数
+        """
+        problem = _output_problem(width, height, fps, pixel_format)
+        if problem:
+            raise ValueError(f"无效的输出分辨率: {width}x{height}@{fps}（{problem}）")
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.pixel_format = pixel_format
+        self.sink = sink
+
+    def __str__(self):
+        sink = self.sink if isinstance(self.sink, str) else self.sink.device
+        return f"{self.width}x{self.height}@{self.fps} {self.pixel_format} -> {sink}"
+
+
+def parse_output_spec(text, fps=30, pixel_format='auto', sink='camera'):
+    """
+    解析输出描述：WIDTHxHEIGHT[@FPS][,fmt=格式][,sink=输出]
+
+    例如 "1920x1080@60"、"854x480@15,fmt=i420,sink=shm:monitor"，
+    未指定的项使用给定的默认值。
+    """
+    size, *options = text.split(',')
+    try:
+        if '@' in size:
+            size, fps_text = size.split('@', 1)
+            fps = int(fps_text)
+        width, height = (int(v) for v in size.lower().split('x'))
+    except ValueError:
+        raise ValueError(f"无效的输出分辨率: {text}") from None
+
+    for option in options:
+        key, _, value = option.partition('=')
+        if key == 'fmt':
+            pixel_format = value
+        elif key == 'sink':
+            sink = value
+        else:
+            raise ValueError(f"未知的输出选项: {option}")
+
+    problem = _output_problem(width, height, fps, pixel_format)
+    if problem:
+        raise ValueError(f"无效的输出分辨率: {text}（{problem}）")
+    return OutputSpec(width, height, fps, pixel_format, sink)
+
+
+class OutputChannel:
+    """
+    一路输出的运行时状态
+
+    按主时钟节拍决定本路是否发送，并把管线的中间帧缩放、转换为本路的
+    分辨率和像素格式；与中间帧一致时直接发送，不做任何处理。
+    """
+
+    def __init__(self, spec, master_fps):
+        self.spec = spec
+        if isinstance(spec.sink, FrameSink):
+            self.sink = spec.sink
+        else:
+            self.sink = create_sink(spec.sink, spec.width, spec.height, spec.fps)
+        self.ratio = spec.fps / master_fps
+        self.converter = None
+        self.standby_frame = None
+        self.stamper = None      # latency_probe.FrameStamper，开启延迟探测时设置
+        self.recorder = None     # frame_recorder.FrameRecorder，开启录制时设置
+        self._tick = 0
+        self._last_target = -1
+
+    def open(self):
+        """打开 Sink，返回协商后的像素格式"""
+        return self.sink.open(self.spec.pixel_format)
+
+    def bind(self, fmt, width, height, fit='stretch'):
+        """绑定管线中间帧的格式，决定本路是否需要缩放/转换"""
+        if (self.sink.fmt, self.spec.width, self.spec.height) != (fmt, width, height):
+            self.converter = FrameConverter(self.sink.fmt, self.spec.width, self.spec.height,
+                                            fit=fit)
+        else:
+            self.converter = None
+
+    def convert(self, frame):
+        """把中间帧转换为本路输出格式"""
+        return frame if self.converter is None else self.converter(frame)
+
+    def due(self):
+        """推进一个主时钟节拍，返回本路是否需要在这一拍发送"""
+        target = int(self._tick * self.ratio + 1e-9)
+        self._tick += 1
+        if target == self._last_target:
+            return False
+        self._last_target = target
+        return True
+
+    def send(self, frame):
+        """发送中间帧"""
+        self.emit(self.convert(frame))
+
+    def emit(self, frame):
+        """
+        发送已是本路格式的帧（开启延迟探测时在发送前画上帧号条码；
+        开启录制时发送之后把同一帧交给录制进程）
+        """
+        if self.stamper is not None:
+            frame = self.stamper.stamp(frame)
+        self.sink.send(frame)
+        if self.recorder is not None:
+            self.recorder.offer(frame)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+逐帧耗时统计
+解码、缩放、颜色转换、发送、休眠各阶段的耗时记入固定分桶的直方图，
+同时统计迟到帧、丢帧和循环衔接耗时；可定期导出 JSON 快照和 Prometheus 文本
+"""
+
+import json
+import os
+import time
+from bisect import bisect_left
+
+
+# 直方图分桶上限（秒），最后一个桶为 +Inf
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.004, 0.008,
+                   0.016, 0.033, 0.05, 0.1, 0.25)
+
+STAGES = ('decode', 'resize', 'convert', 'overlay', 'send', 'sleep', 'frame', 'loop_seek')
+
+
+class LatencyHistogram:
+    """
+    固定分桶的耗时直方图
+
+    record() 只做一次二分查找和几次加法，可以在每帧的热路径上调用。
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """记录一次耗时（秒）"""
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """
+        估算百分位数（秒）
+
+        返回该百分位所在桶的上限（不超过最大值），落在 +Inf 桶时返回最大值。
+        """
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            cumulative += n
+            if cumulative >= rank:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self):
+        """返回直方图的可序列化快照（毫秒）"""
+        return {
+            'count': self.count,
+            'avg_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'p50_ms': self.percentile(50) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'max_ms': self.max * 1000,
+            'buckets_ms': [b * 1000 for b in self.buckets],
+            'counts': list(self.counts),
+        }
+
+
+class FrameStats:
+    """
+    各阶段耗时直方图 + 帧计数器
+
+    各阶段分别只由一个线程记录（后台解码时 decode/resize/convert 在解码线程，
+    send/sleep 在发送线程），不需要加锁。
+    """
+
+    def __init__(self, json_path=None, prometheus_path=None, interval=5.0):
+        """
+        Args:
+            json_path: 定期写入 JSON 快照的路径，None 表示不导出
+            prometheus_path: 定期写入 Prometheus 文本格式的路径（可供
+                             node_exporter textfile collector 读取），None 表示不导出
+            interval: 导出间隔（秒）
+        """
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self.frames = 0
+        self.late_frames = 0
+        self.dropped_frames = 0
+        self.loops = 0
+        self._sources = {}
+
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self.interval = interval
+        self.start_time = time.time()
+        self._next_export = time.perf_counter() + interval
+
+    def add_source(self, name, func):
+        """
+        附加其他组件的统计信息，导出时调用 func() 取得当前值
+
+        func 返回 {名称: 数值}；数值项同时以 virtual_camera_<name>_<key>
+        的形式输出到 Prometheus 文本。
+        """
+        self._sources[name] = func
+
+    def record(self, stage, seconds):
+        """记录某个阶段的耗时（秒）"""
+        self.histograms[stage].record(seconds)
+
+    def record_frame(self, seconds, frame_time, dropped=False):
+        """
+        记录一个输出帧的总耗时
+
+        Args:
+            seconds: 从取帧到发送完成的耗时（不含休眠）
+            frame_time: 帧间隔（秒），超过时记为迟到帧
+            dropped: 这一帧没有新的源帧可发送（重发了上一帧）
+        """
+        self.histograms['frame'].record(seconds)
+        self.frames += 1
+        if seconds > frame_time:
+            self.late_frames += 1
+        if dropped:
+            self.dropped_frames += 1
+
+    def record_loop(self, seconds):
+        """记录一次循环衔接（回跳或切换解码器）的耗时"""
+        self.histograms['loop_seek'].record(seconds)
+        self.loops += 1
+
+    def snapshot(self):
+        """返回全部统计信息的可序列化快照"""
+        return {
+            'timestamp': time.time(),
+            'uptime': time.time() - self.start_time,
+            'frames': self.frames,
+            'late_frames': self.late_frames,
+            'dropped_frames': self.dropped_frames,
+            'loops': self.loops,
+            'stages': {stage: h.snapshot() for stage, h in self.histograms.items()},
+            **{name: func() for name, func in self._sources.items()},
+        }
+
+    def summary(self):
+        """单行摘要，用于控制台和 GUI 状态栏"""
+        parts = [f"{stage} {h.percentile(50) * 1000:.1f}/{h.percentile(99) * 1000:.1f}"
+                 for stage, h in self.histograms.items()
+                 if h.count and stage != 'loop_seek']
+        return (f"耗时 p50/p99 (ms): {', '.join(parts)} | "
+                f"迟到 {self.late_frames} 帧, 丢帧 {self.dropped_frames} 帧")
+
+    def prometheus_text(self):
+        """以 Prometheus 文本格式输出全部指标"""
+        lines = [
+            '# HELP virtual_camera_stage_seconds Per-frame time spent in each pipeline stage.',
+            '# TYPE virtual_camera_stage_seconds histogram',
+        ]
+        for stage, h in self.histograms.items():
+            cumulative = 0
+            for bound, n in zip(h.buckets, h.counts):
+                cumulative += n
+                lines.append(f'virtual_camera_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} '
+                             f'{cumulative}')
+            lines.append(f'virtual_camera_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} '
+                         f'{h.count}')
+            lines.append(f'virtual_camera_stage_seconds_sum{{stage="{stage}"}} {h.total}')
+            lines.append(f'virtual_camera_stage_seconds_count{{stage="{stage}"}} {h.count}')
+
+        for name, value, help_text in (
+                ('frames_total', self.frames, 'Frames sent.'),
+                ('late_frames_total', self.late_frames, 'Frames that took longer than the frame interval.'),
+                ('dropped_frames_total', self.dropped_frames, 'Frames re-sent because no new frame was ready.'),
+                ('loops_total', self.loops, 'Times the video looped back to the start.')):
+            lines.append(f'# HELP virtual_camera_{name} {help_text}')
+            lines.append(f'# TYPE virtual_camera_{name} counter')
+            lines.append(f'virtual_camera_{name} {value}')
+
+        for source, func in self._sources.items():
+            for key, value in func().items():
+                if isinstance(value, (int, float)):
+                    lines.append(f'# TYPE virtual_camera_{source}_{key} gauge')
+                    lines.append(f'virtual_camera_{source}_{key} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        """立即写出 JSON 快照和 Prometheus 文件（先写临时文件再替换）"""
+        for path, render in ((self.json_path, lambda: json.dumps(self.snapshot(), indent=2)),
+                             (self.prometheus_path, self.prometheus_text)):
+            if not path:
+                continue
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(render())
+            os.replace(tmp_path, path)
+
+    def maybe_export(self):
+        """距上次导出超过 interval 时导出一次"""
+        if not (self.json_path or self.prometheus_path):
+            return
+        now = time.perf_counter()
+        if now >= self._next_export:
+            self._next_export = now + self.interval
+            self.export()
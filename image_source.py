@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片和测试图案输入
+单张图片、图片目录（序列帧）和程序生成的测试图案都在启动时一次性解码、
+缩放并转换为输出格式，放进与预解码相同的内存帧数组，之后每帧只按引用发送，
+不再有任何解码开销
+"""
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from lazy_import import lazy_import
+from pixel_format import FrameConverter
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp', '.tif', '.tiff')
+PATTERNS = ('bars', 'grid', 'ramp')
+PATTERN_PREFIX = 'pattern:'
+
+
+def image_source_kind(source):
+    """
+    判断输入类型
+
+    Returns:
+        'pattern'（pattern:名称）、'image'（单张图片）、'directory'（图片目录），
+        其他输入（视频文件）返回 None
+    """
+    source = str(source)
+    if source.startswith(PATTERN_PREFIX):
+        return 'pattern'
+    path = Path(source)
+    if path.is_dir():
+        return 'directory'
+    if path.suffix.lower() in IMAGE_EXTENSIONS:
+        return 'image'
+    return None
+
+
+def _natural_key(path):
+    # frame2.png 排在 frame10.png 之前
+    return [int(part) if part.isdigit() else part.lower()
+            for part in re.split(r'(\d+)', path.name)]
+
+
+def list_images(directory):
+    """目录中的图片文件，按文件名自然排序"""
+    paths = [p for p in Path(directory).iterdir()
+             if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS]
+    return sorted(paths, key=_natural_key)
+
+
+def read_image(path):
+    """读取图片为 BGR（带透明通道的图片按黑色背景合成）"""
+    image = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError(f"无法读取图片: {path}")
+    if image.dtype != np.uint8:
+        image = cv2.convertScaleAbs(image, alpha=255.0 / np.iinfo(image.dtype).max)
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    if image.shape[2] == 4:
+        alpha = image[:, :, 3:].astype(np.uint16)
+        return ((image[:, :, :3] * alpha + 127) // 255).astype(np.uint8)
+    return image
+
+
+def render_test_pattern(name, width, height):
+    """
+    生成测试图案（BGR）
+
+    - bars: 75% 彩条，下方为黑白灰阶块
+    - grid: 黑底白色网格和中心十字，用于检查缩放、裁剪和几何变形
+    - ramp: 水平灰阶渐变，用于检查色带和颜色转换
+    """
+    if name not in PATTERNS:
+        raise ValueError(f"未知的测试图案: {name}（支持: {', '.join(PATTERNS)}）")
+    frame = np.zeros((height, width, 3), np.uint8)
+
+    if name == 'bars':
+        colors = [(191, 191, 191), (0, 191, 191), (191, 191, 0), (0, 191, 0),
+                  (191, 0, 191), (0, 0, 191), (191, 0, 0)]
+        edges = np.linspace(0, width, len(colors) + 1).astype(int)
+        split = height * 3 // 4
+        for color, x0, x1 in zip(colors, edges[:-1], edges[1:]):
+            frame[:split, x0:x1] = color
+        steps = np.linspace(0, width, 6).astype(int)
+        for i, (x0, x1) in enumerate(zip(steps[:-1], steps[1:])):
+            frame[split:, x0:x1] = i * 255 // 4
+    elif name == 'grid':
+        step = max(8, min(width, height) // 12)
+        frame[::step, :] = 255
+        frame[:, ::step] = 255
+        frame[-1, :] = 255
+        frame[:, -1] = 255
+        cv2.line(frame, (width // 2, 0), (width // 2, height - 1), (0, 0, 255), 2)
+        cv2.line(frame, (0, height // 2), (width - 1, height // 2), (0, 0, 255), 2)
+        cv2.circle(frame, (width // 2, height // 2), min(width, height) // 3, (0, 255, 0), 2)
+    else:
+        ramp = np.linspace(0, 255, width).round().astype(np.uint8)
+        frame[:] = ramp[None, :, None]
+    return frame
+
+
+def load_image_frames(paths, fmt, width, height, fit='stretch', max_bytes=None,
+                      max_workers=None):
+    """
+    并行解码一组图片，缩放并转换后写入一块连续的 (N, ...) 帧数组
+
+    imread 和 resize 都会释放 GIL，按线程数分段解码；每个线程使用自己的
+    FrameConverter（转换器内部有复用的缓冲区，不能跨线程共享）。
+
+    Args:
+        paths: 图片路径列表
+        fmt: 输出像素格式
+        width: 输出宽度
+        height: 输出高度
+        fit: 画面适配方式
+        max_bytes: 内存上限（字节），None 表示不限制
+        max_workers: 最大线程数，None 表示 CPU 核数
+
+    Returns:
+        帧数组
+
+    Raises:
+        ValueError: 没有图片、超出内存上限或图片无法读取
+    """
+    if not paths:
+        raise ValueError("没有可读取的图片")
+    probe = FrameConverter(fmt, width, height, fit=fit)
+    if max_bytes is not None and len(paths) * probe.nbytes > max_bytes:
+        raise ValueError(f"图片序列需要 {len(paths) * probe.nbytes / (1024 * 1024):.0f} MB，"
+                         f"超出内存上限")
+
+    arena = np.empty((len(paths),) + probe.shape, dtype=np.uint8)
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(paths)))
+    chunks = [range(i, len(paths), workers) for i in range(workers)]
+
+    def decode(indices):
+        converter = FrameConverter(fmt, width, height, fit=fit)
+        for i in indices:
+            converter(read_image(paths[i]), dst=arena[i])
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # list() 让工作线程中的异常在这里抛出
+        list(pool.map(decode, chunks))
+    return arena
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端延迟探测
+发送方在每帧顶部画一条黑白块条码，写入帧号和发送时刻（单调时钟）；接收方从
+收到的画面中解出条码，计算每帧从发送到被看到的延迟，并统计丢帧和乱序。
+条码按画面宽度等比例排布，只占用亮度，经过颜色转换和缩放后仍可解码
+"""
+
+import json
+import time
+import zlib
+
+from frame_stats import LatencyHistogram
+from lazy_import import lazy_import
+from overlay import _plane_views
+
+np = lazy_import('numpy')
+
+
+MAGIC = 0xA5
+COLUMNS = 32
+ROWS = 3
+PAYLOAD_BITS = COLUMNS * ROWS           # 8 位标志 + 32 位帧号 + 48 位发送时刻 + 8 位校验
+TIME_MASK = (1 << 48) - 1               # 发送时刻为 perf_counter 微秒数的低 48 位
+
+
+def _now_us():
+    # perf_counter 在各平台上都是系统范围的单调时钟，不同进程之间可以直接比较
+    return time.perf_counter_ns() // 1000
+
+
+def block_size(width):
+    """条码每一块的边长（像素，偶数，YUV 4:2:0 下色度与块对齐）"""
+    return max(2, (width // COLUMNS) & ~1)
+
+
+def encode_bits(frame_id, send_us):
+    """帧号和发送时刻编码为 (ROWS, COLUMNS) 的 0/1 数组"""
+    body = ((MAGIC << 80) | ((frame_id & 0xFFFFFFFF) << 48) | (send_us & TIME_MASK))
+    data = body.to_bytes(11, 'big')
+    data += bytes([zlib.crc32(data) & 0xFF])
+    bits = np.unpackbits(np.frombuffer(data, np.uint8))
+    return bits.reshape(ROWS, COLUMNS)
+
+
+def decode_bits(bits):
+    """
+    从 (ROWS, COLUMNS) 的 0/1 数组解出 (帧号, 发送时刻微秒)
+
+    标志或校验不符（画面中没有条码、条码被遮挡或损坏）时返回 None。
+    """
+    data = np.packbits(bits.reshape(-1).astype(np.uint8)).tobytes()
+    if data[0] != MAGIC or zlib.crc32(data[:11]) & 0xFF != data[11]:
+        return None
+    body = int.from_bytes(data[:11], 'big')
+    return (body >> 48) & 0xFFFFFFFF, body & TIME_MASK
+
+
+def luma(frame, fmt, width, height):
+    """取一帧的亮度平面 (height, width) 视图（BGR 取绿色通道，对黑白块足够）"""
+    if fmt == 'bgr':
+        return frame[:, :, 1]
+    if fmt == 'yuyv':
+        return frame[:, :, 0]
+    return frame[:height].reshape(height, width)
+
+
+class FrameStamper:
+    """
+    发送方：在每帧顶部画上帧号条码
+
+    只改写条码所在的区域（亮度为黑白块，色度置中性），原地修改；帧是只读的
+    （如帧缓存的 memmap、缓存的待机画面）时先拷贝到内部缓冲区。
+    """
+
+    def __init__(self, fmt, width, height):
+        self.fmt = fmt
+        self.width = width
+        self.height = height
+        self.block = block_size(width)
+        if self.block * ROWS > height:
+            raise ValueError(f"画面太小，放不下延迟探测条码: {width}x{height}")
+        self.frame_id = 0
+        self._buffer = None
+
+    def stamp(self, frame):
+        """画上下一个帧号和当前时刻，返回画好的帧（原帧或内部缓冲区）"""
+        if not frame.flags.writeable:
+            if self._buffer is None:
+                self._buffer = np.empty_like(frame)
+            np.copyto(self._buffer, frame)
+            frame = self._buffer
+
+        bits = encode_bits(self.frame_id, _now_us()).astype(np.uint8) * np.uint8(255)
+        self.frame_id += 1
+        block = self.block
+        w = block * COLUMNS
+
+        # 先展开成一行像素，再整行复制到这一行块的每一行像素（按通道广播要慢上百倍）
+        if self.fmt == 'bgr':
+            rows = np.repeat(bits, block * 3, axis=1).reshape(ROWS, w, 3)
+            planes = [frame]
+        elif self.fmt == 'yuyv':
+            rows = np.full((ROWS, w, 2), 128, np.uint8)
+            rows[:, :, 0] = np.repeat(bits, block, axis=1)
+            planes = [frame]
+        else:
+            rows = np.repeat(bits, block, axis=1)[:, :, None]
+            planes = _plane_views(frame, self.fmt, self.width, self.height)
+            for plane in planes[1:]:
+                plane[:ROWS * block // 2, :w // 2] = 128   # 色度置中性，条码为纯黑白
+        for r in range(ROWS):
+            planes[0][r * block:(r + 1) * block, :w] = rows[r]
+        return frame
+
+
+def read_stamp(frame, fmt, width, height):
+    """
+    接收方：从一帧中解出条码
+
+    按块取平均亮度再以中间值二值化，对缩放、压缩造成的边缘模糊不敏感。
+
+    Returns:
+        (帧号, 发送时刻微秒)，没有有效条码时返回 None
+    """
+    block = block_size(width)
+    if block * ROWS > height:
+        return None
+    plane = luma(frame, fmt, width, height)
+    # 每块只取中间一半，避开块边缘
+    margin = block // 4
+    bits = np.empty((ROWS, COLUMNS), bool)
+    for r in range(ROWS):
+        band = plane[r * block + margin:(r + 1) * block - margin, :block * COLUMNS]
+        profile = band.mean(axis=0).reshape(COLUMNS, block)
+        bits[r] = profile[:, margin:block - margin].mean(axis=1) > 128
+    return decode_bits(bits)
+
+
+class LatencyReport:
+    """
+    接收方的统计：逐帧延迟、丢帧、乱序和重复
+
+    - 丢帧：帧号跳过的个数
+    - 乱序：帧号小于已经见过的最大帧号
+    - 重复：与上一帧帧号相同（摄像头重复输出同一帧），不计入延迟
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.histogram = LatencyHistogram()
+        self.frames = 0
+        self.decoded = 0
+        self.undecodable = 0
+        self.dropped = 0
+        self.reordered = 0
+        self.repeated = 0
+        self._last_id = None
+        self._max_id = None
+
+    def record(self, stamp, receive_us=None):
+        """
+        记录一帧
+
+        Args:
+            stamp: read_stamp() 的结果，None 表示这一帧没有有效条码
+            receive_us: 收到的时刻（perf_counter 微秒），None 表示现在
+        """
+        self.frames += 1
+        if stamp is None:
+            self.undecodable += 1
+            return
+        receive_us = _now_us() if receive_us is None else receive_us
+        frame_id, send_us = stamp
+        self.decoded += 1
+
+        if frame_id == self._last_id:
+            self.repeated += 1
+            return
+        self._last_id = frame_id
+        if self._max_id is not None:
+            if frame_id < self._max_id:
+                self.reordered += 1
+            else:
+                self.dropped += frame_id - self._max_id - 1
+        if self._max_id is None or frame_id > self._max_id:
+            self._max_id = frame_id
+
+        latency = ((receive_us - send_us) & TIME_MASK) / 1e6
+        self.latencies.append(latency)
+        self.histogram.record(latency)
+
+    def to_dict(self):
+        """返回可序列化的报告（毫秒）"""
+        latencies = np.array(self.latencies) * 1000
+        percentiles = {}
+        if latencies.size:
+            for p in (50, 90, 95, 99, 99.9):
+                percentiles[f"p{p:g}_ms"] = float(np.percentile(latencies, p))
+        return {
+            'frames': self.frames,
+            'decoded': self.decoded,
+            'undecodable': self.undecodable,
+            'dropped': self.dropped,
+            'reordered': self.reordered,
+            'repeated': self.repeated,
+            'min_ms': float(latencies.min()) if latencies.size else 0.0,
+            'avg_ms': float(latencies.mean()) if latencies.size else 0.0,
+            'max_ms': float(latencies.max()) if latencies.size else 0.0,
+            **percentiles,
+            'histogram': self.histogram.snapshot(),
+        }
+
+    def summary(self):
+        """单行摘要"""
+        report = self.to_dict()
+        if not self.latencies:
+            return f"收到 {self.frames} 帧，没有解出条码（发送方是否开启了 --latency-probe？）"
+        return (f"收到 {self.frames} 帧（条码 {self.decoded}）| 延迟 p50/p99/最大 "
+                f"{report['p50_ms']:.2f}/{report['p99_ms']:.2f}/{report['max_ms']:.2f} ms | "
+                f"丢帧 {self.dropped} | 乱序 {self.reordered} | 重复 {self.repeated}")
+
+    def write(self, path):
+        """写入 JSON 报告"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+class Y4mFollower:
+    """
+    边写边读 FileSink 写出的 .y4m 文件（类似 tail -f）
+
+    文件中已有的帧直接跳过，只读取连接之后新写入的帧，以读到完整一帧的时刻
+    作为接收时刻。
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        header = self._read_line(timeout=5.0)
+        if not header or not header.startswith(b'YUV4MPEG2'):
+            self._file.close()
+            raise ValueError(f"不是 YUV4MPEG2 文件: {path}")
+        fields = {token[:1]: token[1:] for token in header.split()[1:]}
+        self.width = int(fields[b'W'])
+        self.height = int(fields[b'H'])
+        self.fmt = 'i420'
+        self.frame_bytes = self.width * self.height * 3 // 2
+        self.record_bytes = len(b'FRAME\n') + self.frame_bytes
+        # 对齐到最后一个完整帧之后
+        self._file.seek(0, 2)
+        size = self._file.tell() - len(header)
+        self._file.seek(len(header) + size // self.record_bytes * self.record_bytes)
+        self._pending = b''
+
+    def _read_line(self, timeout):
+        deadline = time.perf_counter() + timeout
+        line = b''
+        while not line.endswith(b'\n'):
+            line += self._file.readline()
+            if not line.endswith(b'\n') and time.perf_counter() >= deadline:
+                return None
+            if not line.endswith(b'\n'):
+                time.sleep(0.001)
+        return line
+
+    def read_next(self, timeout=None):
+        """读取下一帧，返回 (帧, 接收时刻微秒)；超时返回 None"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while len(self._pending) < self.record_bytes:
+            data = self._file.read(self.record_bytes - len(self._pending))
+            if data:
+                self._pending += data
+                continue
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            time.sleep(0.0005)
+        record, self._pending = self._pending, b''
+        if not record.startswith(b'FRAME'):
+            raise ValueError("YUV4MPEG2 帧头错误")
+        frame = np.frombuffer(record, np.uint8, self.frame_bytes, len(b'FRAME\n'))
+        return frame.reshape(self.height * 3 // 2, self.width), _now_us()
+
+    def close(self):
+        self._file.close()
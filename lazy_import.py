@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+延迟导入
+cv2、numpy、PIL、pyautogui 等模块导入一次要几十到几百毫秒，pyautogui 导入时
+还会连接显示器（无显示器的机器上直接失败）。模块顶层改用 lazy_import() 得到
+占位模块，第一次访问属性时才真正导入，--help、图形界面等启动路径不再为用不到
+的模块付出代价
+"""
+
+import importlib
+import importlib.util
+import sys
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    占位模块
+
+    第一次访问属性时导入真正的模块，并把它的属性复制到占位模块上。属性查找
+    沿用模块自身的 C 实现（未找到时才调用模块级 __getattr__，PEP 562），加载
+    之后的访问与直接访问真正的模块一样快。同一模块在多个线程中同时首次访问
+    时由导入系统的模块锁保证只导入一次。
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['__getattr__'] = self._getattr
+
+    def _getattr(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        # 修改模块属性（如 pyautogui.FAILSAFE）必须作用在真正的模块上
+        setattr(self._load(), attr, value)
+        self.__dict__[attr] = value
+
+    def _load(self):
+        module = importlib.import_module(self.__name__)
+        # 真正的模块有自己的 __getattr__（如 numpy 按需加载子模块）时会覆盖
+        # 占位的 __getattr__，未复制过来的属性仍由它处理
+        self.__dict__.update(module.__dict__)
+        return module
+
+
+def lazy_import(name):
+    """
+    返回模块 name 的占位模块，第一次访问属性时才真正导入
+
+    模块是否已安装在调用时就检查（只查找顶层包、不执行），缺少依赖时和普通
+    import 一样立即抛出 ModuleNotFoundError，可以照常用 try/except ImportError
+    判断。已经导入过的模块直接返回。
+
+    Raises:
+        ModuleNotFoundError: 模块未安装
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    # 查找子模块（如 PIL.Image）会先执行父包，这里只查找顶层包
+    package = name.partition('.')[0]
+    if importlib.util.find_spec(package) is None:
+        raise ModuleNotFoundError(f"No module named '{package}'", name=package)
+    return LazyModule(name)
+
+
+def preload(*names):
+    """
+    在后台线程中依次导入模块（如界面显示出来之后预先导入 cv2 和 numpy），
+    真正用到时不必再等待；导入失败时忽略，留到真正使用时再报错
+
+    Returns:
+        后台线程
+    """
+    def run():
+        for name in names:
+            try:
+                importlib.import_module(name)
+            except Exception:
+                pass
+
+    thread = threading.Thread(target=run, name='preload', daemon=True)
+    thread.start()
+    return thread
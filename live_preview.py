@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+发送画面的实时预览
+每隔若干帧取样一次，按输出像素格式直接缩小各平面（面积平均）到预分配的
+缩略图缓冲区，再转换为 PPM 数据交给 Tk PhotoImage 显示，不经过 PIL。
+取样只在帧发送之后、距下一帧还有余量时进行，并受 CPU 预算限制，不会推迟发送
+"""
+
+import time
+
+from lazy_import import lazy_import
+from overlay import _plane_views
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+class FramePreview:
+    """
+    缩略图取样器
+
+    发送线程在每帧发送后调用 offer()，界面线程定时调用 take() 取走最新的
+    缩略图。缩略图缓冲区只有一个：界面线程取走之前不会再次取样，因此
+    两个线程不会同时访问它，也不需要加锁。
+    """
+
+    def __init__(self, fmt, width, height, max_width=320, max_height=180, every=5,
+                 budget=0.02):
+        """
+        Args:
+            fmt: 发送帧的像素格式
+            width: 发送帧宽度
+            height: 发送帧高度
+            max_width: 缩略图最大宽度
+            max_height: 缩略图最大高度
+            every: 每隔多少个发送帧取样一次
+            budget: CPU 预算，取样耗时占墙上时间的比例上限（0.02 即单核的 2%）
+        """
+        self.fmt = fmt
+        self.width = width
+        self.height = height
+        self.every = max(1, every)
+        self.budget = budget
+
+        # 等比缩小，宽高取偶数（YUV 4:2:x 的色度平面减半）
+        scale = min(max_width / width, max_height / height, 1.0)
+        self.thumb_width = max(2, int(width * scale) & ~1)
+        self.thumb_height = max(2, int(height * scale) & ~1)
+
+        # PPM 文件头和 RGB 像素放在同一块缓冲区里，take() 只需一次 tobytes()
+        header = f"P6 {self.thumb_width} {self.thumb_height} 255\n".encode('ascii')
+        self._ppm = np.empty(len(header) + self.thumb_width * self.thumb_height * 3, np.uint8)
+        self._ppm[:len(header)] = np.frombuffer(header, np.uint8)
+        self._rgb = self._ppm[len(header):].reshape(self.thumb_height, self.thumb_width, 3)
+        if fmt == 'bgr':
+            self._small = np.empty((self.thumb_height, self.thumb_width, 3), np.uint8)
+        elif fmt == 'yuyv':
+            self._small = np.empty((self.thumb_height, self.thumb_width, 2), np.uint8)
+        else:
+            self._small = np.empty((self.thumb_height * 3 // 2, self.thumb_width), np.uint8)
+        self._scratch = {}
+        self._ready = False
+
+        self._count = 0
+        self._start = None
+
+        # 统计信息
+        self.samples = 0
+        self.skipped = 0
+        self.spent = 0.0
+
+    def offer(self, frame, deadline=None):
+        """
+        提供一个刚发送的帧（发送线程中调用）
+
+        Args:
+            frame: 发送的帧（offer 返回后不再引用）
+            deadline: 下一帧的排定发送时间（perf_counter），离得太近时不取样
+
+        Returns:
+            是否取样
+        """
+        now = time.perf_counter()
+        if self._start is None:
+            self._start = now
+        self._count += 1
+        if self._count % self.every or self._ready:
+            return False
+        # 取样预计耗时按历史平均估算，不够时跳过，保证不推迟下一帧
+        average = self.spent / self.samples if self.samples else 0.0
+        if ((deadline is not None and deadline - now < 2 * average) or
+                self.spent > self.budget * (now - self._start)):
+            self.skipped += 1
+            return False
+
+        self._downscale(frame)
+        self._ready = True
+        self.samples += 1
+        self.spent += time.perf_counter() - now
+        return True
+
+    def _shrink(self, src, size, dst=None):
+        """
+        缩小到 size（面积平均）
+
+        缩小超过 2 倍时直接 INTER_AREA 很慢（1080p 单线程约 5 ms），先双线性缩小到
+        目标的 2 倍，再做一次 2:1 的 INTER_AREA：与直接面积平均相差不到 1 级灰度，
+        耗时约为其 1/4。中间缓冲区按形状预分配。
+        """
+        if src.ndim == 3 and src.shape[2] == 1:
+            src = src[:, :, 0]
+        if dst is not None and dst.ndim == 3 and dst.shape[2] == 1:
+            dst = dst[:, :, 0]
+        w, h = size
+        if src.shape[1] > 2 * w and src.shape[0] > 2 * h:
+            shape = (2 * h, 2 * w) + src.shape[2:]
+            mid = self._scratch.get(shape)
+            if mid is None:
+                mid = self._scratch[shape] = np.empty(shape, np.uint8)
+            cv2.resize(src, (2 * w, 2 * h), dst=mid, interpolation=cv2.INTER_LINEAR)
+            src = mid
+        if dst is None:
+            return cv2.resize(src, size, interpolation=cv2.INTER_AREA)
+        cv2.resize(src, size, dst=dst, interpolation=cv2.INTER_AREA)
+        return dst
+
+    def _downscale(self, frame):
+        size = (self.thumb_width, self.thumb_height)
+        half = (self.thumb_width // 2, self.thumb_height // 2)
+        small = self._small
+        if self.fmt == 'bgr':
+            self._shrink(frame, size, small)
+            cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        elif self.fmt == 'yuyv':
+            # 每个 Y0 U Y1 V 宏像素看作一个 4 通道像素整体缩小，结果仍是 YUYV
+            self._shrink(frame.reshape(self.height, self.width // 2, 4),
+                         (half[0], self.thumb_height),
+                         small.reshape(self.thumb_height, half[0], 4))
+            cv2.cvtColor(small, cv2.COLOR_YUV2RGB_YUYV, dst=self._rgb)
+        else:
+            # 各平面按原格式缩小，只在缩略图上做颜色转换
+            src = _plane_views(frame, self.fmt, self.width, self.height)
+            dst = _plane_views(small, self.fmt, self.thumb_width, self.thumb_height)
+            self._shrink(src[0], size, dst[0])
+            for s, d in zip(src[1:], dst[1:]):
+                self._shrink(s, half, d)
+            code = cv2.COLOR_YUV2RGB_I420 if self.fmt == 'i420' else cv2.COLOR_YUV2RGB_NV12
+            cv2.cvtColor(small, code, dst=self._rgb)
+
+    def take(self):
+        """取走最新的缩略图（界面线程中调用），返回 PPM 数据，没有新缩略图时返回 None"""
+        if not self._ready:
+            return None
+        data = self._ppm.tobytes()
+        self._ready = False
+        return data
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._start if self._start is not None else 0.0
+        return {
+            'samples': self.samples,
+            'skipped': self.skipped,
+            'avg_ms': self.spent / self.samples * 1000 if self.samples else 0.0,
+            'cpu_percent': self.spent / elapsed * 100 if elapsed > 0 else 0.0,
+        }
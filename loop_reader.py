@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+循环视频读取器
+视频播放完毕时自动从头开始。无缝模式下在当前一轮结束前预先打开第二个解码器
+并预读开头几帧，到达结尾时直接切换，避免 CAP_PROP_POS_FRAMES 回跳造成的卡顿。
+也可以只循环入点和出点之间的一段：入点之后的若干帧解码后留在内存中，每次
+回到入点时先播放这些帧，同时在后台把解码器定位到它们之后，回跳不再卡顿
+"""
+
+import threading
+import time
+from collections import deque
+
+from lazy_import import lazy_import
+from probe_cache import seek_frame
+
+cv2 = lazy_import('cv2')
+
+
+class LoopingVideoReader:
+    """
+    循环读取视频帧
+
+    接口与 cv2.VideoCapture.read() 一致，并统计循环衔接处的帧间隔：
+    从上一轮最后一帧读出到下一轮第一帧读出之间的时间。
+    """
+
+    def __init__(self, video_path, gapless=False, preroll_frames=2,
+                 lookahead_frames=30, cap=None, in_frame=0, end_frame=None,
+                 probe=None, boundary_frames=0, start_frame=None):
+        """
+        Args:
+            video_path: 视频文件路径
+            gapless: 是否启用无缝循环（预开第二个解码器）；boundary_frames 大于 0
+                     时由入点帧缓存代替
+            preroll_frames: 第二个解码器预读的帧数
+            lookahead_frames: 距离结尾多少帧时开始预开第二个解码器
+            cap: 已打开的 cv2.VideoCapture，不提供时自动打开
+            in_frame: 循环区间的起始帧
+            end_frame: 循环区间的结束帧（不含），None 表示到视频结尾
+            probe: probe_cache.VideoProbe，有关键帧索引时定位帧精确
+            boundary_frames: 入点之后留在内存中的解码帧数，0 表示不缓存
+            start_frame: 第一轮的起始帧，None 表示从入点开始
+        """
+        self.video_path = str(video_path)
+        self.gapless = gapless and boundary_frames <= 0
+        self.preroll_frames = max(1, preroll_frames)
+        self.lookahead_frames = lookahead_frames
+        self.in_frame = max(0, in_frame)
+        self.end_frame = end_frame
+        self.probe = probe
+        self.boundary_frames = max(0, boundary_frames)
+
+        self.cap = cap if cap is not None else cv2.VideoCapture(self.video_path)
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if end_frame is not None:
+            self.frame_count = end_frame
+        start_frame = self.in_frame if start_frame is None else start_frame
+        self.position = start_frame - self.in_frame  # 当前这一轮已读取的帧数（相对入点）
+        if start_frame and self.cap.isOpened():
+            seek_frame(self.cap, start_frame, probe)
+
+        self._boundary = []        # 入点之后连续解码的帧
+        self._replay = None        # 正在重放的入点缓存帧序号
+        self._seek_thread = None   # 重放期间在后台定位解码器
+
+        self._next_cap = None
+        self._next_frames = []     # 第二个解码器预读的帧
+        self._preroll = deque()    # 切换后尚未返回的预读帧
+        self._preroll_thread = None
+
+        # 统计信息
+        self.loops = 0
+        self.last_loop_gap = 0.0
+        self.max_loop_gap = 0.0
+        self.last_seek_time = 0.0  # 最近一次切换（回跳或切换解码器）本身的耗时
+        self._last_frame_time = None
+
+    def isOpened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def _open_next(self):
+        """在后台打开第二个解码器并预读开头几帧"""
+        cap = cv2.VideoCapture(self.video_path)
+        frames = []
+        if cap.isOpened():
+            if self.in_frame:
+                seek_frame(cap, self.in_frame, self.probe)
+            for _ in range(self.preroll_frames):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.append(frame)
+        if not frames:
+            cap.release()
+            return
+        self._next_frames = frames
+        self._next_cap = cap
+
+    def _maybe_start_preroll(self):
+        if self._preroll_thread is not None:
+            return
+        if self.frame_count > 0 and \
+                self.in_frame + self.position < self.frame_count - self.lookahead_frames:
+            return
+        self._preroll_thread = threading.Thread(
+            target=self._open_next, name="loop-preroll", daemon=True)
+        self._preroll_thread.start()
+
+    def _wrap(self):
+        """切换到下一轮，返回 (ret, frame)"""
+        if self._boundary:
+            # 先重放入点缓存，解码器在后台定位到缓存之后的位置
+            self._join_seek()
+            cached = len(self._boundary)
+            if self.end_frame is None or self.in_frame + cached < self.end_frame:
+                self._seek_thread = threading.Thread(
+                    target=seek_frame, args=(self.cap, self.in_frame + cached, self.probe),
+                    name="loop-seek", daemon=True)
+                self._seek_thread.start()
+            self._replay = 0
+            self.position = 1
+            return True, self._next_cached()
+
+        if self.gapless:
+            if self._preroll_thread is None:
+                self._maybe_start_preroll()
+            self._preroll_thread.join()
+            self._preroll_thread = None
+
+            if self._next_cap is not None:
+                old_cap, self.cap, self._next_cap = self.cap, self._next_cap, None
+                # 旧解码器在后台释放，不占用发送时间
+                threading.Thread(target=old_cap.release, daemon=True).start()
+                self._preroll.extend(self._next_frames)
+                self._next_frames = []
+                self.position = 1
+                return True, self._preroll.popleft()
+
+        # 回跳到入点（无缝模式打开第二个解码器失败时也走这里）
+        seek_frame(self.cap, self.in_frame, self.probe)
+        self.position = 0
+        ret, frame = self._read_cap()
+        self.position = 1 if ret else 0
+        return ret, frame
+
+    def _join_seek(self):
+        if self._seek_thread is not None:
+            self._seek_thread.join()
+            self._seek_thread = None
+
+    def _next_cached(self):
+        """取出下一帧入点缓存，缓存放完后改回从解码器读取"""
+        frame = self._boundary[self._replay]
+        self._replay += 1
+        if self._replay == len(self._boundary):
+            self._replay = None
+        return frame
+
+    def _read_cap(self):
+        """从解码器读取一帧，入点之后连续读出的帧同时存入入点缓存"""
+        self._join_seek()
+        ret, frame = self.cap.read()
+        if ret and self.position == len(self._boundary) < self.boundary_frames:
+            self._boundary.append(frame)
+        return ret, frame
+
+    def _at_end(self):
+        return self.end_frame is not None and self.in_frame + self.position >= self.end_frame
+
+    def _next_pass(self):
+        """到达结尾后切换到下一轮并记录衔接间隔，返回 (ret, frame)"""
+        start = time.perf_counter()
+        ret, frame = self._wrap()
+        self.last_seek_time = time.perf_counter() - start
+        if not ret:
+            return False, None
+        self.loops += 1
+        now = time.perf_counter()
+        if self._last_frame_time is not None:
+            self.last_loop_gap = now - self._last_frame_time
+            self.max_loop_gap = max(self.max_loop_gap, self.last_loop_gap)
+        self._last_frame_time = now
+        return True, frame
+
+    def read(self):
+        """读取下一帧，到达结尾（或出点）时自动回到开头（或入点）"""
+        if self._preroll:
+            frame = self._preroll.popleft()
+        elif self._at_end():
+            return self._next_pass()
+        elif self._replay is not None:
+            frame = self._next_cached()
+        else:
+            ret, frame = self._read_cap()
+            if not ret:
+                return self._next_pass()
+
+        self.position += 1
+        if self.gapless:
+            self._maybe_start_preroll()
+        self._last_frame_time = time.perf_counter()
+        return True, frame
+
+    def grab(self):
+        """
+        跳过一帧：只调用 cap.grab()，不 retrieve()，帧不会被转换为 BGR
+
+        Returns:
+            是否成功
+        """
+        if self._preroll:
+            self._preroll.popleft()
+        elif self._at_end():
+            ret, _ = self._next_pass()
+            return ret
+        elif self._replay is not None:
+            self._next_cached()
+        else:
+            self._join_seek()
+            if not self.cap.grab():
+                ret, _ = self._next_pass()
+                return ret
+
+        self.position += 1
+        if self.gapless:
+            self._maybe_start_preroll()
+        return True
+
+    def release(self):
+        """释放所有解码器"""
+        self._join_seek()
+        self._boundary = []
+        self._replay = None
+        if self._preroll_thread is not None:
+            self._preroll_thread.join()
+            self._preroll_thread = None
+        if self._next_cap is not None:
+            self._next_cap.release()
+            self._next_cap = None
+        self._next_frames = []
+        self._preroll.clear()
+        if self.cap is not None:
+            self.cap.release()
+
+    def stats(self):
+        """返回循环统计信息（毫秒）"""
+        return {
+            'loops': self.loops,
+            'last_loop_gap_ms': self.last_loop_gap * 1000,
+            'max_loop_gap_ms': self.max_loop_gap * 1000,
+            'last_seek_ms': self.last_seek_time * 1000,
+            'boundary_frames': len(self._boundary),
+        }
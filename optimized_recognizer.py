@@ -5,13 +5,16 @@
 基于特征分析结果，提供高准确率的元素识别
 """
 
-import cv2
-import numpy as np
-from PIL import Image
 import re
 
+from lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+
 try:
-    import pytesseract
+    pytesseract = lazy_import('pytesseract')
     HAS_OCR = True
 except ImportError:
     HAS_OCR = False
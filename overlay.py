@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+画面叠加
+文字和图标先渲染成带 alpha 通道的小图（精灵），按内容缓存在图集中；叠加时只对
+精灵所在的区域做向量化 alpha 混合，每帧开销与叠加区域大小成正比，与整帧大小无关。
+待机画面同样由精灵拼成，并按 (分辨率, 文字) 缓存，只渲染一次
+"""
+
+import functools
+import time
+from collections import OrderedDict
+
+from lazy_import import lazy_import
+from pixel_format import FrameConverter
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+ANCHORS = ('top-left', 'top-right', 'bottom-left', 'bottom-right', 'center')
+
+# 各像素格式的平面布局：(平面序号, 行抽样, 列抽样)，见 _plane_views
+_SUBSAMPLING = {
+    'bgr': ((1, 1),),
+    'i420': ((1, 1), (2, 2), (2, 2)),
+    'nv12': ((1, 1), (2, 2)),
+    'yuyv': ((1, 1),),
+}
+
+
+def _plane_views(frame, fmt, width, height):
+    """把一帧拆成若干个 (行, 列, 通道) 的平面视图（不拷贝）"""
+    if fmt == 'bgr':
+        return [frame]
+    if fmt == 'yuyv':
+        return [frame]
+    y = frame[:height].reshape(height, width, 1)
+    if fmt == 'nv12':
+        return [y, frame[height:].reshape(height // 2, width // 2, 2)]
+    # U、V 平面各占 (h/2) × (w/2) 字节，高度不是 4 的倍数时跨行，按一维视图切分
+    flat = frame.reshape(-1)
+    chroma = (height // 2) * (width // 2)
+    u = flat[height * width:height * width + chroma]
+    v = flat[height * width + chroma:height * width + 2 * chroma]
+    return [y, u.reshape(height // 2, width // 2, 1), v.reshape(height // 2, width // 2, 1)]
+
+
+class Sprite:
+    """
+    带 alpha 通道的小图
+
+    按像素格式预先算好各平面的预乘颜色、(255 - alpha) 和混合用的临时缓冲区，
+    blend() 只做几次原地的 uint16 运算，不分配内存。
+    """
+
+    def __init__(self, bgr, alpha, origin=(0, 0)):
+        """
+        Args:
+            bgr: (h, w, 3) uint8 颜色（未预乘）
+            alpha: (h, w) uint8 不透明度
+            origin: 定位原点在精灵中的坐标 (x, y)，文字精灵为基线起点
+        """
+        # YUV 4:2:x 格式要求宽高为偶数，不足的补一行/列透明像素
+        h, w = alpha.shape
+        pad_h, pad_w = h % 2, w % 2
+        if pad_h or pad_w:
+            bgr = cv2.copyMakeBorder(bgr, 0, pad_h, 0, pad_w, cv2.BORDER_REPLICATE)
+            alpha = cv2.copyMakeBorder(alpha, 0, pad_h, 0, pad_w, cv2.BORDER_CONSTANT, value=0)
+        self.bgr = bgr
+        self.alpha = alpha
+        self.height, self.width = alpha.shape
+        self.origin = origin
+        self._layers = {}
+
+    @property
+    def nbytes(self):
+        return self.bgr.nbytes + self.alpha.nbytes
+
+    def layers(self, fmt):
+        """各平面的 (预乘颜色, 255 - alpha, 两个临时缓冲区, 保存区, 行抽样, 列抽样)"""
+        layers = self._layers.get(fmt)
+        if layers is None:
+            layers = self._layers[fmt] = self._build_layers(fmt)
+        return layers
+
+    def _build_layers(self, fmt):
+        h, w = self.height, self.width
+        if fmt == 'bgr':
+            planes = [self.bgr]
+        else:
+            planes = _plane_views(FrameConverter(fmt, w, h)(self.bgr), fmt, w, h)
+
+        layers = []
+        for plane, (ys, xs) in zip(planes, _SUBSAMPLING[fmt]):
+            alpha = self.alpha
+            if ys > 1 or xs > 1:
+                alpha = cv2.resize(alpha, (w // xs, h // ys), interpolation=cv2.INTER_AREA)
+            alpha = alpha.astype(np.uint16)[:, :, None]
+            premultiplied = plane.astype(np.uint16) * alpha
+            inverse = 255 - alpha
+            layers.append((premultiplied, np.ascontiguousarray(inverse),
+                           np.empty(premultiplied.shape, np.uint16),
+                           np.empty(premultiplied.shape, np.uint16),
+                           np.empty(plane.shape, np.uint8), ys, xs))
+        return layers
+
+
+class SpriteAtlas:
+    """
+    精灵缓存
+
+    以渲染参数为键缓存文字和图片精灵，超过容量时淘汰最久未使用的项。
+    时钟等动态文字每次变化只渲染一个新的小精灵。
+    """
+
+    def __init__(self, max_sprites=256):
+        self.max_sprites = max_sprites
+        self._sprites = OrderedDict()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key, render):
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+        self.misses += 1
+        sprite = self._sprites[key] = render()
+        if len(self._sprites) > self.max_sprites:
+            self._sprites.popitem(last=False)
+        return sprite
+
+    def text(self, text, scale=1.0, color=(255, 255, 255), thickness=None, shadow=True):
+        """渲染（或取出缓存的）文字精灵，带右下方向的黑色阴影"""
+        thickness = thickness or max(1, int(scale * 2))
+        key = ('text', text, scale, tuple(color), thickness, shadow)
+        return self._get(key, lambda: self._render_text(text, scale, color, thickness, shadow))
+
+    @staticmethod
+    def _render_text(text, scale, color, thickness, shadow):
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        (text_width, text_height), baseline = cv2.getTextSize(text, font, scale, thickness)
+        offset = 3 if shadow else 0
+        pad = thickness + 1
+        h = text_height + baseline + 2 * pad + offset
+        w = text_width + 2 * pad + offset
+        origin = (pad, pad + text_height)
+
+        mask = np.zeros((h, w), np.uint8)
+        cv2.putText(mask, text, origin, font, scale, 255, thickness, cv2.LINE_AA)
+        alpha = mask
+        if shadow:
+            shadow_mask = np.zeros((h, w), np.uint8)
+            cv2.putText(shadow_mask, text, (origin[0] + offset, origin[1] + offset), font,
+                        scale, 255, thickness, cv2.LINE_AA)
+            # 文字叠在阴影上：alpha = m + s * (1 - m)
+            m = mask.astype(np.uint16)
+            alpha = (m + (shadow_mask.astype(np.uint16) * (255 - m) + 127) // 255).astype(np.uint8)
+
+        # 阴影为黑色，未预乘的颜色 = 文字颜色 × 文字覆盖率 / 总不透明度
+        coverage = mask.astype(np.float32) / np.maximum(alpha, 1)
+        bgr = (coverage[:, :, None] * np.array(color, np.float32)).round().astype(np.uint8)
+        return Sprite(bgr, alpha, origin)
+
+    def image(self, path, max_width=None, max_height=None):
+        """读取图片精灵（PNG 等带 alpha 通道的图片），按需等比缩小"""
+        key = ('image', str(path), max_width, max_height)
+        return self._get(key, lambda: self._load_image(path, max_width, max_height))
+
+    @staticmethod
+    def _load_image(path, max_width, max_height):
+        image = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise ValueError(f"无法读取图片: {path}")
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+        elif image.shape[2] == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+        h, w = image.shape[:2]
+        scale = min(1.0, (max_width or w) / w, (max_height or h) / h)
+        if scale < 1.0:
+            image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                               interpolation=cv2.INTER_AREA)
+        return Sprite(np.ascontiguousarray(image[:, :, :3]),
+                      np.ascontiguousarray(image[:, :, 3]))
+
+    def stats(self):
+        return {
+            'sprites': len(self._sprites),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+def _clamp(fmt, width, height, sprite, x, y):
+    """YUV 格式下坐标对齐到偶数，并把精灵限制在画面内；放不下时返回 None"""
+    if fmt != 'bgr':
+        x &= ~1
+        y &= ~1
+    x = min(max(x, 0), width - sprite.width)
+    y = min(max(y, 0), height - sprite.height)
+    if x < 0 or y < 0:
+        return None
+    return x, y
+
+
+def blend(frame, fmt, width, height, sprite, x, y, save=False):
+    """
+    把精灵 alpha 混合到帧的 (x, y) 处（原地修改，只处理精灵覆盖的区域）
+
+    超出画面的精灵不绘制。YUV 格式下坐标对齐到偶数。
+
+    Args:
+        save: 是否先把被覆盖的区域保存到精灵的保存区，供 restore() 恢复
+
+    Returns:
+        是否绘制
+    """
+    position = _clamp(fmt, width, height, sprite, x, y)
+    if position is None:
+        return False
+    x, y = position
+
+    for plane, (premultiplied, inverse, scratch, shifted, saved, ys, xs) in zip(
+            _plane_views(frame, fmt, width, height), sprite.layers(fmt)):
+        py, px = y // ys, x // xs
+        roi = plane[py:py + saved.shape[0], px:px + saved.shape[1]]
+        if save:
+            np.copyto(saved, roi)
+        # out = (dst × (255 - a) + 预乘颜色) / 255，用移位做带舍入的除法
+        np.multiply(roi, inverse, out=scratch)
+        scratch += premultiplied
+        scratch += 128
+        np.right_shift(scratch, 8, out=shifted)
+        scratch += shifted
+        scratch >>= 8
+        np.copyto(roi, scratch, casting='unsafe')
+    return True
+
+
+def restore(frame, fmt, width, height, sprite, x, y):
+    """恢复 blend(save=True) 时保存的区域"""
+    x, y = _clamp(fmt, width, height, sprite, x, y)
+    for plane, (_, _, _, _, saved, ys, xs) in zip(
+            _plane_views(frame, fmt, width, height), sprite.layers(fmt)):
+        py, px = y // ys, x // xs
+        np.copyto(plane[py:py + saved.shape[0], px:px + saved.shape[1]], saved)
+
+
+class Overlay:
+    """
+    输出帧上的叠加层（文字、时钟、图标）
+
+    apply() 在帧上原地混合所有精灵并保存被覆盖的区域，发送完毕后调用 restore()
+    还原，缓存中的帧和重发的上一帧都不会被重复叠加；只读的帧（memmap 帧缓存）
+    先拷贝到叠加层自己的缓冲区。
+    """
+
+    MARGIN = 16
+
+    def __init__(self, fmt, width, height, atlas=None):
+        self.fmt = fmt
+        self.width = width
+        self.height = height
+        self.atlas = atlas or SpriteAtlas()
+        self._items = []     # (取精灵的函数, 锚点)
+        self._applied = []   # 本帧已绘制的 (精灵, x, y)
+        self._frame = None
+        self._buffer = None
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def add_text(self, text, anchor='top-left', scale=0.8, color=(255, 255, 255)):
+        """
+        添加文字
+
+        Args:
+            text: 字符串，或每帧调用一次、返回字符串的函数（动态文字）
+        """
+        if anchor not in ANCHORS:
+            raise ValueError(f"未知的位置: {anchor}")
+        if callable(text):
+            self._items.append((lambda: self.atlas.text(text(), scale, color), anchor))
+        else:
+            self._items.append((lambda: self.atlas.text(text, scale, color), anchor))
+
+    def add_clock(self, anchor='top-right', fmt='%H:%M:%S', scale=0.8):
+        """添加时钟（每秒只渲染一个新的文字精灵）"""
+        self.add_text(lambda: time.strftime(fmt), anchor, scale)
+
+    def add_image(self, path, anchor='bottom-right', max_size=None):
+        """添加图标（max_size 为最大宽高，默认不超过画面的 1/4）"""
+        max_size = max_size or (self.width // 4, self.height // 4)
+        sprite = self.atlas.image(path, *max_size)
+        self._items.append((lambda: sprite, anchor))
+
+    def _position(self, sprite, anchor):
+        margin = self.MARGIN
+        if anchor == 'center':
+            return (self.width - sprite.width) // 2, (self.height - sprite.height) // 2
+        vertical, horizontal = anchor.split('-')
+        x = margin if horizontal == 'left' else self.width - sprite.width - margin
+        y = margin if vertical == 'top' else self.height - sprite.height - margin
+        return x, y
+
+    def apply(self, frame):
+        """
+        在帧上绘制所有叠加项
+
+        Returns:
+            绘制后的帧（通常就是 frame 本身）
+        """
+        if not frame.flags.writeable:
+            if self._buffer is None:
+                self._buffer = np.empty_like(frame)
+            np.copyto(self._buffer, frame)
+            frame = self._buffer
+
+        self._frame = frame
+        for get_sprite, anchor in self._items:
+            sprite = get_sprite()
+            x, y = self._position(sprite, anchor)
+            if blend(frame, self.fmt, self.width, self.height, sprite, x, y,
+                     save=frame is not self._buffer):
+                self._applied.append((sprite, x, y))
+        return frame
+
+    def restore(self):
+        """还原 apply() 覆盖的区域（按相反顺序，叠加项重叠时也能正确还原）"""
+        frame = self._frame
+        if frame is not None and frame is not self._buffer:
+            for sprite, x, y in reversed(self._applied):
+                restore(frame, self.fmt, self.width, self.height, sprite, x, y)
+        self._applied.clear()
+        self._frame = None
+
+
+_standby_atlas = SpriteAtlas(max_sprites=32)
+
+
+@functools.lru_cache(maxsize=16)
+def render_standby_frame(width, height, texts, hint=None, background=(30, 30, 30)):
+    """
+    渲染待机画面（BGR），按参数缓存：同一分辨率和文字只渲染一次
+
+    Args:
+        texts: ((文字, 颜色, 字号, 基线相对画面中心的纵向偏移), ...)
+        hint: (文字, 颜色, 字号)，显示在画面底部
+        background: 背景颜色
+
+    Returns:
+        只读的 (height, width, 3) 帧，调用方需要修改时先拷贝
+    """
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:, :] = background
+
+    lines = [(text, color, scale, height // 2 + y_offset, True)
+             for text, color, scale, y_offset in texts]
+    if hint is not None:
+        text, color, scale = hint
+        lines.append((text, color, scale, height - 50, False))
+
+    for text, color, scale, baseline, shadow in lines:
+        sprite = _standby_atlas.text(text, scale, color, shadow=shadow)
+        text_width = sprite.width - 2 * sprite.origin[0] - (3 if shadow else 0)
+        x = (width - text_width) // 2 - sprite.origin[0]
+        y = baseline - sprite.origin[1]
+        blend(frame, 'bgr', width, height, sprite, x, y)
+
+    frame.flags.writeable = False
+    return frame
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+像素格式协商与转换
+根据虚拟摄像头后端选择它原生支持的像素格式（I420 / NV12 / YUYV），
+在解码缩放阶段直接生成该格式，省去后端再做一次整帧颜色转换和拷贝
+"""
+
+import sys
+import time
+
+from lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+PIXEL_FORMATS = ('bgr', 'i420', 'nv12', 'yuyv')
+
+# 源画面与输出宽高比不同时的适配方式
+FIT_MODES = ('stretch', 'letterbox', 'crop')
+
+# 各后端支持的像素格式，按优先级排列（第一个为驱动原生格式）
+BACKEND_FORMATS = {
+    'obs': ('nv12', 'i420', 'yuyv', 'bgr'),
+    'v4l2loopback': ('i420', 'nv12', 'yuyv', 'bgr'),
+    'unitycapture': ('bgr',),
+    'akvcam': ('bgr',),
+}
+
+
+def default_backend():
+    """当前平台上 pyvirtualcam 默认使用的后端"""
+    if sys.platform.startswith('linux'):
+        return 'v4l2loopback'
+    return 'obs'
+
+
+def frame_shape(fmt, width, height):
+    """指定像素格式下一帧数组的形状"""
+    if fmt == 'bgr':
+        return (height, width, 3)
+    if fmt in ('i420', 'nv12'):
+        return (height * 3 // 2, width)
+    if fmt == 'yuyv':
+        return (height, width, 2)
+    raise ValueError(f"不支持的像素格式: {fmt}")
+
+
+def to_bgr(frame, fmt, dst=None):
+    """把输出像素格式的帧转换回 BGR（录制为压缩视频等只接受 BGR 的场合）"""
+    if fmt == 'bgr':
+        return frame
+    codes = {
+        'i420': cv2.COLOR_YUV2BGR_I420,
+        'nv12': cv2.COLOR_YUV2BGR_NV12,
+        'yuyv': cv2.COLOR_YUV2BGR_YUYV,
+    }
+    if fmt not in codes:
+        raise ValueError(f"不支持的像素格式: {fmt}")
+    return cv2.cvtColor(frame, codes[fmt], dst=dst)
+
+
+def candidate_formats(requested='auto', backend=None):
+    """
+    协商候选像素格式
+
+    Args:
+        requested: 'auto' 或指定的像素格式
+        backend: 虚拟摄像头后端名称，默认按平台推断
+
+    Returns:
+        按优先级排列的像素格式列表，最后总是回退到 BGR
+    """
+    if requested != 'auto':
+        if requested not in PIXEL_FORMATS:
+            raise ValueError(f"不支持的像素格式: {requested}")
+        return [requested] if requested == 'bgr' else [requested, 'bgr']
+    return list(BACKEND_FORMATS.get(backend or default_backend(), ('bgr',)))
+
+
+def open_virtual_camera(width, height, fps, requested='auto', backend=None, device=None):
+    """
+    按协商结果依次尝试打开 pyvirtualcam 摄像头
+
+    Args:
+        device: 虚拟摄像头设备，None 表示第一个可用设备
+
+    Returns:
+        (cam, fmt) 已打开的摄像头和实际使用的像素格式
+    """
+    import pyvirtualcam
+
+    formats = candidate_formats(requested, backend)
+
+    for fmt in formats:
+        if fmt in ('i420', 'nv12', 'yuyv') and (width % 2 or height % 2):
+            continue  # YUV 4:2:x 格式要求宽高为偶数
+        try:
+            cam = pyvirtualcam.Camera(width=width, height=height, fps=fps,
+                                      fmt=getattr(pyvirtualcam.PixelFormat, fmt.upper()),
+                                      device=device, backend=backend)
+        except (RuntimeError, ValueError):
+            if fmt == formats[-1]:
+                raise
+            continue
+
+        # 后端报告的原生格式与推断不同时，改用原生格式重新打开
+        native = cam.native_fmt.name.lower() if cam.native_fmt else None
+        if requested == 'auto' and native in PIXEL_FORMATS and native != fmt:
+            cam.close()
+            return open_virtual_camera(width, height, fps, native, cam.backend, device)
+        return cam, fmt
+
+    raise RuntimeError(f"无法以任何像素格式打开虚拟摄像头: {formats}")
+
+
+def fit_geometry(fit, src_width, src_height, width, height):
+    """
+    计算缩放几何
+
+    Args:
+        fit: 'stretch' 拉伸填满；'letterbox' 保持宽高比完整显示，四周留黑边；
+             'crop' 保持宽高比填满输出，居中裁掉多余部分
+
+    Returns:
+        (src_rect, dst_rect)，均为 (x, y, w, h)：源帧中参与缩放的区域和
+        它在输出帧中的位置
+    """
+    if fit not in FIT_MODES:
+        raise ValueError(f"未知的画面适配方式: {fit}")
+
+    src_rect = (0, 0, src_width, src_height)
+    dst_rect = (0, 0, width, height)
+    if fit == 'letterbox':
+        scale = min(width / src_width, height / src_height)
+        w = min(width, round(src_width * scale))
+        h = min(height, round(src_height * scale))
+        dst_rect = ((width - w) // 2, (height - h) // 2, w, h)
+    elif fit == 'crop':
+        scale = max(width / src_width, height / src_height)
+        w = min(src_width, round(width / scale))
+        h = min(src_height, round(height / scale))
+        src_rect = ((src_width - w) // 2, (src_height - h) // 2, w, h)
+    return src_rect, dst_rect
+
+
+class FrameConverter:
+    """
+    缩放 + 像素格式转换
+
+    把任意尺寸的 BGR 帧缩放到输出分辨率并转换为目标像素格式，
+    全部写入预分配的缓冲区。未指定 dst 时返回内部缓冲区，
+    下一次调用会覆盖其内容，调用方需要保留时应自行拷贝。
+
+    缩放几何（裁剪区域、黑边位置、插值方式）按源尺寸只计算一次：缩小到
+    一半以下用 INTER_AREA，其余用 INTER_LINEAR。稳定运行时每帧不分配内存。
+
+    设置 stats（frame_stats.FrameStats）后分别记录缩放和颜色转换的耗时；
+    degraded 为 True 时改用最近邻插值，用于处理落后时降低单帧耗时。
+    """
+
+    def __init__(self, fmt, width, height, stats=None, fit='stretch'):
+        if fit not in FIT_MODES:
+            raise ValueError(f"未知的画面适配方式: {fit}")
+        self.fmt = fmt
+        self.fit = fit
+        self.stats = stats
+        self.interpolation = cv2.INTER_LINEAR
+        self.degraded = False
+        self.width = width
+        self.height = height
+        self.shape = frame_shape(fmt, width, height)
+
+        self._out = np.empty(self.shape, dtype=np.uint8)
+        self._bgr = None if fmt == 'bgr' else np.empty((height, width, 3), dtype=np.uint8)
+        self._chroma = None
+        if fmt == 'nv12':
+            self._chroma = np.empty((height // 2, width), dtype=np.uint8)
+        self._yuy2_code = getattr(cv2, 'COLOR_BGR2YUV_YUY2', None)
+
+        # 缩放几何，按源尺寸缓存
+        self._source_size = None
+        self._needs_resize = False
+        self._src_slice = None
+        self._dst_slice = None
+        self._dst_size = (width, height)
+        self._borders = ()
+        self._scaled = None       # 内部缓冲区中缩放结果所在区域的视图
+
+    def _setup_geometry(self, src_height, src_width):
+        """源尺寸变化时重新计算缩放几何"""
+        (sx, sy, sw, sh), (dx, dy, dw, dh) = fit_geometry(
+            self.fit, src_width, src_height, self.width, self.height)
+        H, W = self.height, self.width
+
+        self._source_size = (src_height, src_width)
+        self._needs_resize = (src_width, src_height) != (W, H)
+        self._src_slice = None
+        if (sw, sh) != (src_width, src_height):
+            self._src_slice = (slice(sy, sy + sh), slice(sx, sx + sw))
+        self._dst_slice = None
+        self._borders = ()
+        if (dw, dh) != (W, H):
+            self._dst_slice = (slice(dy, dy + dh), slice(dx, dx + dw))
+            self._borders = ((slice(0, dy),), (slice(dy + dh, H),),
+                             (slice(dy, dy + dh), slice(0, dx)),
+                             (slice(dy, dy + dh), slice(dx + dw, W)))
+        self._dst_size = (dw, dh)
+        # 缩小到一半以下时双线性会混叠，改用 INTER_AREA；轻度缩小和放大用双线性
+        self.interpolation = cv2.INTER_AREA if dw * 2 < sw else cv2.INTER_LINEAR
+
+        # 内部缓冲区的黑边只需要填一次
+        internal = self._out if self.fmt == 'bgr' else self._bgr
+        internal.fill(0)
+        self._scaled = internal if self._dst_slice is None else internal[self._dst_slice]
+
+    @property
+    def nbytes(self):
+        """单帧字节数"""
+        return self._out.nbytes
+
+    def __call__(self, frame, dst=None):
+        """
+        Args:
+            frame: BGR 帧（任意尺寸）
+            dst: 可选的目标数组，形状为 self.shape
+
+        Returns:
+            转换后的帧
+        """
+        stats = self.stats
+        if frame.shape[:2] != self._source_size:
+            self._setup_geometry(frame.shape[0], frame.shape[1])
+
+        if self._needs_resize:
+            start = time.perf_counter() if stats else 0.0
+            if self.fmt == 'bgr' and dst is not None:
+                # 调用方的缓冲区（环形缓冲区槽位、预解码数组）每次都要补黑边
+                for border in self._borders:
+                    dst[border] = 0
+                target = dst
+                scaled = dst if self._dst_slice is None else dst[self._dst_slice]
+            else:
+                target = self._out if self.fmt == 'bgr' else self._bgr
+                scaled = self._scaled
+            if self._src_slice is not None:
+                frame = frame[self._src_slice]
+            interpolation = cv2.INTER_NEAREST if self.degraded else self.interpolation
+            cv2.resize(frame, self._dst_size, dst=scaled, interpolation=interpolation)
+            frame = target
+            if stats:
+                stats.record('resize', time.perf_counter() - start)
+
+        if self.fmt == 'bgr':
+            if dst is not None and frame is not dst:
+                np.copyto(dst, frame)
+                return dst
+            return frame
+
+        start = time.perf_counter() if stats else 0.0
+        out = self._convert(frame, dst)
+        if stats:
+            stats.record('convert', time.perf_counter() - start)
+        return out
+
+    def _convert(self, frame, dst):
+        out = self._out if dst is None else dst
+        if self.fmt == 'i420':
+            cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420, dst=out)
+        elif self.fmt == 'nv12':
+            self._to_nv12(frame, out)
+        elif self.fmt == 'yuyv':
+            self._to_yuyv(frame, out)
+        return out
+
+    def _to_nv12(self, frame, out):
+        # OpenCV 没有 BGR→NV12，先按 I420 写入（Y 平面位置相同），再把 U、V 平面交错
+        h, w = self.height, self.width
+        cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420, dst=out)
+        np.copyto(self._chroma, out[h:])
+        planes = self._chroma.reshape(2, h // 2, w // 2)
+        uv = out[h:].reshape(h // 2, w // 2, 2)
+        np.copyto(uv[:, :, 0], planes[0])
+        np.copyto(uv[:, :, 1], planes[1])
+
+    def _to_yuyv(self, frame, out):
+        if self._yuy2_code is not None:
+            cv2.cvtColor(frame, self._yuy2_code, dst=out)
+            return
+        # 旧版 OpenCV 没有 BGR→YUY2：先转 YUV 4:4:4，再对色度水平抽样
+        yuv = cv2.cvtColor(frame, cv2.COLOR_BGR2YUV)
+        np.copyto(out[:, :, 0], yuv[:, :, 0])
+        np.copyto(out[:, 0::2, 1], yuv[:, 0::2, 1])
+        np.copyto(out[:, 1::2, 1], yuv[:, 0::2, 2])
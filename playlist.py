@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+播放列表
+按顺序播放多个视频（命令行列出或 M3U 文件），每一项可以指定入点、出点和
+循环次数。当前一项播放时在后台打开下一项、定位到入点并预读开头几帧，
+切换时直接换用预读好的解码器，衔接耗时不超过一个正常帧间隔
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from lazy_import import lazy_import
+from probe_cache import load_probe, seek_frame
+
+cv2 = lazy_import('cv2')
+
+
+PLAYLIST_EXTENSIONS = ('.m3u', '.m3u8')
+
+
+class PlaylistItem:
+    """播放列表中的一项"""
+
+    def __init__(self, path, in_point=0.0, out_point=None, loops=1):
+        """
+        Args:
+            path: 视频文件路径
+            in_point: 入点（秒）
+            out_point: 出点（秒），None 表示播放到结尾
+            loops: 本项连续播放的次数
+
+        Raises:
+            ValueError: 出点不晚于入点
+        """
+        self.path = str(path)
+        self.in_point = max(0.0, in_point)
+        self.out_point = out_point
+        self.loops = max(1, loops)
+        if out_point is not None and out_point <= self.in_point:
+            raise ValueError(f"入点必须早于出点且在视频范围内: {in_point} → {out_point}")
+
+        # 探测结果（见 probe_items）
+        self.fps = 0.0
+        self.width = 0
+        self.height = 0
+        self.frame_count = 0
+        self.probe = None          # probe_cache.VideoProbe，含关键帧索引
+        self.error = None
+
+    @property
+    def name(self):
+        return Path(self.path).name
+
+    @property
+    def in_frame(self):
+        """入点对应的帧序号"""
+        return round(self.in_point * self.fps) if self.fps > 0 else 0
+
+    @property
+    def end_frame(self):
+        """出点对应的帧序号（不含），未知时返回 None"""
+        if self.out_point is not None and self.fps > 0:
+            end = round(self.out_point * self.fps)
+            return min(end, self.frame_count) if self.frame_count > 0 else end
+        return self.frame_count if self.frame_count > 0 else None
+
+    def check_range(self):
+        """
+        探测之后检查入点、出点是否落在视频范围内
+
+        Raises:
+            ValueError: 入点不早于出点（或视频结尾）
+        """
+        end_frame = self.end_frame
+        if end_frame is not None and self.in_frame >= end_frame:
+            out = self.out_point if self.out_point is not None else "结尾"
+            raise ValueError(f"入点必须早于出点且在视频范围内: {self.in_point} → {out}")
+
+    def describe(self):
+        """单行描述，用于启动时打印播放列表"""
+        text = f"{self.name} ({self.width}x{self.height}, {self.fps:.2f} FPS"
+        if self.in_point or self.out_point is not None:
+            out = f"{self.out_point:.2f}" if self.out_point is not None else "结尾"
+            text += f", {self.in_point:.2f}s → {out}"
+        text += ")"
+        if self.loops > 1:
+            text += f" ×{self.loops}"
+        return text
+
+
+def parse_item_spec(text):
+    """
+    解析命令行中的播放列表项：路径[::in=秒,out=秒,loops=次数]
+
+    例如 "intro.mp4::out=5"、"main.mp4::in=10,out=70,loops=3"
+    """
+    path, _, options = text.partition('::')
+    kwargs = {}
+    for option in filter(None, options.split(',')):
+        key, _, value = option.partition('=')
+        if key == 'in':
+            kwargs['in_point'] = float(value)
+        elif key == 'out':
+            kwargs['out_point'] = float(value)
+        elif key == 'loops':
+            kwargs['loops'] = int(value)
+        else:
+            raise ValueError(f"未知的播放列表选项: {option}")
+    return PlaylistItem(path, **kwargs)
+
+
+def load_m3u(path):
+    """
+    读取 M3U 播放列表
+
+    支持 VLC 的逐项选项：#EXTVLCOPT:start-time=秒、stop-time=秒、
+    input-repeat=次数（重复次数，播放次数为其加一）。相对路径相对于 M3U 文件所在目录。
+    """
+    base = Path(path).resolve().parent
+    items = []
+    options = {}
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('#'):
+                if line.startswith('#EXTVLCOPT:'):
+                    key, _, value = line[len('#EXTVLCOPT:'):].partition('=')
+                    if key == 'start-time':
+                        options['in_point'] = float(value)
+                    elif key == 'stop-time':
+                        options['out_point'] = float(value)
+                    elif key == 'input-repeat':
+                        options['loops'] = int(value) + 1
+                continue
+            item_path = Path(line)
+            if not item_path.is_absolute():
+                item_path = base / item_path
+            items.append(PlaylistItem(item_path, **options))
+            options = {}
+    return items
+
+
+def is_playlist_source(text):
+    """命令行参数是否需要按播放列表处理（M3U 文件或带 :: 选项的项）"""
+    return '::' in text or Path(text).suffix.lower() in PLAYLIST_EXTENSIONS
+
+
+def load_playlist(sources):
+    """把命令行给出的视频、M3U 文件和带选项的项展开为 PlaylistItem 列表"""
+    items = []
+    for source in sources:
+        if Path(source).suffix.lower() in PLAYLIST_EXTENSIONS:
+            items.extend(load_m3u(source))
+        else:
+            items.append(parse_item_spec(source))
+    return items
+
+
+def probe_items(items, max_workers=8):
+    """
+    并行探测所有项的元数据和关键帧索引（扫描数据包时 OpenCV 会释放 GIL），
+    已有有效的 .probe.json 缓存时直接读取
+
+    探测失败或入点、出点超出视频范围的项记录在 item.error 中。
+    """
+    def probe(item):
+        try:
+            item.probe = load_probe(item.path)
+        except Exception as e:
+            item.error = str(e)
+            return
+        item.fps = item.probe.fps
+        item.width = item.probe.width
+        item.height = item.probe.height
+        item.frame_count = item.probe.frame_count
+        try:
+            item.check_range()
+        except ValueError as e:
+            item.error = f"{item.name}: {e}"
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        list(pool.map(probe, items))
+    return items
+
+
+class PlaylistReader:
+    """
+    播放列表读取器
+
+    接口与 LoopingVideoReader 一致（read / grab / loops / stats），每切换一项
+    loops 加一。整个列表播放完毕后从第一项重新开始。
+    """
+
+    def __init__(self, items, preroll_frames=2, lookahead_frames=30):
+        """
+        Args:
+            items: 已探测的 PlaylistItem 列表
+            preroll_frames: 下一项预读的帧数
+            lookahead_frames: 距离当前项结尾多少帧时开始打开下一项
+        """
+        if not items:
+            raise ValueError("播放列表为空")
+        self.items = items
+        self.preroll_frames = max(1, preroll_frames)
+        self.lookahead_frames = lookahead_frames
+
+        self.index = 0
+        self.pass_index = 0        # 当前项已完成的循环次数
+        self.position = 0          # 当前这一遍已读取的帧数
+        self.cap = self._open(items[0])
+
+        self._next = None          # (index, pass_index, cap, frames)
+        self._preroll = deque()
+        self._preroll_thread = None
+
+        # 统计信息
+        self.loops = 0
+        self.playlist_loops = 0
+        self.last_loop_gap = 0.0
+        self.max_loop_gap = 0.0
+        self.last_seek_time = 0.0
+        self._last_frame_time = None
+
+    @property
+    def item(self):
+        """当前播放的项"""
+        return self.items[self.index]
+
+    @property
+    def fps(self):
+        return self.item.fps
+
+    def isOpened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    @staticmethod
+    def _open(item):
+        cap = cv2.VideoCapture(item.path)
+        if cap.isOpened() and item.in_frame:
+            # 跳到入点之前最近的关键帧再向前解码，入点帧精确
+            seek_frame(cap, item.in_frame, item.probe)
+        return cap
+
+    def _next_target(self):
+        """下一遍要播放的 (项序号, 循环序号)"""
+        if self.pass_index + 1 < self.item.loops:
+            return self.index, self.pass_index + 1
+        return (self.index + 1) % len(self.items), 0
+
+    def _open_next(self, index, pass_index):
+        """在后台打开下一项，定位到入点并预读开头几帧"""
+        item = self.items[index]
+        cap = self._open(item)
+        frames = []
+        if cap.isOpened():
+            for _ in range(self.preroll_frames):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.append(frame)
+        if not frames:
+            cap.release()
+            return
+        self._next = (index, pass_index, cap, frames)
+
+    def _maybe_start_preroll(self):
+        if self._preroll_thread is not None:
+            return
+        end = self.item.end_frame
+        if end is not None and \
+                self.item.in_frame + self.position < end - self.lookahead_frames:
+            return
+        self._start_preroll()
+
+    def _start_preroll(self):
+        self._preroll_thread = threading.Thread(
+            target=self._open_next, args=self._next_target(),
+            name="playlist-preroll", daemon=True)
+        self._preroll_thread.start()
+
+    def _at_end(self):
+        end = self.item.end_frame
+        return end is not None and self.item.in_frame + self.position >= end
+
+    def _advance(self):
+        """切换到下一项（或当前项的下一遍），返回是否成功"""
+        for _ in range(len(self.items) + 1):
+            if self._preroll_thread is None:
+                self._start_preroll()
+            self._preroll_thread.join()
+            self._preroll_thread = None
+
+            target = self._next_target()
+            nxt, self._next = self._next, None
+            if nxt is not None:
+                index, pass_index, cap, frames = nxt
+                old_cap, self.cap = self.cap, cap
+                # 旧解码器在后台释放，不占用发送时间
+                threading.Thread(target=old_cap.release, daemon=True).start()
+                self._preroll.extend(frames)
+                self._set_current(index, pass_index)
+                return True
+
+            # 下一项无法打开，跳过它
+            print(f"警告: 无法播放 {self.items[target[0]].path}，跳过")
+            self._set_current(*target)
+            self.pass_index = self.items[target[0]].loops - 1
+        return False
+
+    def _set_current(self, index, pass_index):
+        if index < self.index or (index == self.index and pass_index == 0
+                                  and len(self.items) == 1):
+            self.playlist_loops += 1
+        self.index = index
+        self.pass_index = pass_index
+        self.position = 0
+
+    def _next_pass(self):
+        """当前项播放完毕，切换并记录衔接间隔，返回 (ret, frame)"""
+        start = time.perf_counter()
+        ok = self._advance()
+        self.last_seek_time = time.perf_counter() - start
+        if not ok:
+            return False, None
+
+        self.loops += 1
+        now = time.perf_counter()
+        if self._last_frame_time is not None:
+            self.last_loop_gap = now - self._last_frame_time
+            self.max_loop_gap = max(self.max_loop_gap, self.last_loop_gap)
+        self._last_frame_time = now
+        self.position = 1
+        return True, self._preroll.popleft()
+
+    def read(self):
+        """读取下一帧，当前项结束时切换到下一项"""
+        if self._preroll:
+            frame = self._preroll.popleft()
+        else:
+            if self._at_end():
+                return self._next_pass()
+            ret, frame = self.cap.read()
+            if not ret:
+                return self._next_pass()
+
+        self.position += 1
+        self._maybe_start_preroll()
+        self._last_frame_time = time.perf_counter()
+        return True, frame
+
+    def grab(self):
+        """跳过一帧（只 grab 不 retrieve），返回是否成功"""
+        if self._preroll:
+            self._preroll.popleft()
+        elif self._at_end() or not self.cap.grab():
+            ret, _ = self._next_pass()
+            return ret
+
+        self.position += 1
+        self._maybe_start_preroll()
+        return True
+
+    def release(self):
+        """释放所有解码器"""
+        if self._preroll_thread is not None:
+            self._preroll_thread.join()
+            self._preroll_thread = None
+        if self._next is not None:
+            self._next[2].release()
+            self._next = None
+        self._preroll.clear()
+        if self.cap is not None:
+            self.cap.release()
+
+    def stats(self):
+        """返回切换统计信息（毫秒）"""
+        return {
+            'loops': self.loops,
+            'playlist_loops': self.playlist_loops,
+            'item': self.item.name,
+            'index': self.index,
+            'last_loop_gap_ms': self.last_loop_gap * 1000,
+            'max_loop_gap_ms': self.max_loop_gap * 1000,
+            'last_seek_ms': self.last_seek_time * 1000,
+        }
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+视频探测缓存
+扫描一遍视频的数据包（只解复用、不解码）得到流信息和关键帧索引，保存为视频
+旁边的 .probe.json 文件，以文件大小和修改时间判断是否失效。再次打开同一个视频
+时直接读取，不必打开解码器；定位时先跳到目标之前最近的关键帧，再向前解码到
+目标帧，保证帧精确
+"""
+
+import json
+import os
+import tempfile
+import time
+from bisect import bisect_right
+from pathlib import Path
+
+from lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+
+
+PROBE_VERSION = 1
+PROBE_SUFFIX = '.probe.json'
+
+
+class VideoProbe:
+    """视频的流信息和关键帧索引"""
+
+    def __init__(self, path, fps=0.0, width=0, height=0, frame_count=0, codec='',
+                 keyframes=(), keyframe_pts=()):
+        """
+        Args:
+            path: 视频文件路径
+            fps: 帧率
+            width: 宽度
+            height: 高度
+            frame_count: 帧数（扫描得到的实际数据包数，而不是容器头中的估计值）
+            codec: 编码格式（FourCC）
+            keyframes: 关键帧的帧序号（升序）；为空表示没有索引
+            keyframe_pts: 各关键帧的显示时间戳（毫秒）
+        """
+        self.path = str(path)
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.frame_count = frame_count
+        self.codec = codec
+        self.keyframes = list(keyframes)
+        self.keyframe_pts = list(keyframe_pts)
+
+    @property
+    def duration(self):
+        """时长（秒）"""
+        return self.frame_count / self.fps if self.fps > 0 else 0.0
+
+    @property
+    def indexed(self):
+        """是否有关键帧索引"""
+        return bool(self.keyframes)
+
+    def nearest_keyframe(self, frame):
+        """frame 之前（含）最近的关键帧序号，没有索引时返回 None"""
+        if not self.keyframes:
+            return None
+        i = bisect_right(self.keyframes, frame) - 1
+        return self.keyframes[max(i, 0)]
+
+    def to_dict(self):
+        return {
+            'fps': self.fps,
+            'width': self.width,
+            'height': self.height,
+            'frame_count': self.frame_count,
+            'codec': self.codec,
+            'keyframes': self.keyframes,
+            'keyframe_pts': self.keyframe_pts,
+        }
+
+    @classmethod
+    def from_dict(cls, path, data):
+        return cls(path, data['fps'], data['width'], data['height'], data['frame_count'],
+                   data.get('codec', ''), data.get('keyframes', ()),
+                   data.get('keyframe_pts', ()))
+
+
+def _fourcc(value):
+    code = int(value)
+    return ''.join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip('\0 ')
+
+
+def scan_video(path):
+    """
+    扫描视频，返回 VideoProbe
+
+    以原始数据包模式（CAP_PROP_FORMAT = -1）打开，逐包 grab() 只解复用不解码，
+    由 CAP_PROP_LRF_HAS_KEY_FRAME 判断关键帧。后端不支持原始模式时只读取流信息，
+    不生成索引（定位时回退到 CAP_PROP_POS_FRAMES）。
+
+    Raises:
+        ValueError: 无法打开视频
+    """
+    path = str(path)
+    cap = None
+    if hasattr(cv2, 'CAP_PROP_LRF_HAS_KEY_FRAME'):
+        cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+        if not cap.isOpened() or cap.get(cv2.CAP_PROP_FORMAT) != -1:
+            cap.release()
+            cap = None
+    raw = cap is not None
+    if cap is None:
+        cap = cv2.VideoCapture(path)
+
+    try:
+        if not cap.isOpened():
+            raise ValueError(f"无法打开视频文件: {path}")
+        probe = VideoProbe(path,
+                           fps=cap.get(cv2.CAP_PROP_FPS),
+                           width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                           height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                           frame_count=int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+                           codec=_fourcc(cap.get(cv2.CAP_PROP_FOURCC)))
+        if not raw:
+            return probe
+
+        count = 0
+        while cap.grab():
+            if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                probe.keyframes.append(count)
+                probe.keyframe_pts.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+            count += 1
+        if count:
+            probe.frame_count = count
+        return probe
+    finally:
+        cap.release()
+
+
+def probe_path(source_path, cache_dir=None):
+    """探测缓存文件路径，默认放在视频旁边（不可写时使用临时目录）"""
+    source_path = Path(source_path).resolve()
+    if cache_dir is None:
+        cache_dir = source_path.parent
+        if not os.access(cache_dir, os.W_OK):
+            cache_dir = Path(tempfile.gettempdir()) / 'virtual_camera_cache'
+    return Path(cache_dir) / (source_path.name + PROBE_SUFFIX)
+
+
+def _load_sidecar(path, stat):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (data.get('version') != PROBE_VERSION or data.get('size') != stat.st_size
+            or data.get('mtime_ns') != stat.st_mtime_ns):
+        return None
+    return data
+
+
+def load_probe(source_path, cache_dir=None, use_cache=True):
+    """
+    读取视频的探测信息：缓存有效时直接读取，否则扫描一遍并写入缓存
+
+    Args:
+        source_path: 视频文件路径
+        cache_dir: 缓存目录，见 probe_path
+        use_cache: False 时总是重新扫描，也不写缓存
+
+    Returns:
+        VideoProbe
+
+    Raises:
+        ValueError: 无法打开视频
+    """
+    try:
+        stat = os.stat(source_path)
+    except OSError:
+        raise ValueError(f"无法打开视频文件: {source_path}")
+    sidecar = probe_path(source_path, cache_dir)
+    if use_cache:
+        data = _load_sidecar(sidecar, stat)
+        if data is not None:
+            return VideoProbe.from_dict(source_path, data)
+
+    probe = scan_video(source_path)
+    if use_cache:
+        data = {'version': PROBE_VERSION, 'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns, **probe.to_dict()}
+        tmp_path = sidecar.with_name(sidecar.name + '.tmp')
+        try:
+            sidecar.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, sidecar)
+        except OSError:
+            pass  # 缓存只是加速，写不进去不影响播放
+    return probe
+
+
+def seek_frame(cap, frame, probe=None):
+    """
+    把 cap 定位到指定帧（下一次 read() 返回该帧）
+
+    有关键帧索引时先定位到之前最近的关键帧，再逐帧 grab()（只解码不转换）
+    到目标帧；没有索引时使用 CAP_PROP_POS_FRAMES。
+
+    Returns:
+        定位耗时（秒）
+    """
+    start = time.perf_counter()
+    key = probe.nearest_keyframe(frame) if probe is not None else None
+    if key is None:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame)
+    else:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, key)
+        for _ in range(frame - key):
+            if not cap.grab():
+                break
+    return time.perf_counter() - start
@@ -5,10 +5,13 @@
 遍历所有28个课程位置
 """
 
-import pyautogui
 import time
 import json
 
+from lazy_import import lazy_import
+
+pyautogui = lazy_import('pyautogui')
+
 
 # 4个二级菜单的配置
 MENUS = [
@@ -5,15 +5,18 @@
 无需复杂配置，直接运行
 """
 
-import pyautogui
 import time
-from PIL import ImageGrab
 import re
 import os
 
+from lazy_import import lazy_import
+
+pyautogui = lazy_import('pyautogui')
+ImageGrab = lazy_import('PIL.ImageGrab')
+
 # 尝试导入OCR
 try:
-    import pytesseract
+    pytesseract = lazy_import('pytesseract')
     HAS_OCR = True
 except:
     HAS_OCR = False
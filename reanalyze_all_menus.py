@@ -5,10 +5,13 @@
 精确识别4个二级菜单区域
 """
 
-import cv2
-import numpy as np
 import json
 
+from lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
 
 def detect_all_red_buttons(image):
     """检测所有红色按钮（包括可能遗漏的）"""
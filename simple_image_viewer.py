@@ -5,11 +5,14 @@
 显示图片并标注可点击区域
 """
 
-import cv2
-import numpy as np
-from PIL import Image
 import sys
 
+from lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+
 
 def show_image_with_grid(image_path):
     """显示图片并添加网格"""
@@ -2,41 +2,168 @@
 # -*- coding: utf-8 -*-
 """
 测试虚拟摄像头是否正常工作
-打开摄像头预览窗口
+打开摄像头预览窗口；--latency 模式下解出发送方画在帧上的条码，测量端到端延迟
 """
 
-import cv2
+import json
+import os
 import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
 
+from frame_sink import SharedMemoryFrameReader
+from latency_probe import LatencyReport, Y4mFollower, read_stamp
+from lazy_import import lazy_import
 
-def list_cameras():
-    """列出所有可用的摄像头"""
+cv2 = lazy_import('cv2')
+
+
+# 设备列表缓存：插拔摄像头后最多 CAMERA_CACHE_TTL 秒内仍显示旧结果，可用 --rescan 跳过
+CAMERA_CACHE_VERSION = 1
+CAMERA_CACHE_TTL = 30.0
+
+
+def camera_backend():
+    """当前平台打开摄像头使用的 OpenCV 后端"""
+    return cv2.CAP_DSHOW if sys.platform == 'win32' else cv2.CAP_ANY
+
+
+def camera_cache_path():
+    """设备列表缓存文件路径（与视频探测缓存使用同一临时目录）"""
+    return Path(tempfile.gettempdir()) / 'virtual_camera_cache' / 'cameras.json'
+
+
+def probe_camera(index, backend=None, timeout=3.0):
+    """
+    探测一个摄像头设备：只读取设备属性，不抓取画面
+    
+    Args:
+        index: 设备编号
+        backend: OpenCV 后端，默认见 camera_backend
+        timeout: 打开设备的超时（秒），后端支持 CAP_PROP_OPEN_TIMEOUT_MSEC 时生效
+    
+    Returns:
+        {'index', 'width', 'height', 'fps', 'fourcc'}，设备不存在或无法打开时返回 None
+    """
+    if backend is None:
+        backend = camera_backend()
+    open_timeout = getattr(cv2, 'CAP_PROP_OPEN_TIMEOUT_MSEC', None)
+    if open_timeout is not None:
+        cap = cv2.VideoCapture(index, backend, [open_timeout, int(timeout * 1000)])
+    else:
+        cap = cv2.VideoCapture(index, backend)
+    try:
+        if not cap.isOpened():
+            return None
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+        return {
+            'index': index,
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': cap.get(cv2.CAP_PROP_FPS),
+            'fourcc': ''.join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip('\x00 '),
+        }
+    finally:
+        cap.release()
+
+
+def _load_camera_cache(path, key, ttl):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (data.get('version') != CAMERA_CACHE_VERSION or data.get('key') != key
+            or not 0 <= time.time() - data.get('time', 0) <= ttl):
+        return None
+    return data.get('cameras')
+
+
+def _save_camera_cache(path, key, cameras):
+    data = {'version': CAMERA_CACHE_VERSION, 'key': key, 'time': time.time(),
+            'cameras': cameras}
+    tmp_path = path.with_name(path.name + '.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # 缓存只是加速，写不进去不影响扫描
+
+
+def scan_cameras(max_index=10, timeout=3.0, backend=None):
+    """
+    并行探测设备 0 ~ max_index-1
+    
+    每个设备在独立的守护线程中打开，所有设备共用一个截止时间：总耗时取决于
+    最慢的一个设备（最多 timeout 秒），而不是各设备耗时之和。到截止时间仍未
+    返回的设备（部分后端不支持打开超时）视为超时，其线程留在后台自行结束。
+    
+    Returns:
+        (cameras, timed_out)：可用设备列表（按编号排序）和超时的设备编号
+    """
+    if backend is None:
+        backend = camera_backend()
+    results = [None] * max_index
+    
+    def run(index):
+        try:
+            results[index] = probe_camera(index, backend, timeout)
+        except Exception:
+            pass  # 个别设备出错（驱动异常等）不影响其他设备
+    
+    threads = [threading.Thread(target=run, args=(i,), name=f'camera-probe-{i}', daemon=True)
+               for i in range(max_index)]
+    for thread in threads:
+        thread.start()
+    deadline = time.perf_counter() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.perf_counter()))
+    
+    timed_out = [i for i, thread in enumerate(threads) if thread.is_alive()]
+    cameras = [info for i, info in enumerate(results) if info is not None and i not in timed_out]
+    return cameras, timed_out
+
+
+def list_cameras(max_index=10, timeout=3.0, use_cache=True, cache_ttl=CAMERA_CACHE_TTL):
+    """
+    列出所有可用的摄像头
+    
+    Args:
+        max_index: 检查的设备数量（编号 0 ~ max_index-1）
+        timeout: 单个设备的探测超时（秒），各设备并行探测
+        use_cache: 是否使用 cache_ttl 秒内的扫描结果；False 时总是重新扫描
+        cache_ttl: 缓存有效期（秒）
+    """
     print("正在扫描摄像头设备...\n")
     
-    available_cameras = []
+    backend = camera_backend()
+    key = {'platform': sys.platform, 'backend': int(backend), 'max_index': max_index}
+    cache_path = camera_cache_path()
+    available_cameras = _load_camera_cache(cache_path, key, cache_ttl) if use_cache else None
+    if available_cameras is not None:
+        print(f"（使用 {cache_ttl:g} 秒内的扫描结果，--rescan 重新扫描）\n")
+    else:
+        start = time.perf_counter()
+        available_cameras, timed_out = scan_cameras(max_index, timeout, backend)
+        print(f"扫描 {max_index} 个设备耗时 {time.perf_counter() - start:.2f} 秒")
+        if timed_out:
+            print(f"警告：设备 {', '.join(map(str, timed_out))} 在 {timeout:g} 秒内没有响应，已跳过")
+        print()
+        # 有设备超时或一个都没找到（按提示启动虚拟摄像头后马上重试）时不写缓存
+        if use_cache and available_cameras and not timed_out:
+            _save_camera_cache(cache_path, key, available_cameras)
     
-    for i in range(10):  # 检查前10个设备
-        cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
-        if cap.isOpened():
-            ret, frame = cap.read()
-            if ret:
-                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                fps = cap.get(cv2.CAP_PROP_FPS)
-                
-                available_cameras.append({
-                    'index': i,
-                    'width': width,
-                    'height': height,
-                    'fps': fps
-                })
-                
-                print(f"摄像头 {i}:")
-                print(f"  分辨率: {width}x{height}")
-                print(f"  帧率: {fps} FPS")
-                print()
-            
-            cap.release()
+    for camera in available_cameras:
+        print(f"摄像头 {camera['index']}:")
+        print(f"  分辨率: {camera['width']}x{camera['height']}")
+        print(f"  帧率: {camera['fps']} FPS")
+        if camera.get('fourcc'):
+            print(f"  格式: {camera['fourcc']}")
+        print()
     
     return available_cameras
 
@@ -45,7 +172,7 @@ def test_camera(camera_index):
     """测试指定摄像头"""
     print(f"正在打开摄像头 {camera_index}...")
     
-    cap = cv2.VideoCapture(camera_index, cv2.CAP_DSHOW)
+    cap = cv2.VideoCapture(camera_index, camera_backend())
     
     if not cap.isOpened():
         print(f"错误：无法打开摄像头 {camera_index}")
@@ -88,12 +215,136 @@ def test_camera(camera_index):
         print(f"总共显示了 {frame_count} 帧")
 
 
+def open_latency_source(source):
+    """
+    打开延迟测量的输入
+    
+    Args:
+        source: 'shm:名称'（SharedMemorySink）、'file:路径.y4m'（FileSink，边写边读）
+                或 'camera:编号'（摄像头设备）
+    
+    Returns:
+        (read(timeout) -> (帧, 像素格式, 宽, 高) 或 None, close())
+    """
+    kind, _, arg = source.partition(':')
+    if kind == 'shm':
+        reader = SharedMemoryFrameReader(arg or 'virtual_camera')
+        
+        def read(timeout):
+            result = reader.read_next(timeout=timeout)
+            if result is None:
+                return None
+            return result[1], reader.fmt, reader.width, reader.height
+        return read, reader.close
+    
+    if kind == 'file':
+        if not arg.lower().endswith('.y4m'):
+            raise ValueError("文件输入只支持 .y4m（发送方使用 --sink file:路径.y4m）")
+        follower = Y4mFollower(arg)
+        
+        def read(timeout):
+            result = follower.read_next(timeout=timeout)
+            if result is None:
+                return None
+            return result[0], follower.fmt, follower.width, follower.height
+        return read, follower.close
+    
+    if kind == 'camera':
+        cap = cv2.VideoCapture(int(arg or 0), camera_backend())
+        if not cap.isOpened():
+            raise ValueError(f"无法打开摄像头 {arg}")
+        
+        def read(timeout):
+            ret, frame = cap.read()
+            if not ret:
+                return None
+            return frame, 'bgr', frame.shape[1], frame.shape[0]
+        return read, cap.release
+    
+    raise ValueError(f"无效的延迟测量输入: {source}（应为 shm:名称、file:路径.y4m 或 camera:编号）")
+
+
+def measure_latency(source, duration=10.0, report_path=None, timeout=5.0):
+    """
+    测量端到端延迟
+    
+    发送方需要开启 --latency-probe。每收到一帧立即解出条码中的帧号和发送时刻，
+    与当前时刻（同一台机器的单调时钟）相减得到延迟，并统计丢帧、乱序和重复。
+    
+    Args:
+        source: 输入，见 open_latency_source
+        duration: 测量时长（秒）
+        report_path: JSON 报告的输出路径
+        timeout: 超过该时长收不到新帧时结束（发送方已停止）
+    
+    Returns:
+        LatencyReport
+    """
+    read, close = open_latency_source(source)
+    report = LatencyReport()
+    print(f"正在测量延迟: {source}（{duration:g} 秒）\n")
+    
+    start = time.perf_counter()
+    next_print = start + 1.0
+    try:
+        while time.perf_counter() - start < duration:
+            result = read(timeout)
+            if result is None:
+                print("收不到新帧，发送方可能已停止")
+                break
+            frame, fmt, width, height = result
+            report.record(read_stamp(frame, fmt, width, height))
+            
+            if time.perf_counter() >= next_print:
+                next_print += 1.0
+                print(f"  {report.summary()}")
+    except KeyboardInterrupt:
+        print("\n已中断")
+    finally:
+        close()
+    
+    print(f"\n{report.summary()}")
+    if report_path:
+        report.write(report_path)
+        print(f"报告已写入: {report_path}")
+    return report
+
+
 def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='虚拟摄像头测试工具')
+    parser.add_argument('camera', nargs='?', type=int,
+                       help='要预览的摄像头编号（省略时扫描后选择）')
+    parser.add_argument('--latency', metavar='SOURCE',
+                       help='测量端到端延迟: shm:名称、file:路径.y4m 或 camera:编号'
+                            '（发送方需开启 --latency-probe）')
+    parser.add_argument('--duration', type=float, default=10.0,
+                       help='延迟测量时长（秒）(默认: 10)')
+    parser.add_argument('--report', metavar='PATH',
+                       help='把延迟百分位、丢帧、乱序统计写入 JSON 文件')
+    parser.add_argument('--max-devices', type=int, default=10,
+                       help='扫描的摄像头设备数量 (默认: 10)')
+    parser.add_argument('--probe-timeout', type=float, default=3.0,
+                       help='单个设备的探测超时（秒），各设备并行探测 (默认: 3)')
+    parser.add_argument('--rescan', action='store_true',
+                       help=f'忽略 {CAMERA_CACHE_TTL:g} 秒内的扫描结果缓存，重新扫描')
+    args = parser.parse_args()
+    
     print("========================================")
     print("虚拟摄像头测试工具")
     print("========================================\n")
     
-    cameras = list_cameras()
+    if args.latency:
+        try:
+            report = measure_latency(args.latency, args.duration, args.report)
+        except (ValueError, FileNotFoundError) as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+        # 没有解出任何条码时以非零状态退出，便于在 CI 中使用
+        sys.exit(0 if report.latencies else 1)
+    
+    cameras = list_cameras(args.max_devices, args.probe_timeout, use_cache=not args.rescan)
     
     if not cameras:
         print("未找到任何摄像头设备")
@@ -106,8 +357,8 @@ def main():
     print(f"找到 {len(cameras)} 个摄像头设备\n")
     
     # 如果指定了摄像头索引
-    if len(sys.argv) > 1:
-        camera_index = int(sys.argv[1])
+    if args.camera is not None:
+        camera_index = args.camera
     else:
         # 提示用户选择
         if len(cameras) == 1:
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""控制接口修改帧率时输出帧率保持一致"""
+
+from contextlib import ExitStack
+
+import pytest
+
+from frame_pacer import FramePacer
+from frame_sink import SharedMemoryFrameReader
+from virtual_camera import VirtualCamera
+
+
+def _open_camera(sink, **kwargs):
+    stack = ExitStack()
+    camera = VirtualCamera('pattern:bars', width=320, height=180, sink=sink,
+                           wait_mode=False, **kwargs)
+    camera.open_outputs(stack)
+    camera.wait_for_outputs()
+    camera.pacer = FramePacer(camera.fps, paced=False)
+    return camera, stack
+
+
+def test_fps_updates_shared_memory_header():
+    camera, stack = _open_camera('shm:test_control_fps')
+    with stack:
+        reader = SharedMemoryFrameReader('test_control_fps')
+        try:
+            assert reader.fps == 30
+            fps = camera.prepare_control('fps', ['10'])
+            assert camera.handle_control('fps', fps) == {'fps': 10}
+            assert camera.channels[0].sink.fps == 10
+            assert reader.fps == 10
+        finally:
+            reader.close()
+
+
+def test_fps_rejected_for_y4m_sink(tmp_path):
+    path = tmp_path / 'out.y4m'
+    camera, stack = _open_camera(f'file:{path}')
+    with stack:
+        with pytest.raises(ValueError):
+            camera.prepare_control('fps', ['10'])
+        # 即使跳过检查，输出也拒绝修改，其余状态不变
+        with pytest.raises(ValueError):
+            camera.handle_control('fps', 10)
+        assert camera.fps == 30
+        assert camera.channels[0].sink.fps == 30
+    assert b' F30:1 ' in path.read_bytes().split(b'\n', 1)[0]
+
+
+def test_fps_allowed_for_raw_file_sink(tmp_path):
+    camera, stack = _open_camera(f"file:{tmp_path / 'out.raw'}")
+    with stack:
+        assert camera.prepare_control('fps', ['15']) == 15
+
+
+def test_fps_rejected_while_recording_with_fixed_rate(tmp_path):
+    from frame_recorder import FrameRecorder
+    camera, stack = _open_camera('null')
+    with stack:
+        camera.recorder = FrameRecorder(tmp_path / 'rec.mp4', 'bgr', 320, 180, 30)
+        with pytest.raises(ValueError):
+            camera.prepare_control('fps', ['10'])
+
+
+@pytest.mark.parametrize('name, fixed', [
+    ('rec.mp4', True), ('rec.avi', True), ('rec.y4m', True), ('rec.raw', False),
+])
+def test_recorder_fixed_rate(name, fixed):
+    from frame_recorder import FrameRecorder
+    assert FrameRecorder(name, 'i420', 320, 180, 30).fixed_rate is fixed
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""缩放几何和画面适配"""
+
+import numpy as np
+import pytest
+
+from pixel_format import FrameConverter, fit_geometry
+
+
+def test_stretch_uses_whole_frames():
+    assert fit_geometry('stretch', 1920, 1080, 1280, 1024) == \
+        ((0, 0, 1920, 1080), (0, 0, 1280, 1024))
+
+
+def test_letterbox_wider_source_bars_top_and_bottom():
+    src, dst = fit_geometry('letterbox', 1920, 1080, 1280, 1024)
+    assert src == (0, 0, 1920, 1080)
+    assert dst == (0, 152, 1280, 720)
+
+
+def test_letterbox_narrower_source_bars_left_and_right():
+    src, dst = fit_geometry('letterbox', 640, 480, 1280, 720)
+    assert src == (0, 0, 640, 480)
+    assert dst == (160, 0, 960, 720)
+
+
+def test_crop_narrower_source_cuts_top_and_bottom():
+    src, dst = fit_geometry('crop', 640, 480, 1280, 720)
+    assert src == (0, 60, 640, 360)
+    assert dst == (0, 0, 1280, 720)
+
+
+def test_crop_wider_source_cuts_left_and_right():
+    src, dst = fit_geometry('crop', 1920, 1080, 1024, 1024)
+    assert src == (420, 0, 1080, 1080)
+    assert dst == (0, 0, 1024, 1024)
+
+
+@pytest.mark.parametrize('fit', ['letterbox', 'crop'])
+def test_same_aspect_ratio_needs_no_bars_or_crop(fit):
+    assert fit_geometry(fit, 1920, 1080, 1280, 720) == \
+        ((0, 0, 1920, 1080), (0, 0, 1280, 720))
+
+
+def test_unknown_fit_mode():
+    with pytest.raises(ValueError):
+        fit_geometry('zoom', 1920, 1080, 1280, 720)
+
+
+def test_converter_letterbox_fills_bars_with_black():
+    converter = FrameConverter('bgr', 64, 64, fit='letterbox')
+    dst = np.full((64, 64, 3), 7, np.uint8)
+    converter(np.full((32, 64, 3), 200, np.uint8), dst=dst)
+    assert (dst[:16] == 0).all() and (dst[48:] == 0).all()
+    assert (dst[16:48] == 200).all()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""帧环形缓冲区"""
+
+import numpy as np
+import pytest
+
+from frame_buffer import FrameRingBuffer
+
+
+def _write(ring, value):
+    slot = ring.acquire_write(timeout=0)
+    assert slot is not None
+    slot.fill(value)
+    ring.commit_write()
+
+
+def test_capacity_must_be_at_least_two():
+    with pytest.raises(ValueError):
+        FrameRingBuffer(1, (2, 2))
+
+
+def test_fifo_order_across_wraparound():
+    ring = FrameRingBuffer(3, (2, 2))
+    popped = []
+    for value in range(10):
+        _write(ring, value)
+        popped.append(int(ring.pop()[0, 0]))
+    assert popped == list(range(10))
+    assert ring.stats()['produced'] == ring.stats()['consumed'] == 10
+
+
+def test_held_slot_is_not_overwritten():
+    ring = FrameRingBuffer(2, (2, 2))
+    _write(ring, 1)
+    _write(ring, 2)
+    assert ring.acquire_write(timeout=0) is None   # 缓冲区已满
+    held = ring.pop()
+    assert held[0, 0] == 1
+    # 上一次取走的槽位仍被持有，另一个槽位里还有未发送的帧
+    assert ring.acquire_write(timeout=0) is None
+    assert ring.pop()[0, 0] == 2
+    # 取走第 2 帧后才释放第 1 帧所在的槽位
+    _write(ring, 3)
+    assert held[0, 0] == 3
+
+
+def test_underruns_counted_and_last_frame_kept():
+    ring = FrameRingBuffer(3, (2, 2))
+    _write(ring, 5)
+    frame = ring.pop()
+    assert ring.pop() is None
+    assert ring.pop(timeout=0.01) is None
+    stats = ring.stats()
+    assert stats['underruns'] == 2
+    assert stats['min_depth'] == 0 and stats['max_depth'] == 1
+    # 欠载时调用方重发上一帧，槽位内容不变
+    assert frame[0, 0] == 5
+
+
+def test_closed_buffer_does_not_count_underruns():
+    ring = FrameRingBuffer(2, (2, 2))
+    ring.close()
+    assert ring.pop() is None
+    assert ring.acquire_write(timeout=0) is None
+    assert ring.stats()['underruns'] == 0
+
+
+def test_depth_tracking():
+    ring = FrameRingBuffer(4, (2,))
+    for value in range(3):
+        _write(ring, value)
+    assert ring.depth == 3
+    assert ring.wait_for_depth(3, timeout=0)
+    assert not ring.wait_for_depth(4, timeout=0)
+    ring.pop()
+    assert ring.depth == 2
+    assert np.array_equal(ring.pop(), [1, 1])
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""预解码缓存和原始帧缓存文件的大小上限"""
+
+import cv2
+import numpy as np
+import pytest
+
+from frame_cache import RawFrameCache, preload_frames
+from pixel_format import FrameConverter
+
+
+class FakeCapture:
+    """按给定帧数返回纯色帧，CAP_PROP_FRAME_COUNT 报告 reported（可以与实际不符）"""
+
+    def __init__(self, frames, reported, size=(64, 48)):
+        self.remaining = frames
+        self.reported = reported
+        self.size = size
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FRAME_COUNT: self.reported,
+                cv2.CAP_PROP_FRAME_WIDTH: self.size[0],
+                cv2.CAP_PROP_FRAME_HEIGHT: self.size[1],
+                cv2.CAP_PROP_FPS: 30.0}.get(prop, 0.0)
+
+    def read(self):
+        if self.remaining <= 0:
+            return False, None
+        self.remaining -= 1
+        return True, np.full((self.size[1], self.size[0], 3), self.remaining, np.uint8)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    source = tmp_path / 'video.mp4'
+    source.write_bytes(b'\0' * 16)
+    return RawFrameCache(source, 32, 24, cache_dir=tmp_path / 'cache')
+
+
+def _tmp_files(cache):
+    return list(cache.path.parent.glob('*.tmp'))
+
+
+def test_build_within_limit(cache):
+    frame_bytes = 32 * 24 * 3
+    frames = cache.build(FakeCapture(10, 10), max_bytes=10 * frame_bytes)
+    assert frames.shape == (10, 24, 32, 3)
+    assert frames[0, 0, 0, 0] == 9 and frames[-1, 0, 0, 0] == 0
+
+
+def test_build_rejects_reported_count_over_limit(cache):
+    assert cache.build(FakeCapture(10, 10), max_bytes=5 * 32 * 24 * 3) is None
+    assert not cache.path.exists()
+
+
+@pytest.mark.parametrize('reported', [0, -1, 3])
+def test_build_stops_when_actual_count_exceeds_limit(cache, reported):
+    # 帧数未知或偏小时不能只靠估算，写入过程中超出上限就要停止并删除临时文件
+    capture = FakeCapture(100, reported)
+    assert cache.build(capture, max_bytes=5 * 32 * 24 * 3) is None
+    assert capture.remaining > 0
+    assert not cache.path.exists()
+    assert _tmp_files(cache) == []
+
+
+def test_preload_rejects_unknown_or_underreported_count():
+    converter = FrameConverter('bgr', 32, 24)
+    assert preload_frames(FakeCapture(10, 0), converter, 1 << 20) is None
+    assert preload_frames(FakeCapture(10, 5), converter, 1 << 20) is None
+    frames = preload_frames(FakeCapture(10, 10), converter, 1 << 20)
+    assert frames.shape == (10, 24, 32, 3)
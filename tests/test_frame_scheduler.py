@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""输出帧到源帧的映射"""
+
+import pytest
+
+from frame_scheduler import FrameScheduler
+
+
+def _source_frames(scheduler, ticks):
+    """依次推进 ticks 个输出帧，返回每个输出帧对应的源帧序号"""
+    frames = []
+    for _ in range(ticks):
+        scheduler.advance()
+        frames.append(scheduler.source_index)
+    return frames
+
+
+def test_passthrough():
+    scheduler = FrameScheduler(30, 30)
+    assert scheduler.passthrough
+    assert [scheduler.advance() for _ in range(5)] == [1] * 5
+    assert scheduler.stats()['skipped'] == scheduler.stats()['repeated'] == 0
+
+
+def test_60_to_30_skips_every_other_source_frame():
+    scheduler = FrameScheduler(60, 30)
+    assert not scheduler.passthrough
+    assert [scheduler.advance() for _ in range(4)] == [1, 2, 2, 2]
+    assert scheduler.source_index == 6
+    stats = scheduler.stats()
+    assert (stats['decoded'], stats['skipped'], stats['repeated']) == (4, 3, 0)
+
+
+def test_24_to_30_repeats_one_frame_in_five():
+    scheduler = FrameScheduler(24, 30)
+    assert _source_frames(scheduler, 10) == [0, 0, 1, 2, 3, 4, 4, 5, 6, 7]
+    _source_frames(scheduler, 20)
+    stats = scheduler.stats()
+    # 一秒 30 个输出帧正好用掉 24 个源帧
+    assert (stats['decoded'], stats['skipped'], stats['repeated']) == (24, 0, 6)
+
+
+@pytest.mark.parametrize('source_fps, output_fps', [(60, 30), (24, 30), (29.97, 30), (25, 60)])
+def test_no_drift_over_an_hour(source_fps, output_fps):
+    scheduler = FrameScheduler(source_fps, output_fps)
+    ticks = output_fps * 3600
+    advanced = sum(scheduler.advance() for _ in range(ticks))
+    # 最后一个输出帧（第 ticks-1 帧）的源帧由时间戳直接算出，不受累加误差影响
+    assert scheduler.source_index == int((ticks - 1) * source_fps / output_fps + 1e-9)
+    assert advanced == scheduler.source_index + 1
+
+
+def test_unknown_source_fps_outputs_every_frame():
+    scheduler = FrameScheduler(0, 30)
+    assert scheduler.passthrough
+    assert [scheduler.advance() for _ in range(3)] == [1, 1, 1]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""输出描述的解析和检查"""
+
+import pytest
+
+from frame_sink import OutputChannel, OutputSpec, parse_output_spec
+
+
+def test_parse_defaults():
+    spec = parse_output_spec('1280x720', fps=25, pixel_format='bgr', sink='null')
+    assert (spec.width, spec.height, spec.fps, spec.pixel_format, spec.sink) == \
+        (1280, 720, 25, 'bgr', 'null')
+
+
+def test_parse_fps_and_options():
+    spec = parse_output_spec('854X480@15,fmt=i420,sink=shm:monitor')
+    assert (spec.width, spec.height, spec.fps, spec.pixel_format, spec.sink) == \
+        (854, 480, 15, 'i420', 'shm:monitor')
+
+
+@pytest.mark.parametrize('text', [
+    '1280', '1280x', 'axb', '1280x720@', '1280x720@fast', '1280x720x3',
+    '0x0', '0x720', '100x-5', '1280x720@0', '1280x720@-30',
+    '641x360,fmt=i420', '640x361,fmt=nv12', '641x360,fmt=yuyv',
+])
+def test_parse_rejects_invalid_size(text):
+    with pytest.raises(ValueError, match='无效的输出分辨率'):
+        parse_output_spec(text)
+
+
+def test_parse_rejects_unknown_option():
+    with pytest.raises(ValueError, match='未知的输出选项'):
+        parse_output_spec('640x360,scale=2')
+
+
+def test_odd_size_allowed_for_bgr_and_auto():
+    assert parse_output_spec('641x361,fmt=bgr').width == 641
+    # auto 在协商时跳过 YUV 格式
+    assert parse_output_spec('641x361').height == 361
+
+
+@pytest.mark.parametrize('args', [
+    (0, 720, 30), (1280, 0, 30), (1280, 720, 0), (641, 720, 30, 'i420'),
+])
+def test_output_spec_rejects_invalid(args):
+    with pytest.raises(ValueError, match='无效的输出分辨率'):
+        OutputSpec(*args)
+
+
+@pytest.mark.parametrize('fps, master, expected', [
+    (30, 30, [True] * 6),
+    (15, 30, [True, False] * 3),
+    (10, 30, [True, False, False] * 2),
+])
+def test_channel_due_follows_master_clock(fps, master, expected):
+    channel = OutputChannel(OutputSpec(64, 48, fps, sink='null'), master)
+    assert [channel.due() for _ in expected] == expected
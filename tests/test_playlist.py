@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""播放列表项的解析和入点、出点检查"""
+
+import pytest
+
+from playlist import PlaylistItem, load_m3u, parse_item_spec
+
+
+def test_parse_item_spec_options():
+    item = parse_item_spec('main.mp4::in=10,out=70,loops=3')
+    assert (item.path, item.in_point, item.out_point, item.loops) == ('main.mp4', 10.0, 70.0, 3)
+
+
+def test_parse_item_spec_clamps_in_point_and_loops():
+    item = parse_item_spec('a.mp4::in=-1,loops=0')
+    assert (item.in_point, item.out_point, item.loops) == (0.0, None, 1)
+
+
+def test_parse_item_spec_unknown_option():
+    with pytest.raises(ValueError):
+        parse_item_spec('a.mp4::speed=2')
+
+
+@pytest.mark.parametrize('spec', ['a.mp4::in=2,out=1', 'a.mp4::in=2,out=2', 'a.mp4::out=0'])
+def test_parse_item_spec_rejects_out_not_after_in(spec):
+    with pytest.raises(ValueError, match='入点必须早于出点'):
+        parse_item_spec(spec)
+
+
+def test_load_m3u_options(tmp_path):
+    m3u = tmp_path / 'list.m3u'
+    m3u.write_text('#EXTM3U\n'
+                   '#EXTVLCOPT:start-time=5\n#EXTVLCOPT:stop-time=9\n'
+                   '#EXTVLCOPT:input-repeat=2\nclip.mp4\n'
+                   'other.mp4\n', encoding='utf-8')
+    first, second = load_m3u(m3u)
+    assert first.path == str(tmp_path / 'clip.mp4')
+    assert (first.in_point, first.out_point, first.loops) == (5.0, 9.0, 3)
+    # 选项只作用于紧随其后的一项
+    assert (second.in_point, second.out_point, second.loops) == (0.0, None, 1)
+
+
+def test_load_m3u_rejects_out_not_after_in(tmp_path):
+    m3u = tmp_path / 'list.m3u'
+    m3u.write_text('#EXTVLCOPT:start-time=2\n#EXTVLCOPT:stop-time=1\nidx.avi\n',
+                   encoding='utf-8')
+    with pytest.raises(ValueError, match='入点必须早于出点'):
+        load_m3u(m3u)
+
+
+def _probed(in_point=0.0, out_point=None, fps=30.0, frame_count=300):
+    item = PlaylistItem('a.mp4', in_point, out_point)
+    item.fps = fps
+    item.frame_count = frame_count
+    return item
+
+
+def test_frame_range_after_probe():
+    item = _probed(2.0, 5.0)
+    assert (item.in_frame, item.end_frame) == (60, 150)
+    # 出点超过视频长度时截到结尾
+    assert _probed(2.0, 60.0).end_frame == 300
+    _probed(2.0, 60.0).check_range()
+
+
+def test_check_range_rejects_in_point_past_end():
+    with pytest.raises(ValueError, match='入点必须早于出点'):
+        _probed(20.0).check_range()
+    with pytest.raises(ValueError, match='入点必须早于出点'):
+        _probed(10.0, 15.0).check_range()
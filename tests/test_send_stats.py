@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""发送循环的分阶段耗时统计"""
+
+import time
+from contextlib import ExitStack
+
+import numpy as np
+
+from virtual_camera import VirtualCamera
+
+OVERLAY_DELAY = 0.03
+
+
+def _open_camera(**kwargs):
+    stack = ExitStack()
+    camera = VirtualCamera('pattern:bars', width=320, height=180, sink='null',
+                           wait_mode=False, **kwargs)
+    camera.open_outputs(stack)
+    camera.wait_for_outputs()
+    return camera, stack
+
+
+def test_send_excludes_overlay_time():
+    camera, stack = _open_camera(overlay_text='overlay')
+    with stack:
+        apply = camera.overlay.apply
+
+        def slow_apply(frame):
+            time.sleep(OVERLAY_DELAY)
+            return apply(frame)
+        camera.overlay.apply = slow_apply
+
+        frame = np.zeros(camera.converter.shape, np.uint8)
+        for _ in range(3):
+            camera.send_frame(frame)
+
+    overlay = camera.stats.histograms['overlay']
+    send = camera.stats.histograms['send']
+    assert overlay.count == 3
+    assert send.count == 3
+    assert overlay.total >= 3 * OVERLAY_DELAY
+    # 叠加耗时只计入 overlay，不再重复计入 send
+    assert send.max < OVERLAY_DELAY
+
+
+def test_standby_frames_are_not_timed():
+    camera, stack = _open_camera()
+    with stack:
+        camera.send_frame(None)
+    assert camera.stats.histograms['send'].count == 0
@@ -5,98 +5,660 @@ Windows 虚拟摄像头程序
 模拟摄像头设备，循环播放指定视频
 """
 
-import cv2
-import pyvirtualcam
-import numpy as np
 import time
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
 
+from frame_buffer import FrameRingBuffer, DecoderThread
+from frame_cache import DEFAULT_MAX_FRAME_CACHE_MB, RawFrameCache, preload_frames
+from loop_reader import LoopingVideoReader
+from playlist import PlaylistReader, is_playlist_source, load_playlist, probe_items
+from probe_cache import load_probe
+from frame_scheduler import FrameScheduler
+from pixel_format import FIT_MODES, PIXEL_FORMATS, FrameConverter
+from frame_sink import OutputChannel, OutputSpec, parse_output_spec
+from frame_stats import FrameStats
+from frame_pacer import PACING_POLICIES, FramePacer
+from overlay import Overlay, render_standby_frame
+from latency_probe import FrameStamper
+from image_source import (PATTERN_PREFIX, image_source_kind, list_images, load_image_frames,
+                          read_image, render_test_pattern)
+from lazy_import import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
 
 class VirtualCamera:
-    def __init__(self, video_path, fps=30, width=1280, height=720, wait_mode=True):
+    def __init__(self, video_path, fps=30, width=1280, height=720, wait_mode=True,
+                 buffer_size=0, preload=False, max_cache_mb=512,
+                 frame_cache=False, max_frame_cache_mb=DEFAULT_MAX_FRAME_CACHE_MB, gapless=False,
+                 fps_sync=True, pixel_format='auto', sink='camera', max_frames=None,
+                 outputs=None, stats_json=None, stats_prometheus=None, stats_interval=5.0,
+                 pacing='drop', max_latency_ms=500, fit='letterbox', control=None,
+                 in_point=None, out_point=None, loop_cache=15,
+                 overlay_text=None, overlay_clock=False, overlay_logo=None, image_fps=None,
+                 latency_probe=False, record=None, record_buffer=8):
         """
         初始化虚拟摄像头
         
         Args:
-            video_path: 要播放的视频文件路径
+            video_path: 要播放的视频文件路径，或 playlist.PlaylistItem 列表（播放列表模式）；
+                        也可以是单张图片、图片目录或 'pattern:名称'（测试图案，见
+                        image_source.PATTERNS）
             fps: 帧率
             width: 输出宽度
             height: 输出高度
             wait_mode: 是否等待模式（启动后显示待机画面）
+            buffer_size: 后台解码缓冲区帧数，0 表示在发送线程中直接解码
+            preload: 是否预先把整段视频解码到内存中循环播放
+            max_cache_mb: 预解码缓存的内存上限（MB）
+            frame_cache: 是否使用 .rawframes 原始帧缓存文件（memmap 读取）
+            max_frame_cache_mb: 原始帧缓存文件的大小上限（MB）
+            gapless: 是否启用无缝循环（预开第二个解码器，不在结尾回跳）
+            fps_sync: 是否按时间戳对齐源帧和输出帧（源帧率与输出帧率不同时
+                      跳过或重复源帧，保持播放速度正确）
+            pixel_format: 输出像素格式，'auto' 表示按虚拟摄像头后端协商
+                          （见 pixel_format.PIXEL_FORMATS）
+            sink: 输出目标，FrameSink 实例或描述字符串
+                  （'camera'、'null'、'file:路径'、'shm:名称'，见 frame_sink.create_sink）
+            max_frames: 播放指定帧数后停止（用于基准测试），None 表示一直播放
+            outputs: 多路输出，OutputSpec 列表；提供时忽略 fps、width、height、
+                     pixel_format 和 sink，只解码一次，再按各路的分辨率、帧率和
+                     像素格式分发
+            stats_json: 定期写入逐帧耗时统计 JSON 快照的路径
+            stats_prometheus: 定期写入 Prometheus 文本格式统计的路径
+            stats_interval: 统计导出间隔（秒）
+            pacing: 发送落后时的处理策略（见 frame_pacer.PACING_POLICIES）：
+                    'drop' 跳帧追赶、'hold' 重发上一帧、'degrade' 降低缩放质量
+            max_latency_ms: 相对墙上时钟的最大滞后（毫秒），超过时无论哪种策略都跳帧
+            fit: 源画面与输出宽高比不同时的适配方式（见 pixel_format.FIT_MODES）：
+                 'letterbox' 留黑边、'crop' 居中裁剪、'stretch' 拉伸
+            control: 控制接口地址（'unix:路径' 或 'tcp:[主机:]端口'，见
+                     control_server.parse_address），提供时不再读取标准输入
+            in_point: 循环区间的入点（秒），None 表示从头开始
+            out_point: 循环区间的出点（秒），None 表示到结尾
+            loop_cache: 设置了循环区间时，入点之后留在内存中的解码帧数
+            overlay_text: 叠加在左上角的文字
+            overlay_clock: 是否在右上角叠加时钟
+            overlay_logo: 叠加在右下角的图标（PNG 等，支持透明通道）
+            image_fps: 图片目录按序列帧播放的帧率，None 表示与输出帧率相同
+            latency_probe: 是否在每个输出帧顶部画上帧号和发送时刻条码
+                           （见 latency_probe，由 test_camera.py --latency 测量延迟）
+            record: 录制第一路输出实际发送的帧到该文件（.mp4 / .avi 压缩，.y4m 为
+                    YUV4MPEG2，其他扩展名为原始帧），None 表示不录制
+            record_buffer: 录制缓冲区帧数，编码进程落后超过该帧数时丢帧
         """
+        if outputs:
+            # 解码管线按最大分辨率、最高帧率运行，各路输出再缩放、抽帧
+            largest = max(outputs, key=lambda spec: spec.width * spec.height)
+            width, height = largest.width, largest.height
+            fps = max(spec.fps for spec in outputs)
+        else:
+            outputs = [OutputSpec(width, height, fps, pixel_format, sink)]
+        
+        self.playlist = None
+        if not isinstance(video_path, (str, Path)):
+            self.playlist = list(video_path)
+            video_path = self.playlist[0].path if self.playlist else ''
         self.video_path = video_path
         self.fps = fps
         self.width = width
         self.height = height
         self.cap = None
+        self.reader = None
+        self.gapless = gapless
         self.wait_mode = wait_mode
-        self.playing = False
+        self.playing = not wait_mode
+        self.buffer_size = buffer_size
+        self.decoder = None
+        self.preload = preload
+        self.max_cache_mb = max_cache_mb
+        self.frame_cache = frame_cache
+        self.max_frame_cache_mb = max_frame_cache_mb
+        self.raw_cache = None
+        self.frames = None        # 预解码或 memmap 的帧数组 (N, H, W, 3)
+        self.frame_index = 0
+        self.fps_sync = fps_sync
+        self.scheduler = None
+        self.last_output = None   # 上一个输出帧，源帧率较低时按引用重复
+        self.requested_format = pixel_format
+        self.pixel_format = 'bgr' if pixel_format == 'auto' else pixel_format
+        self.fit = fit
+        self.stats = FrameStats(stats_json, stats_prometheus, stats_interval)
+        self.converter = FrameConverter(self.pixel_format, width, height, self.stats, fit)
+        self.outputs = outputs
+        self.channels = []
+        self._outputs_opening = None  # 后台打开输出的 Future，wait_for_outputs() 之后为 None
+        self.max_frames = max_frames
+        self.pacing = pacing
+        self.max_latency_ms = max_latency_ms
+        self.pacer = None
+        self.source_fps = 0.0
+        self.control_address = control
+        self.in_point = in_point
+        self.out_point = out_point
+        self.loop_cache = loop_cache
+        self.overlay_text = overlay_text
+        self.overlay_clock = overlay_clock
+        self.overlay_logo = overlay_logo
+        self.overlay = None
+        self.image_fps = image_fps
+        self.latency_probe = latency_probe
+        self.record_path = record
+        self.record_buffer = record_buffer
+        self.recorder = None
+        self.control = None
+        self._pending_reader = None   # 控制命令准备好、等待换用的 (读取器, 路径, 帧率)
+        self._pending_lock = threading.Lock()
+        self._quit = False
         
     def load_video(self):
         """加载视频文件"""
+        if self.playlist is not None:
+            self.load_playlist()
+            return
+        
+        kind = image_source_kind(self.video_path)
+        if kind is not None:
+            self.load_images(kind)
+            return
+        
         if not Path(self.video_path).exists():
             raise FileNotFoundError(f"视频文件不存在: {self.video_path}")
         
+        if self.frame_cache and not self.has_loop_range:
+            # 命中帧缓存时直接 memmap，不需要打开视频（缓存按输出像素格式存放）
+            self.wait_for_outputs()
+            self.raw_cache = RawFrameCache(self.video_path, self.width, self.height,
+                                           fmt=self.pixel_format, fit=self.fit)
+            self.frames = self.raw_cache.load()
+            if self.frames is not None:
+                self.setup_scheduler(self.raw_cache.source_fps)
+                self.print_video_info(self.raw_cache.source_fps,
+                                      self.raw_cache.source_width,
+                                      self.raw_cache.source_height,
+                                      len(self.frames))
+                print(f"  帧缓存: {self.raw_cache.path}（已命中）")
+                return
+        
+        # 视频信息和关键帧索引（有 .probe.json 缓存时不需要扫描）
+        probe = load_probe(self.video_path)
+        
         self.cap = cv2.VideoCapture(self.video_path)
         if not self.cap.isOpened():
             raise ValueError(f"无法打开视频文件: {self.video_path}")
         
-        # 获取视频信息
-        video_fps = self.cap.get(cv2.CAP_PROP_FPS)
-        video_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        video_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        video_fps = probe.fps
+        video_width = probe.width
+        video_height = probe.height
+        frame_count = probe.frame_count
+        self.reader = self.create_reader(probe, cap=self.cap)
+        self.setup_scheduler(video_fps)
+        
+        self.wait_for_outputs()
+        self.print_video_info(video_fps, video_width, video_height, frame_count)
+        if self.has_loop_range:
+            in_frame, end_frame = self.loop_range(probe)
+            print(f"  循环区间: 第 {in_frame} ~ {end_frame - 1} 帧 "
+                  f"({in_frame / video_fps:.2f}s → {end_frame / video_fps:.2f}s)，"
+                  f"入点缓存 {self.loop_cache} 帧")
+        
+    def load_images(self, kind):
+        """
+        加载图片、图片目录或测试图案
+        
+        画面一次性解码、缩放并转换为输出格式放进帧数组，之后走与预解码相同的
+        路径：每帧只按引用发送缓存中的帧，没有解码和转换开销。图片目录在线程池
+        中并行解码；单张图片和测试图案只有一帧。
+        """
+        if self.has_loop_range:
+            raise ValueError("图片和测试图案不支持循环区间 (--in/--out)")
+        self.wait_for_outputs()
+        
+        start_time = time.time()
+        source_fps = self.fps
+        if kind == 'pattern':
+            name = str(self.video_path)[len(PATTERN_PREFIX):]
+            frame = render_test_pattern(name, self.width, self.height)
+            self.frames = self.converter(frame)[None].copy()
+            print(f"测试图案: {name}")
+        elif kind == 'image':
+            image = read_image(self.video_path)
+            self.frames = self.converter(image)[None].copy()
+            print(f"图片信息:")
+            print(f"  文件: {self.video_path}")
+            print(f"  分辨率: {image.shape[1]}x{image.shape[0]}")
+        else:
+            paths = list_images(self.video_path)
+            if not paths:
+                raise ValueError(f"目录中没有图片: {self.video_path}")
+            source_fps = self.image_fps or self.fps
+            self.frames = load_image_frames(paths, self.pixel_format, self.width, self.height,
+                                            fit=self.fit,
+                                            max_bytes=self.max_cache_mb * 1024 * 1024)
+            size_mb = self.frames.nbytes / (1024 * 1024)
+            print(f"图片序列:")
+            print(f"  目录: {self.video_path}")
+            print(f"  帧数: {len(self.frames)} ({size_mb:.1f} MB)")
+            print(f"  帧率: {source_fps} FPS")
+        print(f"  解码耗时: {(time.time() - start_time) * 1000:.1f} ms")
+        
+        self.frame_index = 0
+        self.setup_scheduler(source_fps)
+        self.print_output_settings(source_fps)
         
+    @property
+    def has_loop_range(self):
+        """是否只循环视频中的一段"""
+        return bool(self.in_point) or self.out_point is not None
+    
+    def loop_range(self, probe):
+        """
+        循环区间对应的帧序号
+        
+        Returns:
+            (入点帧, 出点帧（不含）)
+        """
+        in_frame = round((self.in_point or 0) * probe.fps)
+        end_frame = probe.frame_count
+        if self.out_point is not None:
+            end_frame = round(self.out_point * probe.fps)
+            if probe.frame_count > 0:
+                end_frame = min(end_frame, probe.frame_count)
+        if in_frame >= end_frame:
+            raise ValueError(f"入点必须早于出点且在视频范围内: {self.in_point} → {self.out_point}")
+        return in_frame, end_frame
+    
+    def create_reader(self, probe, cap=None, start_frame=None):
+        """按循环区间创建循环读取器（未设置区间时循环整段视频）"""
+        if not self.has_loop_range:
+            return LoopingVideoReader(probe.path, gapless=self.gapless, cap=cap,
+                                      probe=probe, start_frame=start_frame)
+        in_frame, end_frame = self.loop_range(probe)
+        return LoopingVideoReader(probe.path, gapless=self.gapless, cap=cap,
+                                  in_frame=in_frame, end_frame=end_frame, probe=probe,
+                                  boundary_frames=self.loop_cache, start_frame=start_frame)
+        
+    def load_playlist(self):
+        """并行探测播放列表中所有视频的元数据，创建播放列表读取器"""
+        start_time = time.time()
+        probe_items(self.playlist)
+        for item in self.playlist:
+            if item.error:
+                print(f"警告: {item.error}，已从播放列表中移除")
+        self.playlist = [item for item in self.playlist if item.error is None]
+        if not self.playlist:
+            raise ValueError("播放列表中没有可播放的视频")
+        
+        print(f"播放列表: {len(self.playlist)} 项（并行探测耗时 "
+              f"{time.time() - start_time:.2f} 秒）")
+        for i, item in enumerate(self.playlist, 1):
+            print(f"  {i}. {item.describe()}")
+        
+        self.reader = PlaylistReader(self.playlist)
+        self.setup_scheduler(self.playlist[0].fps)
+        self.wait_for_outputs()
+        self.print_output_settings(self.playlist[0].fps)
+        
+    def setup_scheduler(self, video_fps):
+        """根据源帧率创建帧调度器，帧率一致或未启用时不需要调度"""
+        self.source_fps = video_fps
+        self.scheduler = None
+        if self.fps_sync and video_fps > 0:
+            scheduler = FrameScheduler(video_fps, self.fps)
+            if not scheduler.passthrough:
+                self.scheduler = scheduler
+        
+    def print_video_info(self, video_fps, video_width, video_height, frame_count):
+        """打印视频信息和输出设置"""
         print(f"视频信息:")
         print(f"  文件: {self.video_path}")
         print(f"  分辨率: {video_width}x{video_height}")
         print(f"  帧率: {video_fps} FPS")
         print(f"  总帧数: {frame_count}")
+        self.print_output_settings(video_fps)
+        
+    def print_output_settings(self, video_fps):
+        """打印输出设置"""
         print(f"\n输出设置:")
         print(f"  分辨率: {self.width}x{self.height}")
         print(f"  帧率: {self.fps} FPS")
+        print(f"  像素格式: {self.pixel_format.upper()}")
+        print(f"  画面适配: {self.fit}")
+        if self.buffer_size:
+            print(f"  解码缓冲: {self.buffer_size} 帧（后台线程）")
+        if len(self.outputs) > 1:
+            for i, spec in enumerate(self.outputs, 1):
+                print(f"  输出 {i}: {spec}")
+        if self.scheduler:
+            print(f"  帧率对齐: 源 {video_fps:.2f} FPS → 输出 {self.fps} FPS"
+                  f"（{'跳过' if self.scheduler.ratio > 1 else '重复'}源帧）")
         
-    def create_standby_frame(self):
-        """创建待机画面"""
-        frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
-        # 设置深色背景
-        frame[:, :] = (30, 30, 30)
+    def build_frame_cache(self):
+        """生成 .rawframes 帧缓存文件，超出大小上限时回退到流式解码"""
+        print(f"\n正在生成帧缓存: {self.raw_cache.path}")
         
-        # 添加文字
-        texts = [
-            ("虚拟摄像头已就绪", (255, 255, 255), 2.0, -120),
-            ("等待开始播放...", (200, 200, 200), 1.2, -40),
-        ]
+        start_time = time.time()
+        max_bytes = self.max_frame_cache_mb * 1024 * 1024
+        self.frames = self.raw_cache.build(self.cap, max_bytes=max_bytes)
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
         
-        for text, color, scale, y_offset in texts:
-            font = cv2.FONT_HERSHEY_SIMPLEX
-            thickness = int(scale * 2)
-            
-            # 获取文字大小
-            (text_width, text_height), _ = cv2.getTextSize(text, font, scale, thickness)
-            
-            # 计算居中位置
-            x = (self.width - text_width) // 2
-            y = (self.height // 2) + y_offset
+        if self.frames is None:
+            print(f"视频超出帧缓存上限（{self.max_frame_cache_mb} MB），回退到流式解码")
+            return
+        
+        print(f"帧缓存生成完成: {len(self.frames)} 帧, "
+              f"耗时 {time.time() - start_time:.2f} 秒")
+        self.frame_index = 0
+        
+    def preload_video(self):
+        """把整段视频预解码到内存，超出内存预算时回退到流式解码"""
+        max_bytes = self.max_cache_mb * 1024 * 1024
+        print(f"\n正在预解码视频到内存（上限 {self.max_cache_mb} MB）...")
+        
+        start_time = time.time()
+        self.frames = preload_frames(self.cap, self.converter, max_bytes)
+        
+        if self.frames is None:
+            print("视频超出内存预算，回退到流式解码")
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            return
+        
+        size_mb = len(self.frames) * self.converter.nbytes / (1024 * 1024)
+        print(f"预解码完成: {len(self.frames)} 帧, {size_mb:.1f} MB, "
+              f"耗时 {time.time() - start_time:.2f} 秒")
+        self.frame_index = 0
+        
+    def read_frame(self, dst=None):
+        """
+        读取下一帧并调整到输出分辨率和像素格式，视频播放完毕时自动从头开始
+        
+        Args:
+            dst: 可选的预分配输出数组，提供时帧数据直接写入其中
             
-            # 添加阴影
-            cv2.putText(frame, text, (x + 3, y + 3), font, scale, (0, 0, 0), thickness)
-            # 添加主文字
-            cv2.putText(frame, text, (x, y), font, scale, color, thickness)
-        
-        # 添加提示信息
-        hint_text = "按 Enter 开始播放 | Ctrl+C 退出"
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        scale = 0.7
-        thickness = 1
-        (text_width, text_height), _ = cv2.getTextSize(hint_text, font, scale, thickness)
-        x = (self.width - text_width) // 2
-        y = self.height - 50
-        cv2.putText(frame, hint_text, (x, y), font, scale, (150, 150, 150), thickness)
+        Returns:
+            输出帧；无法读取时返回 None
+        """
+        if self._pending_reader is not None:
+            self.apply_pending_reader()
+        
+        steps = self.scheduler.advance() if self.scheduler else 1
+        
+        if steps == 0 and self.last_output is not None:
+            # 源帧率低于输出帧率：按引用重复上一帧，不解码
+            frame = self.last_output
+            if dst is not None:
+                np.copyto(dst, frame)
+                frame = dst
+            self.last_output = frame
+            return frame
+        steps = max(steps, 1)
+        
+        if self.frames is not None:
+            # 预解码模式：直接返回缓存中的帧视图，不做任何拷贝
+            self.frame_index = (self.frame_index + steps - 1) % len(self.frames)
+            frame = self.frames[self.frame_index]
+            self.frame_index = (self.frame_index + 1) % len(self.frames)
+            if dst is not None:
+                np.copyto(dst, frame)
+                frame = dst
+            self.last_output = frame
+            return frame
+        
+        loops = self.reader.loops
+        start = time.perf_counter()
+        
+        # 源帧率高于输出帧率：多余的源帧只 grab 不 retrieve，省去 BGR 转换
+        for _ in range(steps - 1):
+            if not self.reader.grab():
+                return None
+        
+        ret, frame = self.reader.read()
+        if not ret:
+            return None
+        self.stats.record('decode', time.perf_counter() - start)
         
+        # 视频播放完毕后读取器会自动从头开始（播放列表切换到下一项）
+        if self.reader.loops != loops:
+            self.stats.record_loop(self.reader.last_seek_time)
+            stats = self.reader.stats()
+            if self.playlist is not None:
+                # 各项帧率可能不同，按新的源帧率重新调度
+                self.setup_scheduler(self.reader.fps)
+                print(f"切换到: {stats['item']} (衔接间隔 {stats['last_loop_gap_ms']:.1f} ms, "
+                      f"切换耗时 {stats['last_seek_ms']:.1f} ms)")
+            else:
+                print(f"视频播放完毕，重新开始... (衔接间隔 {stats['last_loop_gap_ms']:.1f} ms, "
+                      f"最大 {stats['max_loop_gap_ms']:.1f} ms)")
+        
+        # 调整帧大小并转换为输出像素格式
+        frame = self.converter(frame, dst)
+        
+        self.last_output = frame
         return frame
     
+    def skip_frames(self, count):
+        """
+        跳过 count 个输出帧：源视频只前进、不解码（后台解码时丢弃缓冲区中的帧）
+        
+        Returns:
+            后台解码时最后一个取出的帧（此前持有的帧已失效），否则返回 None
+        """
+        if count <= 0:
+            return None
+        
+        if self.decoder is not None:
+            frame = None
+            ring = self.decoder.ring
+            for _ in range(min(count, ring.depth)):
+                frame = ring.pop()
+            return frame
+        
+        if self.scheduler:
+            steps = sum(self.scheduler.advance() for _ in range(count))
+        else:
+            steps = count
+        
+        if self.frames is not None:
+            self.frame_index = (self.frame_index + steps) % len(self.frames)
+        else:
+            for _ in range(steps):
+                if not self.reader.grab():
+                    break
+        return None
+    
+    def open_source(self, path, seconds=None):
+        """
+        打开视频并定位到指定位置（在控制服务器的线程池中执行，不占用发送循环）
+        
+        Args:
+            path: 视频文件路径
+            seconds: 定位到的位置（秒），None 表示切换到新视频、从头播放
+                     （同时取消循环区间）；否则在当前视频的循环区间内定位
+        
+        Returns:
+            (读取器, 路径, 源帧率)，交给 apply_pending_reader 换用
+        """
+        if image_source_kind(path) is not None:
+            raise ValueError("控制接口只能切换到视频文件")
+        if not Path(path).exists():
+            raise FileNotFoundError(f"视频文件不存在: {path}")
+        probe = load_probe(path)
+        if seconds is None:
+            reader = LoopingVideoReader(path, gapless=self.gapless, probe=probe)
+        else:
+            frame = round(seconds * probe.fps)
+            first, end = self.loop_range(probe) if self.has_loop_range else (0, probe.frame_count)
+            if frame < first or (end > 0 and frame >= end):
+                raise ValueError(f"超出播放范围: {seconds} 秒")
+            # 跳到之前最近的关键帧再向前解码，帧精确
+            reader = self.create_reader(probe, start_frame=frame)
+        if not reader.isOpened():
+            reader.release()
+            raise ValueError(f"无法打开视频文件: {path}")
+        return reader, path, probe.fps
+    
+    def apply_pending_reader(self):
+        """换用控制命令准备好的读取器（在解码所在的线程中调用）"""
+        with self._pending_lock:
+            pending, self._pending_reader = self._pending_reader, None
+        if pending is None:
+            return
+        reader, path, fps = pending
+        old_reader, self.reader = self.reader, reader
+        if old_reader is not None:
+            # 旧解码器在后台释放，不占用发送时间
+            threading.Thread(target=old_reader.release, daemon=True).start()
+        self.cap = None
+        self.frames = None
+        self.playlist = None
+        self.video_path = path
+        self.last_output = None
+        self.setup_scheduler(fps)
+    
+    def prepare_control(self, cmd, args):
+        """
+        控制命令的准备阶段（在控制服务器的线程池中执行）：检查参数，
+        打开视频、定位等耗时工作也在这里完成，返回交给 handle_control 的参数
+        """
+        if cmd in ('source', 'seek', 'fps') and not args:
+            raise ValueError(f"{cmd} 命令缺少参数")
+        if cmd == 'source':
+            return self.open_source(str(args[0]))
+        if cmd == 'seek':
+            seconds = float(args[0])
+            if seconds < 0:
+                raise ValueError(f"无效的位置: {seconds}")
+            if self.playlist is not None:
+                raise ValueError("播放列表模式不支持定位")
+            if self.frames is not None:
+                # 预解码 / 帧缓存：定位只是修改帧序号
+                frame = round(seconds * self.source_fps)
+                if frame >= len(self.frames):
+                    raise ValueError(f"超出播放范围: {seconds} 秒")
+                return frame
+            return self.open_source(self.video_path, seconds)
+        if cmd == 'fps':
+            fps = int(args[0])
+            if fps <= 0:
+                raise ValueError(f"无效的帧率: {fps}")
+            if len(self.channels) > 1:
+                raise ValueError("多路输出时不支持修改帧率")
+            sink = self.channels[0].sink
+            if sink.fixed_rate:
+                raise ValueError(f"{sink.device} 的帧率固定为 {sink.fps} FPS，不能修改帧率")
+            if self.recorder is not None and self.recorder.fixed_rate:
+                raise ValueError(f"录制文件 {self.recorder.path} 的帧率固定为 "
+                                 f"{self.recorder.fps} FPS，录制时不能修改帧率")
+            return fps
+        return args
+    
+    def handle_control(self, cmd, args):
+        """执行控制命令（在发送循环中调用），返回回复给客户端的结果"""
+        if cmd == 'start':
+            if not self.playing:
+                self.playing = True
+                print("\n=== 开始播放视频 ===\n")
+            return {'playing': True}
+        if cmd == 'stop':
+            if self.playing:
+                self.playing = False
+                print("\n=== 停止播放，显示待机画面 ===\n")
+            return {'playing': False}
+        if cmd == 'quit':
+            self._quit = True
+            return {'quit': True}
+        if cmd == 'fps':
+            # 先修改输出（虚拟摄像头需要重新打开，失败时抛出异常，其余状态不变）
+            self.channels[0].sink.set_fps(args)
+            self.fps = args
+            self.outputs[0].fps = args
+            self.pacer.set_fps(args)
+            self.setup_scheduler(self.source_fps)
+            print(f"输出帧率: {args} FPS")
+            return {'fps': args}
+        if cmd == 'seek' and isinstance(args, int):
+            self.frame_index = args
+            self.last_output = None
+            return {'frame': args}
+        if cmd in ('source', 'seek'):
+            reader, path, fps = args
+            with self._pending_lock:
+                stale, self._pending_reader = self._pending_reader, args
+            if stale is not None:
+                stale[0].release()
+            if self.decoder is not None:
+                # 丢弃缓冲区中旧视频的帧，新视频在解码线程取下一帧时生效
+                self.skip_frames(self.decoder.ring.depth)
+            else:
+                self.apply_pending_reader()
+            if cmd == 'source':
+                self.in_point = self.out_point = None
+                print(f"切换视频: {path} ({fps:.2f} FPS)")
+                return {'source': path, 'fps': fps}
+            frame = reader.in_frame + reader.position
+            print(f"定位到: {frame / fps if fps else 0:.2f} 秒")
+            return {'frame': frame}
+        return {
+            'playing': self.playing,
+            'source': str(self.video_path),
+            'fps': self.fps,
+            **self.stats.snapshot(),
+        }
+    
+    def set_degraded(self, degraded):
+        """切换降级缩放（最近邻插值）"""
+        self.converter.degraded = degraded
+        for channel in self.channels:
+            if channel.converter is not None:
+                channel.converter.degraded = degraded
+    
+    def start_decoder(self):
+        """启动后台解码线程，预填充环形缓冲区"""
+        ring = FrameRingBuffer(self.buffer_size, self.converter.shape)
+        self.decoder = DecoderThread(
+            ring, lambda dst: self.read_frame(dst) is not None)
+        self.decoder.start()
+        ring.wait_for_depth(self.buffer_size - 1, timeout=5.0)
+    
+    def buffer_stats(self):
+        """返回解码缓冲区统计信息（未启用时返回 None）"""
+        if self.decoder is None:
+            return None
+        return self.decoder.ring.stats()
+    
+    def next_frame(self, timeout=0):
+        """
+        获取下一帧待发送的帧
+        
+        后台解码模式下从环形缓冲区取帧，缓冲区欠载时返回 None
+        （调用方应重发上一帧）；否则直接在当前线程解码。
+        """
+        if self.decoder is None:
+            return self.read_frame()
+        
+        frame = self.decoder.ring.pop(timeout=timeout)
+        if frame is None and not self.decoder.is_alive():
+            if self.decoder.error:
+                raise self.decoder.error
+            raise RuntimeError("无法读取视频帧")
+        return frame
+        
+    def create_standby_frame(self, width=None, height=None):
+        """创建待机画面（默认为输出分辨率），同一分辨率只渲染一次"""
+        width = width or self.width
+        height = height or self.height
+        texts = (
+            ("虚拟摄像头已就绪", (255, 255, 255), 2.0, -120),
+            ("等待开始播放...", (200, 200, 200), 1.2, -40),
+        )
+        hint = ("按 Enter 开始播放 | Ctrl+C 退出", (150, 150, 150), 0.7)
+        return render_standby_frame(width, height, texts, hint)
+    
     def check_for_start_signal(self):
         """非阻塞地检查是否有开始信号"""
         import select
@@ -116,78 +678,270 @@ class VirtualCamera:
                 return True
         return False
     
+    def open_outputs(self, stack):
+        """
+        在后台线程中打开所有输出
+        
+        打开虚拟摄像头（加载驱动、协商像素格式）可能需要几百毫秒，与探测、打开
+        视频同时进行；需要用到像素格式之前调用 wait_for_outputs()。
+        """
+        self.channels = [OutputChannel(spec, self.fps) for spec in self.outputs]
+        for channel in self.channels:
+            stack.enter_context(channel.sink)
+        
+        def open_all():
+            for channel in self.channels:
+                channel.open()
+        
+        # 后进先出：退出时先等后台线程结束，再关闭输出
+        pool = stack.enter_context(ThreadPoolExecutor(max_workers=1))
+        self._outputs_opening = pool.submit(open_all)
+    
+    def wait_for_outputs(self):
+        """
+        等待输出打开完成，确定解码管线的像素格式（重复调用时直接返回）
+        
+        单路输出时解码阶段直接生成该路协商出的格式；多路输出时管线统一
+        生成最大分辨率的 BGR 中间帧，由各路自行缩放、转换。
+        """
+        if self._outputs_opening is None:
+            return
+        opening, self._outputs_opening = self._outputs_opening, None
+        opening.result()
+        
+        if len(self.channels) == 1:
+            self.pixel_format = self.channels[0].sink.fmt
+        else:
+            self.pixel_format = 'bgr'
+        self.converter = FrameConverter(self.pixel_format, self.width, self.height,
+                                        self.stats, self.fit)
+        
+        if self.overlay_text or self.overlay_clock or self.overlay_logo:
+            # 叠加层画在管线中间帧上，各路输出缩放时一并处理
+            self.overlay = Overlay(self.pixel_format, self.width, self.height)
+            if self.overlay_text:
+                self.overlay.add_text(self.overlay_text, 'top-left')
+            if self.overlay_clock:
+                self.overlay.add_clock('top-right')
+            if self.overlay_logo:
+                self.overlay.add_image(self.overlay_logo, 'bottom-right')
+            self.stats.add_source('overlay', self.overlay.atlas.stats)
+        
+        for channel in self.channels:
+            channel.bind(self.pixel_format, self.width, self.height, self.fit)
+            standby = self.create_standby_frame(channel.spec.width, channel.spec.height)
+            channel.standby_frame = FrameConverter(
+                channel.sink.fmt, channel.spec.width, channel.spec.height)(standby).copy()
+            if self.latency_probe:
+                channel.stamper = FrameStamper(channel.sink.fmt, channel.spec.width,
+                                               channel.spec.height)
+    
+    def send_frame(self, frame=None):
+        """
+        按各路帧率把中间帧分发到所有输出
+        
+        叠加层和发送分别计入 'overlay' 与 'send' 阶段，'send' 不含叠加耗时；
+        待机画面不计入统计。
+        
+        Args:
+            frame: 管线中间帧，None 表示发送各路的待机画面
+        """
+        overlay = self.overlay if frame is not None else None
+        if overlay:
+            start = time.perf_counter()
+            frame = overlay.apply(frame)
+            self.stats.record('overlay', time.perf_counter() - start)
+        try:
+            send_start = time.perf_counter()
+            for channel in self.channels:
+                if not channel.due():
+                    continue
+                if frame is None:
+                    channel.emit(channel.standby_frame)
+                else:
+                    channel.send(frame)
+            if frame is not None:
+                self.stats.record('send', time.perf_counter() - send_start)
+        finally:
+            if overlay:
+                # 还原被覆盖的区域，缓存中的帧和重发的上一帧不会重复叠加
+                overlay.restore()
+    
     def run(self):
         """运行虚拟摄像头"""
-        self.load_video()
-        
-        # 创建虚拟摄像头
-        with pyvirtualcam.Camera(width=self.width, height=self.height, 
-                                 fps=self.fps, fmt=pyvirtualcam.PixelFormat.BGR) as cam:
-            print(f'\n虚拟摄像头已启动: {cam.device}')
+        with ExitStack() as stack:
+            # 创建输出：先协商像素格式，帧缓存和解码缓冲区都按该格式存放
+            self.open_outputs(stack)
+            self.load_video()
+            self.wait_for_outputs()
+            # 帧率最高的一路每个节拍都发送，由它控制节奏
+            sink = max(self.channels, key=lambda channel: channel.spec.fps).sink
+            
+            if self.control_address:
+                # 控制接口依赖 asyncio（导入约 40 ms），只在开启时导入
+                from control_server import ControlServer
+                self.control = stack.enter_context(
+                    ControlServer(self.control_address, prepare=self.prepare_control))
+                self.stats.add_source('control', self.control.stats)
+            
+            if self.record_path:
+                # 录制第一路输出实际发送的帧；编码在子进程中进行（进程间通信只在
+                # 开启录制时导入）
+                from frame_recorder import FrameRecorder
+                channel = self.channels[0]
+                self.recorder = stack.enter_context(FrameRecorder(
+                    self.record_path, channel.sink.fmt, channel.spec.width,
+                    channel.spec.height, channel.spec.fps, self.record_buffer).start())
+                channel.recorder = self.recorder
+                self.stats.add_source('recorder', self.recorder.stats)
+            
+            print()
+            for channel in self.channels:
+                print(f'虚拟摄像头已启动: {channel.sink.device}')
             print(f'摄像头名称: Virtual Camera')
+            if self.control:
+                print(f'控制接口: {self.control}')
+            if self.recorder:
+                print(f'录制: {self.recorder.path}（{self.channels[0].sink.device}）')
             
             if self.wait_mode:
                 print('\n=== 待机模式 ===')
                 print('虚拟摄像头已就绪，显示待机画面')
-                print('按 Enter 键开始播放视频')
+                if self.control:
+                    print('发送 start 命令开始播放视频')
+                else:
+                    print('按 Enter 键开始播放视频')
                 print('按 Ctrl+C 停止\n')
             else:
                 print('按 Ctrl+C 停止\n')
             
-            frame_time = 1.0 / self.fps
             frame_count = 0
-            standby_frame = self.create_standby_frame()
+            last_frame = None
+            pacer = self.pacer = FramePacer(self.fps, self.pacing,
+                                            self.max_latency_ms / 1000, paced=sink.paced)
+            self.stats.add_source('pacer', pacer.stats)
             
             try:
+                streaming_only = self.playlist is not None or self.has_loop_range
+                if streaming_only and (self.frame_cache or self.preload):
+                    print("播放列表和循环区间模式不使用帧缓存和预解码，改为流式解码")
+                elif self.frames is None and self.frame_cache:
+                    self.build_frame_cache()
+                if not streaming_only and self.frames is None and self.preload:
+                    self.preload_video()
+                
+                # 预解码成功后取帧只是切片，不需要后台解码线程
+                if self.buffer_size and self.frames is None:
+                    self.start_decoder()
+                
                 while True:
-                    start_time = time.time()
+                    frame_start = time.perf_counter()
+                    frame_time = pacer.frame_time
+                    
+                    # 执行控制命令（不阻塞），命令在下一个节拍之前生效
+                    if self.control:
+                        self.control.poll(self.handle_control)
+                        if self._quit:
+                            break
                     
-                    # 如果是等待模式且还未开始播放
-                    if self.wait_mode and not self.playing:
-                        # 检查是否有开始信号
-                        if self.check_for_start_signal():
+                    # 待机模式（或控制接口发来 stop）时发送待机画面
+                    if not self.playing:
+                        # 没有控制接口时检查标准输入的开始信号
+                        if not self.control and self.check_for_start_signal():
                             self.playing = True
                             print("\n=== 开始播放视频 ===\n")
                         else:
                             # 发送待机画面
-                            cam.send(standby_frame)
-                            cam.sleep_until_next_frame()
+                            self.send_frame(None)
+                            pacer.wait()
                             continue
                     
-                    # 读取视频帧
-                    ret, frame = self.cap.read()
+                    # 落后于墙上时钟时按策略追赶
+                    behind = pacer.behind()
+                    if (behind and self.pacing == 'drop') or pacer.over_ceiling():
+                        # 跳过落后的节拍，源视频同步前进（hold 策略下同时补上源视频的落后）
+                        skipped = self.skip_frames(behind + pacer.source_drift)
+                        if skipped is not None:
+                            last_frame = skipped
+                        pacer.skip(behind)
+                        pacer.source_drift = 0
+                        behind = 0
+                    if self.pacing == 'degrade':
+                        self.set_degraded(behind > 0)
+                        pacer.degraded += behind > 0
+                    
+                    if behind and self.pacing == 'hold' and last_frame is not None:
+                        # 重发上一帧，不解码，源视频的进度记入漂移
+                        frame = last_frame
+                        pacer.held += 1
+                        pacer.source_drift += 1
+                    else:
+                        # 读取视频帧
+                        frame = self.next_frame(timeout=frame_time / 2)
                     
-                    # 如果视频播放完毕，重新开始
-                    if not ret:
-                        print("视频播放完毕，重新开始...")
-                        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                        ret, frame = self.cap.read()
-                        
-                        if not ret:
+                    dropped = frame is None
+                    if dropped:
+                        if self.decoder is None:
                             print("错误：无法读取视频帧")
                             break
-                    
-                    # 调整帧大小
-                    if frame.shape[1] != self.width or frame.shape[0] != self.height:
-                        frame = cv2.resize(frame, (self.width, self.height))
+                        # 缓冲区欠载，重发上一帧（还没有帧时发送待机画面）
+                        frame = last_frame
+                    last_frame = frame
                     
                     # 发送到虚拟摄像头
-                    cam.send(frame)
+                    self.send_frame(frame)
+                    self.stats.record_frame(time.perf_counter() - frame_start, frame_time,
+                                            dropped)
                     
                     frame_count += 1
                     if frame_count % 100 == 0:
-                        print(f"已播放 {frame_count} 帧")
+                        stats = self.buffer_stats()
+                        if stats:
+                            print(f"已播放 {frame_count} 帧 | 缓冲 "
+                                  f"{stats['depth']}/{stats['capacity']} "
+                                  f"(最低 {stats['min_depth']}) | 欠载 {stats['underruns']} 次")
+                        else:
+                            print(f"已播放 {frame_count} 帧")
+                        print(f"  {self.stats.summary()}")
+                        pacing = pacer.stats()
+                        print(f"  节奏: 滞后 {pacing['lag_ms']:.1f} ms (最大 {pacing['max_lag_ms']:.1f} ms) | "
+                              f"跳帧 {pacing['dropped']} | 重发 {pacing['held']} | "
+                              f"降级 {pacing['degraded']} | 重新对齐 {pacing['resyncs']}")
+                    if self.max_frames and frame_count >= self.max_frames:
+                        break
                     
-                    # 控制帧率
-                    elapsed = time.time() - start_time
-                    sleep_time = frame_time - elapsed
-                    if sleep_time > 0:
-                        cam.sleep_until_next_frame()
+                    # 控制帧率：按排定时间休眠，落后时不休眠
+                    self.stats.record('sleep', pacer.wait())
+                    self.stats.maybe_export()
                     
             except KeyboardInterrupt:
                 print("\n正在停止虚拟摄像头...")
             finally:
-                self.cap.release()
+                if self.decoder is not None:
+                    self.decoder.stop()
+                if self.reader:
+                    self.reader.release()
+                elif self.cap:
+                    self.cap.release()
+                for channel in self.channels:
+                    stats = channel.sink.stats()
+                    prefix = f"{channel.sink.device}: " if len(self.channels) > 1 else ""
+                    print(f"{prefix}共发送 {stats['frames_sent']} 帧，"
+                          f"平均 {stats['avg_fps']:.1f} FPS，"
+                          f"最大帧间隔 {stats['max_interval_ms']:.1f} ms，"
+                          f"帧间隔抖动 {stats['jitter_ms']:.2f} ms")
+                if self.stats.frames:
+                    print(self.stats.summary())
+                if self.recorder is not None:
+                    # 等编码进程写完已提交的帧
+                    self.recorder.close()
+                    stats = self.recorder.stats()
+                    print(f"录制: 写入 {self.recorder.recorded} 帧，丢弃 {stats['dropped']} 帧，"
+                          f"发送循环中拷贝平均 {stats['avg_copy_ms']:.2f} ms "
+                          f"(最大 {stats['max_copy_ms']:.2f} ms)")
+                    if self.recorder.error:
+                        print(f"录制出错: {self.recorder.error}")
+                self.stats.export()
                 print("虚拟摄像头已停止")
 
 
@@ -196,18 +950,123 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Windows 虚拟摄像头 - 播放视频文件')
-    parser.add_argument('video', help='视频文件路径')
+    parser.add_argument('video', nargs='+',
+                       help='视频文件路径；给出多个视频或 M3U 文件时按播放列表顺序播放，'
+                            '每项可写成 路径::in=秒,out=秒,loops=次数；也可以是单张图片、'
+                            '图片目录（按文件名顺序作为序列帧）或测试图案 '
+                            'pattern:bars / pattern:grid / pattern:ramp')
     parser.add_argument('--fps', type=int, default=30, help='输出帧率 (默认: 30)')
     parser.add_argument('--width', type=int, default=1280, help='输出宽度 (默认: 1280)')
     parser.add_argument('--height', type=int, default=720, help='输出高度 (默认: 720)')
     parser.add_argument('--no-wait', action='store_true', 
                        help='禁用等待模式，立即播放视频')
+    parser.add_argument('--buffer', type=int, default=0, metavar='N',
+                       help='启用后台解码线程，环形缓冲区帧数 (默认: 0，不启用)')
+    parser.add_argument('--preload', action='store_true',
+                       help='预先把整段视频解码到内存中循环播放（适合短视频）')
+    parser.add_argument('--max-cache-mb', type=int, default=512,
+                       help='预解码缓存的内存上限，超出时回退到流式解码 (默认: 512)')
+    parser.add_argument('--frame-cache', action='store_true',
+                       help='使用 .rawframes 原始帧缓存文件，再次启动时无需解码')
+    parser.add_argument('--max-frame-cache-mb', type=int, default=DEFAULT_MAX_FRAME_CACHE_MB,
+                       help=f'原始帧缓存文件的大小上限 (默认: {DEFAULT_MAX_FRAME_CACHE_MB})')
+    parser.add_argument('--gapless', action='store_true',
+                       help='无缝循环：结尾前预开第二个解码器，避免回跳卡顿')
+    parser.add_argument('--no-fps-sync', action='store_true',
+                       help='禁用帧率对齐，每个输出帧读取一个源帧（源帧率与输出帧率不同时播放速度会改变）')
+    parser.add_argument('--sink', default='camera',
+                       help='输出目标: camera（虚拟摄像头）、null（只计时）、null:unpaced（不限速）、'
+                            'file:路径（.y4m 或原始帧）、shm:名称（共享内存） (默认: camera)')
+    parser.add_argument('--max-frames', type=int, default=None,
+                       help='播放指定帧数后停止（用于基准测试）')
+    parser.add_argument('--pixel-format', default='auto',
+                       choices=('auto',) + PIXEL_FORMATS,
+                       help='输出像素格式，auto 表示按虚拟摄像头后端选择原生格式 (默认: auto)')
+    parser.add_argument('--output', action='append', metavar='SPEC',
+                       help='添加一路输出（可重复），格式 WxH[@FPS][,fmt=格式][,sink=输出]，'
+                            '例如 1920x1080@60,sink=camera 854x480@15,sink=shm:monitor；'
+                            '未指定的项使用 --fps、--pixel-format、--sink')
+    
+    parser.add_argument('--stats-json', metavar='PATH',
+                       help='定期把逐帧耗时统计（各阶段直方图、迟到/丢帧计数）写入 JSON 文件')
+    parser.add_argument('--stats-prom', metavar='PATH',
+                       help='定期把统计写入 Prometheus 文本格式文件（node_exporter textfile collector）')
+    parser.add_argument('--stats-interval', type=float, default=5.0,
+                       help='统计导出间隔秒数 (默认: 5)')
+    
+    parser.add_argument('--pacing', default='drop', choices=PACING_POLICIES,
+                       help='发送落后时的处理策略: drop（跳帧追赶）、hold（重发上一帧）、'
+                            'degrade（降低缩放质量） (默认: drop)')
+    parser.add_argument('--max-latency-ms', type=int, default=500,
+                       help='相对墙上时钟的最大滞后，超过时强制跳帧对齐 (默认: 500)')
+    
+    parser.add_argument('--fit', default='letterbox', choices=FIT_MODES,
+                       help='源画面与输出宽高比不同时的适配方式: letterbox（保持比例，留黑边）、'
+                            'crop（保持比例，居中裁剪）、stretch（拉伸） (默认: letterbox)')
+    
+    parser.add_argument('--in', dest='in_point', type=float, metavar='SECONDS',
+                       help='只循环视频中的一段：入点（秒）')
+    parser.add_argument('--out', dest='out_point', type=float, metavar='SECONDS',
+                       help='只循环视频中的一段：出点（秒）')
+    parser.add_argument('--loop-cache', type=int, default=15, metavar='N',
+                       help='设置了 --in/--out 时，入点之后留在内存中的解码帧数，'
+                            '回到入点时先播放这些帧，不必重新解码 (默认: 15)')
+    
+    parser.add_argument('--overlay-text', metavar='TEXT',
+                       help='在画面左上角叠加文字')
+    parser.add_argument('--overlay-clock', action='store_true',
+                       help='在画面右上角叠加时钟')
+    parser.add_argument('--overlay-logo', metavar='PATH',
+                       help='在画面右下角叠加图标（PNG 等，支持透明通道）')
+    
+    parser.add_argument('--image-fps', type=float, metavar='FPS',
+                       help='图片目录按序列帧播放的帧率 (默认: 与输出帧率相同)')
+    
+    parser.add_argument('--latency-probe', action='store_true',
+                       help='在每帧顶部画上帧号和发送时刻条码，配合 test_camera.py --latency 测量端到端延迟')
+    
+    parser.add_argument('--record', metavar='PATH',
+                       help='录制实际发送的画面（第一路输出）：.mp4 / .avi 为压缩视频，.y4m 为 '
+                            'YUV4MPEG2，其他扩展名按发送格式逐字节写入原始帧；编码在独立进程中进行，'
+                            '跟不上时丢帧计数，不影响发送')
+    parser.add_argument('--record-buffer', type=int, default=8, metavar='N',
+                       help='录制缓冲区帧数，编码进程落后超过该帧数时丢帧 (默认: 8)')
+    
+    parser.add_argument('--control', metavar='ADDR',
+                       help='开启本地控制接口: unix:路径 或 tcp:[主机:]端口（默认只监听 127.0.0.1），'
+                            '支持 start/stop/source/seek/fps/stats/quit 命令，开启后不再读取标准输入')
     
     args = parser.parse_args()
     
     try:
-        cam = VirtualCamera(args.video, fps=args.fps, width=args.width, 
-                          height=args.height, wait_mode=not args.no_wait)
+        outputs = None
+        if args.output:
+            outputs = [parse_output_spec(text, args.fps, args.pixel_format, args.sink)
+                       for text in args.output]
+        video = args.video[0]
+        if len(args.video) > 1 or is_playlist_source(video):
+            video = load_playlist(args.video)
+        cam = VirtualCamera(video, fps=args.fps, width=args.width, 
+                          height=args.height, wait_mode=not args.no_wait,
+                          buffer_size=args.buffer, preload=args.preload,
+                          max_cache_mb=args.max_cache_mb,
+                          frame_cache=args.frame_cache,
+                          max_frame_cache_mb=args.max_frame_cache_mb,
+                          gapless=args.gapless, fps_sync=not args.no_fps_sync,
+                          pixel_format=args.pixel_format, sink=args.sink,
+                          max_frames=args.max_frames, outputs=outputs,
+                          stats_json=args.stats_json, stats_prometheus=args.stats_prom,
+                          stats_interval=args.stats_interval,
+                          pacing=args.pacing, max_latency_ms=args.max_latency_ms,
+                          fit=args.fit, control=args.control,
+                          in_point=args.in_point, out_point=args.out_point,
+                          loop_cache=args.loop_cache,
+                          overlay_text=args.overlay_text,
+                          overlay_clock=args.overlay_clock,
+                          overlay_logo=args.overlay_logo,
+                          image_fps=args.image_fps,
+                          latency_probe=args.latency_probe,
+                          record=args.record, record_buffer=args.record_buffer)
         cam.run()
     except Exception as e:
         print(f"错误: {e}")
@@ -5,27 +5,56 @@ Windows 虚拟摄像头程序 - GUI版本
 带图形界面的虚拟摄像头控制程序
 """
 
-import cv2
-import pyvirtualcam
-import numpy as np
 import time
 import sys
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
+from frame_cache import DEFAULT_MAX_FRAME_CACHE_MB, RawFrameCache
+from loop_reader import LoopingVideoReader
+from pixel_format import FIT_MODES, FrameConverter
+from frame_sink import create_sink
+from decoder_process import ProcessDecoder
+from frame_stats import FrameStats
+from live_preview import FramePreview
+from probe_cache import load_probe
+from overlay import render_standby_frame
+from lazy_import import lazy_import, preload
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+# 日志和状态刷新
+LOG_MAX_LINES = 500         # 状态文本框最多保留的行数，超出时删除最早的行
+UI_POLL_MS = 100            # 界面线程批量处理日志的间隔
+STATUS_INTERVAL = 0.25      # 发送线程更新状态栏统计的最小间隔（秒）
+
 
 class VirtualCameraGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("虚拟摄像头控制器")
-        self.root.geometry("600x400")
+        self.root.geometry("600x830")
+        
+        # 工作线程不直接操作 Tk 控件：日志和界面调用放入队列（deque 的
+        # append/popleft 是原子操作，不需要加锁），由界面线程定时批量处理
+        self._log_queue = deque(maxlen=LOG_MAX_LINES)
+        self._ui_calls = deque()
+        self._status = ""         # 发送线程发布的最新统计，界面线程定时显示
+        self._shown_status = None
         
         self.video_path = None
         self.is_running = False
         self.camera_thread = None
         self.cap = None
+        self.decoder = None
+        self.stats = None
+        self.preview = None     # 发送线程取样、界面线程显示的缩略图
         self.stop_flag = False
         self.playing = False  # 是否正在播放视频
         
@@ -88,6 +117,60 @@ class VirtualCameraGUI:
         
         ttk.Label(fps_frame, text="FPS").pack(side=tk.LEFT)
         
+        # 画面适配
+        fit_frame = ttk.Frame(settings_frame)
+        fit_frame.pack(fill=tk.X, pady=2)
+        
+        ttk.Label(fit_frame, text="画面适配:", width=10).pack(side=tk.LEFT)
+        
+        self.fit_var = tk.StringVar(value="letterbox")
+        fit_combo = ttk.Combobox(fit_frame, textvariable=self.fit_var,
+                                 values=list(FIT_MODES), state="readonly", width=10)
+        fit_combo.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(fit_frame, text="(letterbox=留黑边, crop=裁剪, stretch=拉伸)",
+                  foreground="gray").pack(side=tk.LEFT)
+        
+        # 输出目标
+        sink_frame = ttk.Frame(settings_frame)
+        sink_frame.pack(fill=tk.X, pady=2)
+        
+        ttk.Label(sink_frame, text="输出:", width=10).pack(side=tk.LEFT)
+        
+        self.sink_var = tk.StringVar(value="camera")
+        sink_combo = ttk.Combobox(sink_frame, textvariable=self.sink_var,
+                                  values=["camera", "null", "shm:virtual_camera",
+                                          "file:output.y4m"], width=20)
+        sink_combo.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(sink_frame, text="(camera=虚拟摄像头, null=只计时, shm=共享内存)",
+                  foreground="gray").pack(side=tk.LEFT)
+        
+        # 帧缓存
+        self.frame_cache_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="使用帧缓存（再次启动无需解码）",
+                        variable=self.frame_cache_var).pack(anchor=tk.W, pady=2)
+        
+        # 无缝循环
+        self.gapless_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="无缝循环（预开第二个解码器，避免循环卡顿）",
+                        variable=self.gapless_var).pack(anchor=tk.W, pady=2)
+        
+        # 独立解码进程
+        self.process_decoder_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="独立解码进程（解码缩放不与界面争用 GIL，减少抖动）",
+                        variable=self.process_decoder_var).pack(anchor=tk.W, pady=2)
+        
+        # 实时统计
+        self.live_stats_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="实时统计（在状态栏显示各阶段耗时 p50/p99、迟到和丢帧）",
+                        variable=self.live_stats_var).pack(anchor=tk.W, pady=2)
+        
+        # 实时预览
+        self.preview_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(settings_frame, text="实时预览（每隔几帧取样缩略图，占用不超过单核 2%）",
+                        variable=self.preview_var).pack(anchor=tk.W, pady=2)
+        
         # 控制按钮
         control_frame = ttk.Frame(self.root, padding="10")
         control_frame.pack(fill=tk.X, padx=10, pady=10)
@@ -107,6 +190,13 @@ class VirtualCameraGUI:
                                    state=tk.DISABLED)
         self.stop_btn.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
         
+        # 预览：缩略图以 PPM 数据直接写入 PhotoImage
+        preview_frame = ttk.LabelFrame(self.root, text="预览", padding="10")
+        preview_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        self.preview_photo = tk.PhotoImage(width=320, height=180)
+        ttk.Label(preview_frame, image=self.preview_photo).pack()
+        
         # 状态显示
         status_frame = ttk.LabelFrame(self.root, text="状态", padding="10")
         status_frame.pack(fill=tk.BOTH, padx=10, pady=5, expand=True)
@@ -121,7 +211,13 @@ class VirtualCameraGUI:
         self.status_text.config(yscrollcommand=scrollbar.set)
         scrollbar.config(command=self.status_text.yview)
         
+        # 状态栏：实时统计
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(self.root, textvariable=self.status_var, foreground="gray",
+                  padding=(10, 0, 10, 5)).pack(fill=tk.X)
+        
         self.log("程序已启动，请选择视频文件")
+        self.root.after(UI_POLL_MS, self.process_ui_queue)
         
     def select_video(self):
         """选择视频文件"""
@@ -138,19 +234,24 @@ class VirtualCameraGUI:
             self.video_label.config(text=Path(filename).name, foreground="black")
             self.log(f"已选择视频: {Path(filename).name}")
             
-            # 显示视频信息
-            cap = cv2.VideoCapture(filename)
-            if cap.isOpened():
-                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                fps = cap.get(cv2.CAP_PROP_FPS)
-                frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                duration = frames / fps if fps > 0 else 0
-                
-                self.log(f"  分辨率: {width}x{height}")
-                self.log(f"  帧率: {fps:.2f} FPS")
-                self.log(f"  时长: {duration:.2f} 秒")
-                cap.release()
+            # 显示视频信息：有 .probe.json 缓存时立即返回，否则在后台扫描一遍
+            # 数据包建立关键帧索引，不阻塞界面
+            threading.Thread(target=self.probe_video, args=(filename,),
+                             daemon=True).start()
+    
+    def probe_video(self, filename):
+        """读取视频信息（后台线程），结果交给界面线程显示"""
+        try:
+            probe = load_probe(filename)
+        except ValueError as e:
+            self.log(f"  {e}")
+            return
+        
+        self.log(f"  分辨率: {probe.width}x{probe.height}")
+        self.log(f"  帧率: {probe.fps:.2f} FPS")
+        self.log(f"  时长: {probe.duration:.2f} 秒（{probe.frame_count} 帧）")
+        if probe.indexed:
+            self.log(f"  关键帧: {len(probe.keyframes)} 个")
     
     def start_camera(self):
         """启动虚拟摄像头"""
@@ -182,7 +283,10 @@ class VirtualCameraGUI:
         # 在新线程中运行摄像头
         self.camera_thread = threading.Thread(
             target=self.run_camera,
-            args=(width, height, fps),
+            args=(width, height, fps, self.frame_cache_var.get(),
+                  self.gapless_var.get(), self.sink_var.get(),
+                  self.process_decoder_var.get(), self.live_stats_var.get(),
+                  self.fit_var.get(), self.preview_var.get()),
             daemon=True
         )
         self.camera_thread.start()
@@ -210,122 +314,250 @@ class VirtualCameraGUI:
         self.log("虚拟摄像头已停止")
     
     def create_standby_frame(self, width, height):
-        """创建待机画面"""
-        frame = np.zeros((height, width, 3), dtype=np.uint8)
-        # 设置深色背景
-        frame[:, :] = (30, 30, 30)
-        
-        # 添加文字
-        texts = [
-            ("虚拟摄像头已就绪", (255, 255, 255), 2.0 if width >= 1280 else 1.2, -120),
-            ("等待开始播放...", (200, 200, 200), 1.2 if width >= 1280 else 0.8, -40),
-        ]
-        
-        for text, color, scale, y_offset in texts:
-            font = cv2.FONT_HERSHEY_SIMPLEX
-            thickness = int(scale * 2)
-            
-            # 获取文字大小
-            (text_width, text_height), _ = cv2.getTextSize(text, font, scale, thickness)
-            
-            # 计算居中位置
-            x = (width - text_width) // 2
-            y = (height // 2) + y_offset
-            
-            # 添加阴影
-            cv2.putText(frame, text, (x + 3, y + 3), font, scale, (0, 0, 0), thickness)
-            # 添加主文字
-            cv2.putText(frame, text, (x, y), font, scale, color, thickness)
-        
-        # 添加提示信息
-        hint_text = "在GUI中点击 '开始播放' 按钮"
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        scale = 0.7 if width >= 1280 else 0.5
-        thickness = 1
-        (text_width, text_height), _ = cv2.getTextSize(hint_text, font, scale, thickness)
-        x = (width - text_width) // 2
-        y = height - 50
-        cv2.putText(frame, hint_text, (x, y), font, scale, (150, 150, 150), thickness)
-        
-        return frame
+        """创建待机画面（同一分辨率只渲染一次）"""
+        large = width >= 1280
+        texts = (
+            ("虚拟摄像头已就绪", (255, 255, 255), 2.0 if large else 1.2, -120),
+            ("等待开始播放...", (200, 200, 200), 1.2 if large else 0.8, -40),
+        )
+        hint = ("在GUI中点击 '开始播放' 按钮", (150, 150, 150), 0.7 if large else 0.5)
+        return render_standby_frame(width, height, texts, hint)
+    
+    def load_frame_cache(self, width, height, fmt, fit='stretch'):
+        """打开或生成 .rawframes 帧缓存，失败时返回 None"""
+        cache = RawFrameCache(self.video_path, width, height, fmt=fmt, fit=fit)
+        frames = cache.load()
+        if frames is not None:
+            self.log(f"帧缓存已命中: {len(frames)} 帧")
+            return frames
+        
+        self.log("正在生成帧缓存...")
+        self.cap = cv2.VideoCapture(self.video_path)
+        frames = cache.build(self.cap, DEFAULT_MAX_FRAME_CACHE_MB * 1024 * 1024)
+        self.cap.release()
+        self.cap = None
+        if frames is None:
+            self.log(f"帧缓存生成失败或超出上限（{DEFAULT_MAX_FRAME_CACHE_MB} MB），使用流式解码")
+        else:
+            self.log(f"帧缓存生成完成: {len(frames)} 帧")
+        return frames
+    
+    def send_stats_text(self, sink, frame_count):
+        """发送帧数和帧间隔抖动"""
+        stats = sink.stats()
+        message = (f"已播放 {frame_count} 帧 | 帧间隔抖动 {stats['jitter_ms']:.2f} ms, "
+                   f"最大 {stats['max_interval_ms']:.1f} ms")
+        if self.decoder is not None:
+            message += f" | 欠载 {self.decoder.stats()['underruns']} 次"
+        return message
+    
+    def log_send_stats(self, sink, frame_count):
+        """把发送统计写入日志"""
+        self.log(self.send_stats_text(sink, frame_count))
+        if self.stats is not None:
+            self.log(self.stats.summary())
     
-    def run_camera(self, width, height, fps):
+    def publish_status(self, sink, frame_count):
+        """更新状态栏的统计（发送线程中调用，只替换字符串，由界面线程定时显示）"""
+        status = self.send_stats_text(sink, frame_count)
+        if self.stats is not None:
+            status += f"\n{self.stats.summary()}"
+        self._status = status
+    
+    def run_camera(self, width, height, fps, use_frame_cache=False, gapless=False,
+                   sink_spec='camera', use_process=False, live_stats=False,
+                   fit='letterbox', preview=False):
         """运行虚拟摄像头（在独立线程中）"""
         try:
-            self.cap = cv2.VideoCapture(self.video_path)
+            self.stats = FrameStats() if live_stats else None
+            self.cap = None
+            sink = create_sink(sink_spec, width, height, fps)
             
-            with pyvirtualcam.Camera(width=width, height=height, 
-                                     fps=fps, fmt=pyvirtualcam.PixelFormat.BGR) as cam:
-                self.log(f"虚拟摄像头已启动: {cam.device}")
-                self.log(f"输出: {width}x{height} @ {fps} FPS")
+            with sink:
+                # 打开虚拟摄像头可能需要几百毫秒，在后台进行，同时在本线程打开视频；
+                # 帧缓存和解码进程按协商出的像素格式工作，要等打开完成
+                with ThreadPoolExecutor(max_workers=1) as pool:
+                    opening = pool.submit(sink.open)
+                    if not use_frame_cache and not use_process:
+                        self.cap = LoopingVideoReader(self.video_path, gapless=gapless)
+                    # 按输出后端协商像素格式，解码缩放阶段直接生成该格式
+                    fmt = opening.result()
+                converter = FrameConverter(fmt, width, height, fit=fit)
+                # 预览在发送之后按发送格式取样，不增加发送路径上的转换
+                self.preview = FramePreview(fmt, width, height) if preview else None
+                
+                frames = self.load_frame_cache(width, height, fmt, fit) if use_frame_cache else None
+                frame_index = 0
+                if frames is None and use_process:
+                    # 解码缩放在子进程中进行，本线程只取帧发送
+                    self.decoder = ProcessDecoder(self.video_path, width, height, fmt,
+                                                  gapless=gapless, fit=fit)
+                    self.decoder.start()
+                    self.log("解码进程已启动")
+                elif frames is None and self.cap is None:
+                    self.cap = LoopingVideoReader(self.video_path, gapless=gapless)
+                
+                self.log(f"虚拟摄像头已启动: {sink.device}")
+                self.log(f"输出: {width}x{height} @ {fps} FPS ({fmt.upper()})")
                 self.log("=== 待机模式 ===")
                 self.log("虚拟摄像头已就绪，显示待机画面")
                 self.log("点击 '开始播放' 按钮开始播放视频")
                 
                 frame_time = 1.0 / fps
                 frame_count = 0
-                standby_frame = self.create_standby_frame(width, height)
+                next_status = 0.0
+                standby_frame = converter(self.create_standby_frame(width, height)).copy()
+                last_frame = standby_frame
+                converter.stats = self.stats
                 
                 while not self.stop_flag:
                     start_time = time.time()
+                    frame_start = time.perf_counter()
+                    dropped = False
                     
                     # 如果还未开始播放，显示待机画面
                     if not self.playing:
-                        cam.send(standby_frame)
-                        cam.sleep_until_next_frame()
+                        sink.send(standby_frame)
+                        if self.preview is not None:
+                            self.preview.offer(standby_frame, frame_start + frame_time)
+                        sink.sleep_until_next_frame()
                         continue
                     
                     # 开始播放视频
-                    ret, frame = self.cap.read()
-                    
-                    if not ret:
-                        # 重新开始播放
-                        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    if frames is not None:
+                        frame = frames[frame_index]
+                        frame_index = (frame_index + 1) % len(frames)
+                    elif self.decoder is not None:
+                        for kind, payload in self.decoder.poll_messages():
+                            if kind == 'loop':
+                                self.log(f"视频循环播放 (衔接间隔 {payload['last_loop_gap_ms']:.1f} ms, "
+                                         f"最大 {payload['max_loop_gap_ms']:.1f} ms)")
+                        # 欠载时重发上一帧
+                        frame = self.decoder.pop(timeout=frame_time / 2)
+                        dropped = frame is None
+                        if dropped:
+                            frame = last_frame
+                        last_frame = frame
+                    else:
+                        loops = self.cap.loops
                         ret, frame = self.cap.read()
                         
                         if not ret:
                             self.log("错误：无法读取视频帧")
                             break
+                        if self.stats:
+                            self.stats.record('decode', time.perf_counter() - frame_start)
                         
-                        self.log("视频循环播放")
-                    
-                    # 调整帧大小
-                    if frame.shape[1] != width or frame.shape[0] != height:
-                        frame = cv2.resize(frame, (width, height))
+                        if self.cap.loops != loops:
+                            if self.stats:
+                                self.stats.record_loop(self.cap.last_seek_time)
+                            stats = self.cap.stats()
+                            self.log(f"视频循环播放 (衔接间隔 {stats['last_loop_gap_ms']:.1f} ms, "
+                                     f"最大 {stats['max_loop_gap_ms']:.1f} ms)")
+                        
+                        # 调整帧大小并转换为输出像素格式
+                        frame = converter(frame)
                     
                     # 发送到虚拟摄像头
-                    cam.send(frame)
+                    send_start = time.perf_counter()
+                    sink.send(frame)
+                    if self.stats:
+                        now = time.perf_counter()
+                        self.stats.record('send', now - send_start)
+                        self.stats.record_frame(now - frame_start, frame_time, dropped)
+                    if self.preview is not None:
+                        self.preview.offer(frame, frame_start + frame_time)
                     
                     frame_count += 1
-                    if frame_count % 300 == 0:  # 每10秒（30fps）更新一次
-                        self.log(f"已播放 {frame_count} 帧")
+                    if frame_count % 300 == 0:  # 每10秒（30fps）写一次日志
+                        self.log_send_stats(sink, frame_count)
+                    if frame_start >= next_status:
+                        # 状态栏每秒最多更新几次，统计摘要不在每帧计算
+                        next_status = frame_start + STATUS_INTERVAL
+                        self.publish_status(sink, frame_count)
                     
                     # 控制帧率
                     elapsed = time.time() - start_time
                     sleep_time = frame_time - elapsed
                     if sleep_time > 0:
-                        cam.sleep_until_next_frame()
+                        sleep_start = time.perf_counter()
+                        sink.sleep_until_next_frame()
+                        if self.stats:
+                            self.stats.record('sleep', time.perf_counter() - sleep_start)
+                
+                if frame_count:
+                    self.log_send_stats(sink, frame_count)
+                if self.preview is not None:
+                    stats = self.preview.stats()
+                    self.log(f"预览: 取样 {stats['samples']} 次，跳过 {stats['skipped']} 次，"
+                             f"平均 {stats['avg_ms']:.2f} ms，CPU {stats['cpu_percent']:.1f}%")
                         
         except Exception as e:
             self.log(f"错误: {str(e)}")
-            messagebox.showerror("错误", str(e))
+            self.call_in_ui(messagebox.showerror, "错误", str(e))
         finally:
             if self.cap:
                 self.cap.release()
-            self.root.after(0, self.stop_camera)
+            if self.decoder is not None:
+                last_frame = frame = None
+                self.decoder.stop()
+                self.decoder = None
+            self.preview = None
+            self.call_in_ui(self.stop_camera)
     
     def log(self, message):
-        """在状态文本框中显示日志"""
-        self.status_text.config(state=tk.NORMAL)
-        self.status_text.insert(tk.END, f"{message}\n")
-        self.status_text.see(tk.END)
-        self.status_text.config(state=tk.DISABLED)
+        """在状态文本框中显示日志（任意线程均可调用，由界面线程批量写入）"""
+        self._log_queue.append(message)
+    
+    def call_in_ui(self, func, *args):
+        """在界面线程中执行 func(*args)（供工作线程使用）"""
+        self._ui_calls.append((func, args))
+    
+    def process_ui_queue(self):
+        """界面线程定时处理队列：批量写入日志、执行界面调用、刷新状态栏"""
+        try:
+            lines = []
+            while self._log_queue:
+                lines.append(self._log_queue.popleft())
+            if lines:
+                self.append_log(lines)
+            
+            while self._ui_calls:
+                func, args = self._ui_calls.popleft()
+                func(*args)
+            
+            preview = self.preview
+            data = preview.take() if preview is not None else None
+            if data is not None:
+                self.preview_photo.configure(data=data, format='PPM')
+            
+            status = self._status
+            if status != self._shown_status:
+                self._shown_status = status
+                self.status_var.set(status)
+        finally:
+            self.root.after(UI_POLL_MS, self.process_ui_queue)
+    
+    def append_log(self, lines):
+        """一次性写入多行日志，超过 LOG_MAX_LINES 时删除最早的行"""
+        text = self.status_text
+        text.config(state=tk.NORMAL)
+        text.insert(tk.END, "\n".join(lines) + "\n")
+        # 末尾总有一个空行，实际行数为 end 的行号减 2
+        excess = int(text.index(tk.END).split('.')[0]) - 2 - LOG_MAX_LINES
+        if excess > 0:
+            text.delete("1.0", f"{excess + 1}.0")
+        text.see(tk.END)
+        text.config(state=tk.DISABLED)
 
 
 def main():
     """主函数"""
     root = tk.Tk()
     app = VirtualCameraGUI(root)
+    # cv2、numpy 用到时才导入（见 lazy_import），窗口显示出来之后在后台预先导入，
+    # 点击启动时不必再等待
+    root.after_idle(preload, 'numpy', 'cv2')
     root.mainloop()
 
 